@@ -0,0 +1,131 @@
+"""
+Compares the batched bulk pipeline (source/bulk.py) with the previous
+one-SELECT-per-operation implementation, against a temporary SQLite file.
+
+Usage: python benchmarks/bulk_benchmark.py [--sizes 10,1000,10000] [--repeat 3]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source"))
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from settings import TLL_DEFAULT
+from setup_db import Base
+from models import KeyValue
+from backends.sql import run_bulk
+from bulk import parse_operations
+
+
+async def legacy_bulk(db: AsyncSession, operations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    The bulk loop as it was before the batched pipeline: one SELECT per operation
+    and one ORM object per added or deleted row.
+    """
+    errors: List[Dict[str, Any]] = []
+    for operation in operations:
+        method: str = operation["method"].upper()
+        key: str = operation["key"]
+        record = await db.execute(select(KeyValue).where(KeyValue.key == key))
+        record_found: Optional[KeyValue] = record.scalar_one_or_none()
+
+        if method == "GET":
+            if not record_found:
+                errors.append({"key": key})
+        elif method == "DELETE":
+            if not record_found:
+                errors.append({"key": key})
+            else:
+                await db.delete(record_found)
+        elif method == "PUT":
+            if record_found:
+                errors.append({"key": key})
+            else:
+                tll = operation.get("tll") or TLL_DEFAULT
+                db.add(KeyValue(key=key, value=operation["value"],
+                                expiration_time=datetime.now() + timedelta(minutes=int(tll))))
+    return errors
+
+
+async def batched_bulk(db: AsyncSession, operations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    plan = await run_bulk(db, parse_operations(operations))
+    return plan.errors
+
+
+def make_operations(size: int, round_id: int) -> List[Dict[str, Any]]:
+    """
+    A third of the operations read seeded keys, a third delete seeded keys
+    and a third add new keys.
+    """
+    operations: List[Dict[str, Any]] = []
+    for i in range(size):
+        kind = i % 3
+        if kind == 0:
+            operations.append({"method": "get", "key": f"seed-{round_id}-{i}"})
+        elif kind == 1:
+            operations.append({"method": "delete", "key": f"seed-{round_id}-{i}"})
+        else:
+            operations.append({"method": "put", "key": f"new-{round_id}-{i}", "value": "value", "tll": 10})
+    return operations
+
+
+async def seed(sessions: async_sessionmaker[AsyncSession], operations: List[Dict[str, Any]]) -> None:
+    async with sessions() as db:
+        expiration_time = datetime.now() + timedelta(minutes=30)
+        db.add_all([KeyValue(key=operation["key"], value="seeded", expiration_time=expiration_time)
+                    for operation in operations if operation["method"] != "put"])
+        await db.commit()
+
+
+async def measure(sessions: async_sessionmaker[AsyncSession], size: int, round_id: int,
+                  implementation: Callable[[AsyncSession, List[Dict[str, Any]]], Awaitable[List[Dict[str, Any]]]]) -> float:
+    operations = make_operations(size, round_id)
+    await seed(sessions, operations)
+
+    started = time.perf_counter()
+    async with sessions() as db:
+        errors = await implementation(db, operations)
+        if errors:
+            raise RuntimeError(f"Benchmark operations failed: {errors[:3]}")
+        await db.commit()
+    elapsed = time.perf_counter() - started
+    return size / elapsed
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,1000,10000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(bind=engine, autoflush=False)
+
+        print(f"{'ops':>8} {'legacy ops/s':>14} {'batched ops/s':>14} {'speedup':>8}")
+        round_id = 0
+        for size in (int(size) for size in args.sizes.split(",")):
+            results: Dict[str, List[float]] = {"legacy": [], "batched": []}
+            for _ in range(args.repeat):
+                for name, implementation in (("legacy", legacy_bulk), ("batched", batched_bulk)):
+                    round_id += 1
+                    results[name].append(await measure(sessions, size, round_id, implementation))
+            legacy = max(results["legacy"])
+            batched = max(results["batched"])
+            print(f"{size:>8} {legacy:>14.0f} {batched:>14.0f} {batched / legacy:>7.1f}x")
+
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
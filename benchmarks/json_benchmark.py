@@ -0,0 +1,131 @@
+"""
+Measures the CPU spent on a PUT /bulk request outside the storage: parsing the body,
+validating the operations and serializing the response. Compares the previous path
+(stdlib json, dict-by-dict validation) with the current one (source/json_codec.py
+codec and bulk.parse_operations).
+
+Usage: python benchmarks/json_benchmark.py [--sizes 10,1000,10000] [--repeat 20] [--codec auto]
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Union
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source"))
+
+import json_codec
+from bulk import parse_operations
+
+
+def legacy_validate(body: Any) -> Optional[str]:
+    """
+    The bulk validation as it was before bulk.parse_operations: the operations are
+    checked one field at a time and stay dicts. Returns the error message, if any.
+    """
+    if not isinstance(body, list):
+        return "JSON Body must be a List. No changes were made"
+    for operation in body:
+        if not isinstance(operation, dict):
+            return "JSON Body is wrong format. No changes were made"
+        method: Optional[str] = operation.get("method")
+        if not method:
+            return "JSON Body lacks a 'method'. No changes were made"
+        method = method.upper()
+        if method not in ("GET", "PUT", "DELETE"):
+            return "JSON Body 'method' is incorrect. No changes were made"
+        key: Optional[str] = operation.get("key")
+        if not key:
+            return "JSON Body 'key' is incorrect. No changes were made"
+        if method == "PUT":
+            if "value" not in operation:
+                return "JSON Body 'value' is invalid (method PUT). No changes were made"
+            tll: Optional[Union[str, int]] = operation.get("tll")
+            if tll:
+                try:
+                    int(tll)
+                except (ValueError, TypeError):
+                    return "JSON Body 'tll' is invalid (method PUT). No changes were made"
+    return None
+
+
+def legacy_request(body: bytes, response: Dict[str, Any]) -> bytes:
+    operations = json.loads(body.decode("utf-8"))
+    if legacy_validate(operations):
+        raise RuntimeError("Benchmark operations are invalid")
+    return json.dumps(response).encode("utf-8")
+
+
+def current_request(body: bytes, response: Dict[str, Any]) -> bytes:
+    parse_operations(json_codec.loads(body))
+    return json_codec.dumps(response)
+
+
+def make_request(size: int) -> bytes:
+    """
+    A third of the operations read, a third delete and a third add keys with a small JSON value.
+    """
+    operations: List[Dict[str, Any]] = []
+    for i in range(size):
+        kind = i % 3
+        if kind == 0:
+            operations.append({"method": "get", "key": f"key-{i}"})
+        elif kind == 1:
+            operations.append({"method": "delete", "key": f"key-{i}"})
+        else:
+            operations.append({"method": "put", "key": f"key-{i}", "tll": 10,
+                               "value": {"id": i, "name": f"item {i}", "tags": ["a", "b"], "score": i / 7}})
+    return json.dumps(operations).encode("utf-8")
+
+
+def make_response(size: int) -> Dict[str, Any]:
+    details: List[Dict[str, Any]] = []
+    for i in range(size):
+        kind = i % 3
+        if kind == 0:
+            details.append({"key": f"key-{i}", "value": {"id": i, "name": f"item {i}", "tags": ["a", "b"]}})
+        else:
+            details.append({"key": f"key-{i}", "result": "deleted successfully" if kind == 1 else "added successfully"})
+    return {"status": "Success", "message": "All operations completed. Changes saved.", "details": details}
+
+
+def measure(implementation: Callable[[bytes, Dict[str, Any]], bytes], body: bytes,
+            response: Dict[str, Any], repeat: int) -> float:
+    """
+    Returns the best CPU time of one request, in microseconds.
+    The garbage collector is paused while measuring, like timeit does.
+    """
+    best = float("inf")
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.process_time()
+            implementation(body, response)
+            best = min(best, time.process_time() - started)
+    finally:
+        gc.enable()
+    return best * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,1000,10000")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--codec", default=json_codec.codec_name, choices=sorted(json_codec.CODECS))
+    args = parser.parse_args()
+
+    json_codec.dumps, json_codec.loads, _ = json_codec.CODECS[args.codec]
+
+    print(f"codec: {args.codec}")
+    print(f"{'ops':>8} {'legacy us':>12} {'current us':>12} {'speedup':>8}")
+    for size in (int(size) for size in args.sizes.split(",")):
+        body, response = make_request(size), make_response(size)
+        legacy = measure(legacy_request, body, response, args.repeat)
+        current = measure(current_request, body, response, args.repeat)
+        print(f"{size:>8} {legacy:>12.0f} {current:>12.0f} {legacy / current:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""
+Load-generation benchmark for the key-value storage service.
+
+Runs a configurable mix of GET / PUT / DELETE / bulk requests with N concurrent
+clients over a key space with uniform or Zipfian key popularity, then reports
+throughput and p50/p95/p99/p999 latency per operation type. Results are written
+as JSON (--output) so runs can be compared between commits.
+
+Against a running service:
+    python mock_client/benchmark.py --url http://localhost:6969 --duration 30
+
+Against an in-process service on a temporary SQLite file (no docker-compose needed):
+    python mock_client/benchmark.py --in-process --duration 30 --output results.json
+"""
+import argparse
+import asyncio
+from bisect import bisect_left
+from collections import deque
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from client import API_URL
+
+
+OPERATIONS: Tuple[str, ...] = ("get", "put", "delete", "bulk")
+
+# Keys written by the bulk requests that bulk GETs may read back.
+BULK_POOL_SIZE: int = 10000
+
+
+class KeySampler:
+    """
+    Picks keys from a key space of "size" keys.
+    With "zipf" > 0 key i is picked with probability proportional to 1 / (i + 1) ** zipf,
+    so a few keys are hot and most are cold; with "zipf" == 0 keys are uniform.
+    """
+
+    def __init__(self, size: int, zipf: float, prefix: str, rng: random.Random) -> None:
+        self.size = size
+        self.prefix = prefix
+        self.rng = rng
+        self._cdf: Optional[List[float]] = None
+        if zipf > 0:
+            weights = itertools.accumulate(1.0 / (rank + 1) ** zipf for rank in range(size))
+            self._cdf = list(weights)
+
+    def key(self) -> str:
+        if self._cdf is None:
+            rank = self.rng.randrange(self.size)
+        else:
+            rank = bisect_left(self._cdf, self.rng.random() * self._cdf[-1])
+        return f"{self.prefix}{rank}"
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """
+    Parses "get=80,put=15,delete=5" into normalized operation weights.
+    """
+    weights: Dict[str, float] = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip().lower()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation '{name}' in --mix. Use {', '.join(OPERATIONS)}")
+        weights[name] = float(weight)
+    total = sum(weights.values())
+    if total <= 0:
+        raise argparse.ArgumentTypeError("--mix weights must add up to more than 0")
+    return {name: weight / total for name, weight in weights.items()}
+
+
+def parse_ttl(ttl: str, rng: random.Random) -> Callable[[], Optional[int]]:
+    """
+    Parses the TTL distribution (minutes):
+    "default" - no tll sent, "fixed:N", "uniform:MIN:MAX" or "choice:A,B,C".
+    """
+    kind, _, spec = ttl.partition(":")
+    if kind == "default":
+        return lambda: None
+    if kind == "fixed":
+        value = int(spec)
+        return lambda: value
+    if kind == "uniform":
+        low, high = (int(part) for part in spec.split(":"))
+        return lambda: rng.randint(low, high)
+    if kind == "choice":
+        choices = [int(part) for part in spec.split(",")]
+        return lambda: rng.choice(choices)
+    raise argparse.ArgumentTypeError(f"Unknown TTL distribution '{ttl}'")
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class Stats:
+    """
+    Latencies (seconds) and response status counts of one operation type.
+    """
+
+    def __init__(self) -> None:
+        self.latencies: List[float] = []
+        self.statuses: Dict[int, int] = {}
+        self.failures: int = 0
+
+    def add(self, latency: float, status: int) -> None:
+        self.latencies.append(latency)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        succeeded = sum(amount for status, amount in self.statuses.items() if status < 400)
+        return {"count": count,
+                "failures": self.failures,
+                "success_ratio": round(succeeded / count, 4) if count else 0.0,
+                "statuses": {str(status): amount for status, amount in sorted(self.statuses.items())},
+                "throughput": round(count / elapsed, 2) if elapsed else 0.0,
+                "latency_ms": {"mean": round(sum(latencies) / count * 1000, 3) if count else 0.0,
+                               "p50": round(percentile(latencies, 0.50) * 1000, 3),
+                               "p95": round(percentile(latencies, 0.95) * 1000, 3),
+                               "p99": round(percentile(latencies, 0.99) * 1000, 3),
+                               "p999": round(percentile(latencies, 0.999) * 1000, 3),
+                               "max": round(latencies[-1] * 1000, 3) if count else 0.0}}
+
+
+async def preload(session: aiohttp.ClientSession, url: str, keys: int, prefix: str, fraction: float) -> None:
+    """
+    Seeds a fraction of the key space through the streaming import endpoint,
+    so reads and deletes hit existing keys from the start.
+    """
+    amount = int(keys * fraction)
+    if amount <= 0:
+        return None
+
+    async def lines() -> Any:
+        for start in range(0, amount, 1000):
+            yield "".join(json.dumps({"key": f"{prefix}{rank}", "value": f"value-{rank}"}) + "\n"
+                          for rank in range(start, min(amount, start + 1000))).encode("utf-8")
+
+    async with session.post(f"{url}/_import", data=lines(),
+                            headers={"Content-Type": "application/x-ndjson"}) as response:
+        result = await response.json()
+        print(f"[{datetime.now()}] Preloaded {result.get('imported', 0)} keys ({response.status})")
+    return None
+
+
+async def run_load(args: argparse.Namespace, url: str) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    sampler = KeySampler(args.keys, args.zipf, args.key_prefix, rng)
+    mix = parse_mix(args.mix)
+    ttl = parse_ttl(args.ttl, rng)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    stats: Dict[str, Stats] = {name: Stats() for name in names}
+    value = "x" * args.value_size
+
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        if args.preload > 0:
+            await preload(session, url, args.keys, args.key_prefix, args.preload)
+
+        issued = itertools.count()
+        bulk_keys = itertools.count()
+        bulk_pool: "deque[str]" = deque(maxlen=BULK_POOL_SIZE)
+        deadline: float = 0.0
+
+        def body_for_put() -> Dict[str, Any]:
+            tll = ttl()
+            return {"value": value} if tll is None else {"value": value, "tll": tll}
+
+        async def request(name: str) -> int:
+            if name == "get":
+                async with session.get(f"{url}/{sampler.key()}") as response:
+                    await response.read()
+                    return response.status
+            if name == "put":
+                async with session.put(f"{url}/{sampler.key()}", json=body_for_put()) as response:
+                    await response.read()
+                    return response.status
+            if name == "delete":
+                async with session.delete(f"{url}/{sampler.key()}") as response:
+                    await response.read()
+                    return response.status
+            operations = bulk_operations()
+            async with session.put(f"{url}/bulk", json=operations) as response:
+                await response.read()
+                if response.status == 200:
+                    deleted = {operation["key"] for operation in operations if operation["method"] == "delete"}
+                    bulk_pool.extend(operation["key"] for operation in operations
+                                     if operation["method"] == "put" and operation["key"] not in deleted)
+                return response.status
+
+        def bulk_operations() -> List[Dict[str, Any]]:
+            """
+            Builds a bulk that can succeed as a whole (a bulk is all-or-nothing), on keys of its own
+            that the single-key requests never touch: PUTs of fresh unique keys, GETs of keys stored
+            by earlier bulks, DELETEs of keys put earlier in the same bulk.
+            """
+            operations: List[Dict[str, Any]] = []
+            own_keys: List[str] = []
+            for _ in range(args.bulk_size):
+                method = rng.choices(("get", "put", "delete"), weights=(mix.get("get", 1), mix.get("put", 1), mix.get("delete", 1)))[0]
+                if method == "get" and (bulk_pool or own_keys):
+                    key = bulk_pool[rng.randrange(len(bulk_pool))] if bulk_pool else rng.choice(own_keys)
+                    operations.append({"method": "get", "key": key})
+                elif method == "delete" and own_keys:
+                    operations.append({"method": "delete", "key": own_keys.pop(rng.randrange(len(own_keys)))})
+                else:
+                    key = f"{args.key_prefix}bulk-{next(bulk_keys)}"
+                    own_keys.append(key)
+                    operations.append({"method": "put", "key": key, **body_for_put()})
+            return operations
+
+        async def worker() -> None:
+            while True:
+                if args.requests:
+                    if next(issued) >= args.requests:
+                        return
+                elif time.perf_counter() >= deadline:
+                    return
+                name = rng.choices(names, weights=weights)[0]
+                started = time.perf_counter()
+                try:
+                    status = await request(name)
+                except aiohttp.ClientError:
+                    stats[name].failures += 1
+                    continue
+                stats[name].add(time.perf_counter() - started, status)
+
+        print(f"[{datetime.now()}] Running {args.concurrency} clients against {url}")
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    total = sum(len(stat.latencies) for stat in stats.values())
+    return {"elapsed": round(elapsed, 3),
+            "throughput": round(total / elapsed, 2) if elapsed else 0.0,
+            "operations": {name: stat.report(elapsed) for name, stat in stats.items()}}
+
+
+async def start_in_process(backend: str, directory: str) -> Tuple[Any, str]:
+    """
+    Starts the service from ../source in this process, on a free local port,
+    against a temporary SQLite file (or the in-memory engine).
+    """
+    os.environ["DEBUG"] = "True"
+    os.environ["DB_URL"] = f"sqlite+aiosqlite:///{os.path.join(directory, 'benchmark.db')}"
+    os.environ["STORAGE_BACKEND"] = backend
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source"))
+
+    from aiohttp import web
+    from main import start_app
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+
+    runner = web.AppRunner(start_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    print(f"\nTotal: {results['throughput']} ops/s over {results['elapsed']} s")
+    print(f"{'operation':<10} {'count':>8} {'ops/s':>10} {'success':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'p999 ms':>9}  statuses")
+    for name, report in results["operations"].items():
+        latency = report["latency_ms"]
+        print(f"{name:<10} {report['count']:>8} {report['throughput']:>10} {report['success_ratio']:>8.1%} "
+              f"{latency['p50']:>9} {latency['p95']:>9} {latency['p99']:>9} {latency['p999']:>9}  {report['statuses']}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=API_URL, help="service URL (ignored with --in-process)")
+    parser.add_argument("--in-process", action="store_true", help="start the service in this process on a temporary SQLite file")
+    parser.add_argument("--backend", default="sql", choices=("sql", "memory"), help="storage engine for --in-process")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run (ignored with --requests)")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many requests")
+    parser.add_argument("--keys", type=int, default=10000, help="key space size")
+    parser.add_argument("--key-prefix", default="bench-")
+    parser.add_argument("--zipf", type=float, default=0.99, help="Zipf exponent, 0 for uniform keys")
+    parser.add_argument("--mix", default="get=80,put=15,delete=5", help="operation weights, e.g. get=70,put=20,delete=5,bulk=5")
+    parser.add_argument("--bulk-size", type=int, default=100, help="operations per bulk request")
+    parser.add_argument("--ttl", default="default", help="'default', 'fixed:N', 'uniform:MIN:MAX' or 'choice:A,B' (minutes)")
+    parser.add_argument("--value-size", type=int, default=32, help="value length in characters")
+    parser.add_argument("--preload", type=float, default=0.5, help="fraction of the key space imported before the run")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--label", default="", help="free text stored with the results")
+    parser.add_argument("--output", default="", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    runner = None
+    with tempfile.TemporaryDirectory() as directory:
+        url = args.url
+        if args.in_process:
+            runner, url = await start_in_process(args.backend, directory)
+            args.url = url
+        try:
+            results = await run_load(args, url)
+        finally:
+            if runner is not None:
+                await runner.cleanup()
+
+    results = {"label": args.label,
+               "commit": git_commit(),
+               "timestamp": datetime.now().isoformat(),
+               "config": {name: value for name, value in vars(args).items() if name not in ("output", "label")},
+               **results}
+    print_report(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
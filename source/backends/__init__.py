@@ -0,0 +1,65 @@
+from typing import Any, Optional, cast
+
+from aiohttp.web import Application
+
+from settings import STORAGE_BACKEND, AOF_PATH, AOF_FSYNC_INTERVAL
+from backends.base import Record, StorageBackend, StorageConflict
+
+
+def create_storage(name: str = STORAGE_BACKEND) -> StorageBackend:
+    """
+    Builds the storage engine selected in settings.STORAGE_BACKEND.
+    Engines are imported lazily, so the "memory" engine does not load SQLAlchemy.
+    """
+    if name == "sql":
+        from backends.sql import SqlStorage
+        return SqlStorage()
+    if name == "memory":
+        from backends.memory import MemoryStorage
+        return MemoryStorage(log_path=AOF_PATH or None, fsync_interval=AOF_FSYNC_INTERVAL)
+    raise ValueError(f"Unknown storage backend '{name}'. Use 'sql' or 'memory'")
+
+
+class LazyStorage:
+    """
+    Stands for the storage engine, built on first use. The modules importing "storage"
+    then do not import the engine (SQLAlchemy for "sql"): with settings.STARTUP_LAZY,
+    the app listens before "init_storage" builds it.
+    """
+
+    def __init__(self, name: str) -> None:
+        self._name: str = name
+        self._engine: Optional[StorageBackend] = None
+
+    @property
+    def built(self) -> bool:
+        return self._engine is not None
+
+    def build(self) -> StorageBackend:
+        if self._engine is None:
+            self._engine = create_storage(self._name)
+        return self._engine
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.build(), name)
+
+
+_lazy_storage = LazyStorage(STORAGE_BACKEND)
+storage: StorageBackend = cast(StorageBackend, _lazy_storage)
+
+
+async def init_storage(app: Application) -> None:
+    """
+    Builds the storage engine and prepares it with the server startup.
+    """
+    await _lazy_storage.build().start()
+    return None
+
+async def close_storage(app: Application) -> None:
+    """
+    Releases the storage resources with the server shutdown.
+    An engine never built (the lazy startup did not get to it) has nothing to release.
+    """
+    if _lazy_storage.built:
+        await storage.close()
+    return None
@@ -0,0 +1,131 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+
+class Record(NamedTuple):
+    """
+    A single key-value record as stored by a backend.
+    """
+    key: str
+    value: Any
+    expiration_time: Optional[datetime]
+
+    def is_expired(self, now: datetime) -> bool:
+        return self.expiration_time is not None and self.expiration_time <= now
+
+
+class StorageConflict(Exception):
+    """
+    Raised when a write could not be applied because another request
+    changed the same keys at the same time. Nothing was written.
+    """
+    pass
+
+
+class StorageBackend(ABC):
+    """
+    Interface every storage engine implements.
+    Handlers and the scheduler only talk to the storage through these methods.
+    """
+
+    def shard_count(self) -> int:
+        """
+        Number of independent partitions of the key space. Expiry runs once per shard.
+        """
+        return 1
+
+    @abstractmethod
+    async def start(self) -> None:
+        """
+        Prepares the storage on app startup (schema creation, log replay).
+        """
+
+    @abstractmethod
+    async def close(self) -> None:
+        """
+        Releases the storage resources on app shutdown.
+        """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Record]:
+        """
+        Returns the live record with the given key, or None if it is missing or expired.
+        """
+
+    @abstractmethod
+    async def get_many(self, keys: Sequence[str]) -> Dict[str, Record]:
+        """
+        Returns the existing records among the given keys, expired or not.
+        """
+
+    @abstractmethod
+    async def put_if_absent(self, record: Record) -> bool:
+        """
+        Stores the record unless a live record with its key exists.
+        An expired record with the same key is replaced.
+        Returns False if a live record exists.
+        """
+
+    @abstractmethod
+    async def delete(self, key: str) -> bool:
+        """
+        Deletes the record with the given key. Returns False if nothing was deleted.
+        """
+
+    @abstractmethod
+    async def delete_many(self, keys: Sequence[str]) -> List[str]:
+        """
+        Deletes the records with the given keys, not all-or-nothing: each chunk of keys
+        is applied on its own. Returns the keys of the deleted records that were live.
+        """
+
+    @abstractmethod
+    async def apply_bulk(self, operations: List[Any]) -> Any:
+        """
+        Resolves and applies validated bulk operations (bulk.Operation) all-or-nothing.
+        Returns the bulk.BulkPlan; when it has errors nothing was written.
+        Raises StorageConflict if a concurrent write made the bulk fail.
+        """
+
+    @abstractmethod
+    async def apply_writes(self, operations: List[Any]) -> List[bool]:
+        """
+        Applies independent PUT / DELETE operations together (group commit).
+        Unlike apply_bulk a failed operation does not stop the others: a PUT fails if
+        a live record exists, a DELETE if no record exists.
+        Returns whether each operation succeeded, in order.
+        """
+
+    @abstractmethod
+    async def expire(self, limit: int, shard: int = 0) -> List[str]:
+        """
+        Deletes up to "limit" expired records of a shard. Returns the deleted keys.
+        """
+
+    @abstractmethod
+    async def count_expired(self, shard: int = 0) -> int:
+        """
+        Returns the number of expired records of a shard not deleted yet (the expiry backlog).
+        """
+
+    @abstractmethod
+    async def import_records(self, records: List[Record]) -> Tuple[int, int]:
+        """
+        Stores the records whose keys do not exist yet.
+        Returns the number of stored and skipped records.
+        """
+
+    @abstractmethod
+    async def scan(self, prefix: str, after: Optional[str], limit: int, values: bool = True) -> List[Record]:
+        """
+        Returns up to "limit" live records ordered by key, starting with "prefix"
+        and greater than "after" (keyset pagination).
+        Without "values" the engine may leave the record values out (None).
+        """
+
+    @abstractmethod
+    async def count(self, prefix: str) -> int:
+        """
+        Returns the number of live records whose key starts with "prefix".
+        """
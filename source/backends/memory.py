@@ -0,0 +1,314 @@
+import asyncio
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+import heapq
+import json
+import os
+from typing import Any, Dict, IO, List, Optional, Sequence, Set, Tuple
+
+from bulk import BulkPlan, Operation, operation_keys, resolve_operations
+from backends.base import Record, StorageBackend
+
+
+class AppendOnlyLog:
+    """
+    Durable log of the in-memory engine writes, one JSON array per line:
+    ["P", key, value, expiration_time] for puts and ["D", key] for deletes.
+    Writes are buffered and fsync-ed in batches every "fsync_interval" milliseconds
+    (0 means fsync before every write returns). The log is compacted on startup,
+    so its size follows the number of live records and not the write history.
+    """
+
+    def __init__(self, path: str, fsync_interval: int) -> None:
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self._file: Optional[IO[str]] = None
+        self._dirty: bool = False
+        self._flusher: Optional[asyncio.Task[None]] = None
+
+    def replay(self) -> Dict[str, Record]:
+        """
+        Reads the log and returns the records it describes.
+        A torn last line, left by a crash in the middle of a write, is ignored.
+        """
+        records: Dict[str, Record] = {}
+        if not os.path.exists(self.path):
+            return records
+
+        with open(self.path, "r", encoding="utf-8") as log:
+            for line in log:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if entry[0] == "P":
+                    expiration_time = datetime.fromisoformat(entry[3]) if entry[3] else None
+                    records[entry[1]] = Record(entry[1], entry[2], expiration_time)
+                elif entry[0] == "D":
+                    records.pop(entry[1], None)
+        return records
+
+    def compact(self, records: Dict[str, Record]) -> None:
+        """
+        Rewrites the log with one put per live record and atomically swaps it in.
+        """
+        temporary_path = f"{self.path}.compact"
+        with open(temporary_path, "w", encoding="utf-8") as log:
+            for record in records.values():
+                log.write(self._put_line(record))
+            log.flush()
+            os.fsync(log.fileno())
+        os.replace(temporary_path, self.path)
+
+        directory = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+    async def open(self) -> None:
+        self._file = open(self.path, "a", encoding="utf-8")
+        if self.fsync_interval > 0:
+            self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+            self._file = None
+
+    async def append_put(self, records: Sequence[Record]) -> None:
+        await self._append("".join(self._put_line(record) for record in records))
+
+    async def append_delete(self, keys: Sequence[str]) -> None:
+        await self._append("".join(json.dumps(["D", key]) + "\n" for key in keys))
+
+    async def _append(self, lines: str) -> None:
+        if not lines or self._file is None:
+            return None
+        self._file.write(lines)
+        self._dirty = True
+        if self.fsync_interval <= 0:
+            await asyncio.get_running_loop().run_in_executor(None, self._sync)
+        return None
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.fsync_interval / 1000)
+            if self._dirty:
+                await asyncio.get_running_loop().run_in_executor(None, self._sync)
+
+    def _sync(self) -> None:
+        if self._file is None:
+            return None
+        self._dirty = False
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return None
+
+    @staticmethod
+    def _put_line(record: Record) -> str:
+        expiration_time = record.expiration_time.isoformat() if record.expiration_time else None
+        return json.dumps(["P", record.key, record.value, expiration_time]) + "\n"
+
+
+class MemoryStorage(StorageBackend):
+    """
+    Native in-memory engine: a dict of records plus a min-heap expiry index of
+    (expiration_time, key). Optionally persisted with an AppendOnlyLog.
+    Every operation runs without awaiting in between its reads and writes, so it is
+    atomic for the event loop. The data lives in one process: it can not be shared
+    between several service nodes.
+    """
+
+    def __init__(self, log_path: Optional[str] = None, fsync_interval: int = 1000) -> None:
+        self._records: Dict[str, Record] = {}
+        self._expiry: List[Tuple[datetime, str]] = []
+        # Sorted key index for scans. New keys are merged in lazily on the next scan,
+        # deleted keys stay in the list until it is compacted. "_unsorted_keys" only holds
+        # stored keys, so it never outgrows the records.
+        self._sorted_keys: List[str] = []
+        self._unsorted_keys: Set[str] = set()
+        self._log: Optional[AppendOnlyLog] = AppendOnlyLog(log_path, fsync_interval) if log_path else None
+
+    async def start(self) -> None:
+        """
+        Replays and compacts the log in a thread, so a lazy startup keeps answering
+        the health checks meanwhile.
+        """
+        if self._log is None:
+            return None
+        now = datetime.now()
+        records = await asyncio.to_thread(self._log.replay)
+        for record in records.values():
+            if not record.is_expired(now):
+                self._store(record)
+        await asyncio.to_thread(self._log.compact, self._records)
+        await self._log.open()
+        return None
+
+    async def close(self) -> None:
+        if self._log is not None:
+            await self._log.close()
+        return None
+
+    async def get(self, key: str) -> Optional[Record]:
+        record = self._records.get(key)
+        if record is None or record.is_expired(datetime.now()):
+            return None
+        return record
+
+    async def get_many(self, keys: Sequence[str]) -> Dict[str, Record]:
+        records = self._records
+        return {key: records[key] for key in keys if key in records}
+
+    async def put_if_absent(self, record: Record) -> bool:
+        existing = self._records.get(record.key)
+        if existing is not None and not existing.is_expired(datetime.now()):
+            return False
+        self._store(record)
+        if self._log is not None:
+            await self._log.append_put((record,))
+        return True
+
+    async def delete(self, key: str) -> bool:
+        if self._drop(key) is None:
+            return False
+        if self._log is not None:
+            await self._log.append_delete((key,))
+        return True
+
+    async def delete_many(self, keys: Sequence[str]) -> List[str]:
+        now = datetime.now()
+        removed: List[str] = []
+        deleted: List[str] = []
+        for key in keys:
+            record = self._drop(key)
+            if record is not None:
+                removed.append(key)
+                if not record.is_expired(now):
+                    deleted.append(key)
+        if removed and self._log is not None:
+            await self._log.append_delete(removed)
+        return deleted
+
+    async def apply_bulk(self, operations: List[Operation], atomic: bool = True) -> BulkPlan:
+        existing = await self.get_many(operation_keys(operations))
+        plan = resolve_operations(operations, existing, datetime.now())
+        if plan.errors and atomic:
+            return plan
+
+        for key in plan.deletes:
+            self._drop(key)
+        for record in plan.inserts:
+            self._store(record)
+        if self._log is not None:
+            await self._log.append_delete(plan.deletes)
+            await self._log.append_put(plan.inserts)
+        return plan
+
+    async def apply_writes(self, operations: List[Operation]) -> List[bool]:
+        plan = await self.apply_bulk(operations, atomic=False)
+        return plan.outcomes
+
+    async def expire(self, limit: int, shard: int = 0) -> List[str]:
+        now = datetime.now()
+        keys: List[str] = []
+        while self._expiry and len(keys) < limit and self._expiry[0][0] <= now:
+            expiration_time, key = heapq.heappop(self._expiry)
+            record = self._records.get(key)
+            # Heap entries of deleted or re-added keys are stale and simply dropped.
+            if record is not None and record.expiration_time == expiration_time:
+                self._drop(key)
+                keys.append(key)
+        if keys and self._log is not None:
+            await self._log.append_delete(keys)
+        return keys
+
+    async def count_expired(self, shard: int = 0) -> int:
+        now = datetime.now()
+        return sum(1 for expiration_time, key in self._expiry
+                   if expiration_time <= now and key in self._records
+                   and self._records[key].expiration_time == expiration_time)
+
+    async def import_records(self, records: List[Record]) -> Tuple[int, int]:
+        stored: List[Record] = []
+        for record in records:
+            if record.key not in self._records:
+                self._store(record)
+                stored.append(record)
+        if self._log is not None:
+            await self._log.append_put(stored)
+        return len(stored), len(records) - len(stored)
+
+    async def scan(self, prefix: str, after: Optional[str], limit: int, values: bool = True) -> List[Record]:
+        keys = self._sorted_index()
+        now = datetime.now()
+        position = bisect_right(keys, after) if after is not None and after >= prefix else bisect_left(keys, prefix)
+
+        page: List[Record] = []
+        while position < len(keys) and len(page) < limit:
+            key = keys[position]
+            if not key.startswith(prefix):
+                break
+            record = self._records.get(key)
+            if record is not None and not record.is_expired(now):
+                page.append(record)
+            position += 1
+        return page
+
+    async def count(self, prefix: str) -> int:
+        keys = self._sorted_index()
+        now = datetime.now()
+        live: int = 0
+        for position in range(bisect_left(keys, prefix), len(keys)):
+            key = keys[position]
+            if not key.startswith(prefix):
+                break
+            record = self._records.get(key)
+            if record is not None and not record.is_expired(now):
+                live += 1
+        return live
+
+    def _store(self, record: Record) -> None:
+        self._records[record.key] = record
+        self._unsorted_keys.add(record.key)
+        if record.expiration_time is not None:
+            heapq.heappush(self._expiry, (record.expiration_time, record.key))
+        return None
+
+    def _drop(self, key: str) -> Optional[Record]:
+        """
+        Removes a record, and its key from the keys waiting for the sorted index.
+        Returns the removed record, None if there was none.
+        """
+        self._unsorted_keys.discard(key)
+        return self._records.pop(key, None)
+
+    def _sorted_index(self) -> List[str]:
+        """
+        Returns the sorted key list, merging in keys added since the last scan.
+        Small batches are inserted one by one, large ones trigger a rebuild,
+        which also drops the deleted keys.
+        """
+        if self._unsorted_keys:
+            if len(self._unsorted_keys) * 16 < len(self._sorted_keys):
+                keys = self._sorted_keys
+                for key in self._unsorted_keys:
+                    position = bisect_left(keys, key)
+                    if position == len(keys) or keys[position] != key:
+                        insort(keys, key, lo=position)
+            else:
+                self._sorted_keys = sorted(self._records)
+            self._unsorted_keys.clear()
+
+        if len(self._sorted_keys) > 2 * len(self._records) + 1024:
+            self._sorted_keys = sorted(self._records)
+        return self._sorted_keys
@@ -0,0 +1,518 @@
+import asyncio
+import heapq
+from itertools import islice
+from sqlalchemy import select, insert, delete, func, or_, bindparam
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Executable, Select
+from sqlalchemy.engine import Result
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+from settings import BULK_CHUNK_SIZE, READ_YOUR_WRITES_WINDOW, READ_YOUR_WRITES_MAX_KEYS
+from setup_db import (shards, ring, client_db_call, scheduler_db_call, init_database, dispose_engines,
+                      has_replicas)
+from models import KeyValue
+from bulk import BulkPlan, Operation, chunked, operation_keys, resolve_operations, merge_plans
+from backends.base import Record, StorageBackend, StorageConflict
+from metrics import stage
+from compression import encode_value, decode_value
+from replicas import RecentWrites
+
+
+def prefix_upper_bound(prefix: str) -> Optional[str]:
+    """
+    Returns the smallest string that is greater than every string starting with "prefix",
+    so a prefix filter can be expressed as the index-friendly range [prefix, upper_bound).
+    Returns None when there is no upper bound (empty prefix or only max code points).
+    """
+    while prefix and prefix[-1] == chr(0x10FFFF):
+        prefix = prefix[:-1]
+    if not prefix:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _ordered_key(dialect_name: str) -> Any:
+    """
+    The key column compared in code point order, the order of Python strings that
+    prefix_upper_bound() and the merge of the shard pages rely on. PostgreSQL sorts by the
+    database collation unless told otherwise: the "C" collation, which the key column
+    is declared with (see models.py), so the primary key index still serves the ranges.
+    SQLite compares UTF-8 bytes, which is already code point order.
+    """
+    if dialect_name == "postgresql":
+        return KeyValue.key.collate("C")
+    return KeyValue.key
+
+
+def _with_prefix(query: Select[Any], prefix: str, key: Any = KeyValue.key) -> Select[Any]:
+    """
+    Limits a query to the keys starting with "prefix", as a range on the primary key index.
+    "key" is the key column to compare, see _ordered_key().
+    """
+    if prefix:
+        query = query.where(key >= prefix, key.startswith(prefix, autoescape=True))
+        upper_bound = prefix_upper_bound(prefix)
+        if upper_bound is not None:
+            query = query.where(key < upper_bound)
+    return query
+
+
+async def execute(db: AsyncSession, statement: Executable, parameters: Optional[Dict[str, Any]] = None) -> Result[Any]:
+    """
+    Runs a statement, timed as the "query" stage.
+    """
+    with stage("query"):
+        return await db.execute(statement, parameters)
+
+
+async def commit(db: AsyncSession) -> None:
+    """
+    Commits the session, timed as the "commit" stage.
+    """
+    with stage("commit"):
+        await db.commit()
+    return None
+
+
+def _live(now: Any) -> Any:
+    return or_(KeyValue.expiration_time.is_(None), KeyValue.expiration_time > now)
+
+
+def _put_if_absent_statement(dialect_name: str) -> Optional[Executable]:
+    """
+    Builds the single-statement put-if-absent for dialects that support it:
+    "INSERT ... ON CONFLICT (key) DO UPDATE ... WHERE <existing row expired> RETURNING key".
+    A live row with the same key makes it return no row; an expired one is replaced,
+    so expired records are treated as missing by PUT just like by GET.
+    Returns None for other dialects, which fall back to SELECT + INSERT.
+    """
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+
+    statement = dialect_insert(KeyValue).values(key=bindparam("key"),
+                                                value=bindparam("value"),
+                                                value_blob=bindparam("value_blob"),
+                                                codec=bindparam("codec"),
+                                                expiration_time=bindparam("expiration_time"))
+    return (statement.on_conflict_do_update(index_elements=[KeyValue.key],
+                                            set_={"value": statement.excluded.value,
+                                                  "value_blob": statement.excluded.value_blob,
+                                                  "codec": statement.excluded.codec,
+                                                  "expiration_time": statement.excluded.expiration_time},
+                                            where=KeyValue.expiration_time <= bindparam("now"))
+            .returning(KeyValue.key))
+
+
+# Hot single-key statements are built once and reused with bound parameters,
+# so each call skips building the statement and its compiled-cache key.
+# Every one of them is a single round-trip.
+RECORD_COLUMNS = (KeyValue.key, KeyValue.value, KeyValue.value_blob, KeyValue.codec, KeyValue.expiration_time)
+GET_LIVE_RECORD = (select(*RECORD_COLUMNS)
+                   .where(KeyValue.key == bindparam("key"), _live(bindparam("now"))))
+RECORD_EXISTS = select(KeyValue.key).where(KeyValue.key == bindparam("key"), _live(bindparam("now")))
+INSERT_RECORD = insert(KeyValue)
+DELETE_RECORD = delete(KeyValue).where(KeyValue.key == bindparam("key"))
+DELETE_EXPIRED_RECORD = delete(KeyValue).where(KeyValue.key == bindparam("key"),
+                                               KeyValue.expiration_time <= bindparam("now"))
+# Per shard, as the shards may run different databases.
+ORDERED_KEY: List[Any] = [_ordered_key(shard.engine.dialect.name) for shard in shards]
+PUT_IF_ABSENT: List[Optional[Executable]] = [_put_if_absent_statement(shard.engine.dialect.name)
+                                             if shard.engine.dialect.insert_returning else None
+                                             for shard in shards]
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+async def on_shards(groups: Dict[int, List[T]],
+                    call: Callable[[int, List[T]], Awaitable[R]]) -> List[Tuple[List[T], R]]:
+    """
+    Runs "call(shard, items)" for every shard group concurrently.
+    Returns the items of each group with the result of its call.
+    """
+    results = await asyncio.gather(*(call(shard, items) for shard, items in groups.items()))
+    return list(zip(groups.values(), results))
+
+
+def _row(record: Record) -> Dict[str, Any]:
+    value, value_blob, codec = encode_value(record.value)
+    return {"key": record.key, "value": value, "value_blob": value_blob, "codec": codec,
+            "expiration_time": record.expiration_time}
+
+
+def _record(row: Any) -> Record:
+    key, value, value_blob, codec, expiration_time = row
+    return Record(key, decode_value(value, value_blob, codec), expiration_time)
+
+
+async def fetch_records(db: AsyncSession, keys: Sequence[str]) -> Dict[str, Record]:
+    """
+    Loads all given keys with one "SELECT ... WHERE key IN (...)" per chunk.
+    Missing keys are simply absent from the returned dict.
+    """
+    records: Dict[str, Record] = {}
+    for chunk in chunked(keys, BULK_CHUNK_SIZE):
+        result = await execute(db, select(*RECORD_COLUMNS).where(KeyValue.key.in_(chunk)))
+        for row in result:
+            records[row[0]] = _record(row)
+    return records
+
+
+async def run_bulk(db: AsyncSession, operations: List[Operation], atomic: bool = True) -> BulkPlan:
+    """
+    Runs validated bulk operations as one batched transaction:
+    1. prefetches every referenced key with chunked "IN" queries,
+    2. resolves the operations in memory,
+    3. applies the writes with multi-row DELETE and INSERT statements.
+    With "atomic", nothing is written when any operation failed.
+    The caller decides whether to commit or roll back, depending on "plan.errors".
+    """
+    existing = await fetch_records(db, operation_keys(operations))
+    plan = resolve_operations(operations, existing, datetime.now())
+
+    if plan.errors and atomic:
+        return plan
+
+    for chunk in chunked(plan.deletes, BULK_CHUNK_SIZE):
+        await execute(db, delete(KeyValue).where(KeyValue.key.in_(chunk)))
+    for chunk in chunked(plan.inserts, BULK_CHUNK_SIZE):
+        await execute(db, insert(KeyValue).values([_row(record) for record in chunk]))
+    return plan
+
+
+class SqlStorage(StorageBackend):
+    """
+    Storage engine on top of SQLAlchemy (SQLite or PostgreSQL, see settings.DB_SHARDS).
+    Every key lives on the shard the hash ring maps it to (setup_db.ring); work on many keys
+    is split by shard and the shards run concurrently.
+    Client calls and expiry use separate sessions (setup_db.client_db_call / scheduler_db_call).
+    With read replicas, get(), get_many() and bulks of GET operations read from them, except for
+    the keys this process wrote in the last READ_YOUR_WRITES_WINDOW seconds.
+    """
+
+    def __init__(self) -> None:
+        self.recent_writes: Optional[RecentWrites] = (RecentWrites(READ_YOUR_WRITES_WINDOW, READ_YOUR_WRITES_MAX_KEYS)
+                                                      if has_replicas() else None)
+
+    def _from_replica(self, keys: Iterable[str]) -> bool:
+        """
+        Tells whether the keys may be read from a replica: none of them was written recently.
+        """
+        return self.recent_writes is not None and not self.recent_writes.any_recent(keys)
+
+    def _written(self, keys: Iterable[str]) -> None:
+        if self.recent_writes is not None:
+            self.recent_writes.touch(keys)
+        return None
+
+    def shard_count(self) -> int:
+        return len(shards)
+
+    async def start(self) -> None:
+        await init_database()
+
+    async def close(self) -> None:
+        await dispose_engines()
+
+    async def get(self, key: str) -> Optional[Record]:
+        async for db in client_db_call(ring.shard_for(key), replica=self._from_replica((key,))):
+            result = await execute(db, GET_LIVE_RECORD, {"key": key, "now": datetime.now()})
+            row = result.first()
+        return _record(row) if row else None
+
+    async def get_many(self, keys: Sequence[str]) -> Dict[str, Record]:
+        records: Dict[str, Record] = {}
+        for _, found in await on_shards(ring.group(keys), self._get_many_on_shard):
+            records.update(found)
+        return records
+
+    async def _get_many_on_shard(self, shard: int, keys: List[str]) -> Dict[str, Record]:
+        async for db in client_db_call(shard, replica=self._from_replica(keys)):
+            return await fetch_records(db, keys)
+        return {}
+
+    async def put_if_absent(self, record: Record) -> bool:
+        now = datetime.now()
+        shard = ring.shard_for(record.key)
+        async for db in client_db_call(shard):
+            if PUT_IF_ABSENT[shard] is not None:
+                result = await execute(db, PUT_IF_ABSENT[shard], {**_row(record), "now": now})
+                added = result.first() is not None
+                await commit(db)
+                if added:
+                    self._written((record.key,))
+                return added
+
+            result = await execute(db, RECORD_EXISTS, {"key": record.key, "now": now})
+            if result.first():
+                return False
+            try:
+                # Only an expired row is replaced: a live one written since the check
+                # makes the insert fail instead.
+                await execute(db, DELETE_EXPIRED_RECORD, {"key": record.key, "now": now})
+                await execute(db, INSERT_RECORD, _row(record))
+                await commit(db)
+            except IntegrityError:
+                await db.rollback()
+                return False
+        self._written((record.key,))
+        return True
+
+    async def delete(self, key: str) -> bool:
+        async for db in client_db_call(ring.shard_for(key)):
+            result = await execute(db, DELETE_RECORD, {"key": key})
+            await commit(db)
+        if result.rowcount:
+            self._written((key,))
+        return bool(result.rowcount)
+
+    async def delete_many(self, keys: Sequence[str]) -> List[str]:
+        deleted: List[str] = []
+        for _, shard_deleted in await on_shards(ring.group(keys), self.delete_many_on_shard):
+            deleted.extend(shard_deleted)
+        return deleted
+
+    async def delete_many_on_shard(self, shard: int, keys: List[str]) -> List[str]:
+        now = datetime.now()
+        deleted: List[str] = []
+        async for db in client_db_call(shard):
+            for chunk in chunked(keys, BULK_CHUNK_SIZE):
+                if shards[shard].engine.dialect.delete_returning:
+                    result = await execute(db, delete(KeyValue)
+                                               .where(KeyValue.key.in_(chunk))
+                                               .returning(KeyValue.key, KeyValue.expiration_time))
+                    rows = result.all()
+                else:
+                    result = await execute(db, select(KeyValue.key, KeyValue.expiration_time)
+                                               .where(KeyValue.key.in_(chunk)))
+                    rows = result.all()
+                    if rows:
+                        await execute(db, delete(KeyValue).where(KeyValue.key.in_([row[0] for row in rows])))
+                await commit(db)
+                self._written(key for key, _ in rows)
+                deleted.extend(key for key, expiration_time in rows
+                               if expiration_time is None or expiration_time > now)
+        return deleted
+
+    async def apply_bulk(self, operations: List[Operation]) -> BulkPlan:
+        """
+        A bulk within one shard is one transaction. A bulk over several shards runs one
+        transaction per shard concurrently, and commits them only when every shard resolved
+        its operations without errors (otherwise all of them are rolled back).
+        The commits themselves are not atomic: if a shard fails while committing, the shards
+        committed before it keep their changes.
+        A bulk of GET operations only is resolved from a plain read (see get_many()), which
+        may use the read replicas.
+        """
+        if all(operation.method == "GET" for operation in operations):
+            existing = await self.get_many(operation_keys(operations))
+            return resolve_operations(operations, existing, datetime.now())
+
+        plan = await self._write_bulk(operations)
+        if not plan.errors:
+            self._written(record.key for record in plan.inserts)
+            self._written(plan.deletes)
+        return plan
+
+    async def _write_bulk(self, operations: List[Operation]) -> BulkPlan:
+        groups = ring.group(range(len(operations)), key_of=lambda index: operations[index].key)
+        if len(groups) <= 1:
+            shard = next(iter(groups), 0)
+            async for db in client_db_call(shard):
+                try:
+                    plan = await run_bulk(db, operations)
+                    if plan.errors:
+                        await db.rollback()
+                    else:
+                        await commit(db)
+                except IntegrityError:
+                    await db.rollback()
+                    raise StorageConflict("Records were changed by another request")
+            return plan
+
+        loop = asyncio.get_running_loop()
+        decision: "asyncio.Future[bool]" = loop.create_future()
+        prepared: Dict[int, "asyncio.Future[BulkPlan]"] = {shard: loop.create_future() for shard in groups}
+        tasks = [asyncio.create_task(self._bulk_on_shard(shard, [operations[index] for index in indexes],
+                                                         prepared[shard], decision))
+                 for shard, indexes in groups.items()]
+
+        outcomes = await asyncio.gather(*prepared.values(), return_exceptions=True)
+        failures = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+        decision.set_result(not failures and not any(plan.errors for plan in outcomes))
+        await asyncio.gather(*tasks)
+
+        if any(isinstance(failure, IntegrityError) for failure in failures):
+            raise StorageConflict("Records were changed by another request")
+        if failures:
+            raise failures[0]
+        return merge_plans(list(zip(groups.values(), outcomes)), len(operations))
+
+    async def _bulk_on_shard(self, shard: int, operations: List[Operation],
+                             prepared: "asyncio.Future[BulkPlan]", decision: "asyncio.Future[bool]") -> None:
+        """
+        Resolves and writes the operations of one shard, reports the plan through "prepared",
+        then commits or rolls back following "decision".
+        """
+        try:
+            async for db in client_db_call(shard):
+                try:
+                    plan = await run_bulk(db, operations)
+                except Exception:
+                    await db.rollback()
+                    raise
+                prepared.set_result(plan)
+
+                if await decision:
+                    await commit(db)
+                else:
+                    await db.rollback()
+        except Exception as error:
+            if prepared.done():
+                raise
+            prepared.set_exception(error)
+        return None
+
+    async def apply_writes(self, operations: List[Operation]) -> List[bool]:
+        groups = ring.group(range(len(operations)), key_of=lambda index: operations[index].key)
+        outcomes: List[bool] = [False] * len(operations)
+        parts = await on_shards(groups, lambda shard, indexes: self._writes_on_shard(
+            shard, [operations[index] for index in indexes]))
+        for indexes, shard_outcomes in parts:
+            for index, outcome in zip(indexes, shard_outcomes):
+                outcomes[index] = outcome
+        return outcomes
+
+    async def _writes_on_shard(self, shard: int, operations: List[Operation]) -> List[bool]:
+        async for db in client_db_call(shard):
+            try:
+                plan = await run_bulk(db, operations, atomic=False)
+                await commit(db)
+                self._written(record.key for record in plan.inserts)
+                self._written(plan.deletes)
+                return plan.outcomes
+            except IntegrityError:
+                await db.rollback()
+
+        # A key of the batch was added by another node in between:
+        # apply the operations one by one, which is always correct.
+        outcomes: List[bool] = []
+        for operation in operations:
+            if operation.method == "PUT":
+                outcomes.append(await self.put_if_absent(Record(operation.key, operation.value,
+                                                                operation.expiration_time)))
+            else:
+                outcomes.append(await self.delete(operation.key))
+        return outcomes
+
+    async def expire(self, limit: int, shard: int = 0) -> List[str]:
+        now = datetime.now()
+        expired_keys = (select(KeyValue.key)
+                        .where(KeyValue.expiration_time <= now)
+                        .limit(limit)
+                        .scalar_subquery())
+        query = delete(KeyValue).where(KeyValue.key.in_(expired_keys), KeyValue.expiration_time <= now)
+
+        async for db in scheduler_db_call(shard):
+            if shards[shard].engine.dialect.delete_returning:
+                result = await execute(db, query.returning(KeyValue.key))
+                keys = list(result.scalars())
+            else:
+                result = await execute(db, select(KeyValue.key).where(KeyValue.expiration_time <= now).limit(limit))
+                keys = list(result.scalars())
+                if keys:
+                    await execute(db, delete(KeyValue).where(KeyValue.key.in_(keys), KeyValue.expiration_time <= now))
+            await commit(db)
+        return keys
+
+    async def count_expired(self, shard: int = 0) -> int:
+        async for db in scheduler_db_call(shard):
+            result = await execute(db, select(func.count())
+                                       .select_from(KeyValue)
+                                       .where(KeyValue.expiration_time <= datetime.now()))
+            return int(result.scalar_one())
+        return 0
+
+    async def import_records(self, records: List[Record]) -> Tuple[int, int]:
+        groups = ring.group(records, key_of=lambda record: record.key)
+        imported: int = 0
+        skipped: int = 0
+        for _, (shard_imported, shard_skipped) in await on_shards(groups, self.import_on_shard):
+            imported, skipped = imported + shard_imported, skipped + shard_skipped
+        return imported, skipped
+
+    async def import_on_shard(self, shard: int, records: List[Record]) -> Tuple[int, int]:
+        unique: Dict[str, Record] = {}
+        for record in records:
+            unique.setdefault(record.key, record)
+
+        attempts: int = 2
+        new_rows: List[Record] = []
+        async for db in client_db_call(shard):
+            while True:
+                existing = await fetch_records(db, list(unique))
+                new_rows = [record for key, record in unique.items() if key not in existing]
+                try:
+                    for chunk in chunked(new_rows, BULK_CHUNK_SIZE):
+                        await execute(db, insert(KeyValue).values([_row(record) for record in chunk]))
+                    await commit(db)
+                    self._written(record.key for record in new_rows)
+                    break
+                except IntegrityError:
+                    # A key was added by another request in between, fetch again and retry.
+                    await db.rollback()
+                    attempts -= 1
+                    if not attempts:
+                        raise StorageConflict("Records were changed by another request")
+        return len(new_rows), len(records) - len(new_rows)
+
+    async def scan(self, prefix: str, after: Optional[str], limit: int, values: bool = True) -> List[Record]:
+        """
+        Every shard returns its first "limit" matching records, the pages are merged by key.
+        """
+        pages = await asyncio.gather(*(self.scan_shard(shard, prefix, after, limit, values=values)
+                                       for shard in range(len(shards))))
+        if len(pages) == 1:
+            return pages[0]
+        return list(islice(heapq.merge(*pages, key=lambda record: record.key), limit))
+
+    async def scan_shard(self, shard: int, prefix: str, after: Optional[str], limit: int,
+                         live_only: bool = True, values: bool = True) -> List[Record]:
+        """
+        Without "values" only the key and expiration_time columns are read (the records
+        have no value), so no value is fetched or decompressed.
+        """
+        key = ORDERED_KEY[shard]
+        query = _with_prefix(select(*RECORD_COLUMNS) if values
+                             else select(KeyValue.key, KeyValue.expiration_time), prefix, key)
+        if after is not None:
+            query = query.where(key > after)
+        if live_only:
+            query = query.where(_live(datetime.now()))
+        query = (query.order_by(key)
+                 .limit(limit))
+
+        async for db in client_db_call(shard):
+            result = await execute(db, query)
+            if not values:
+                return [Record(key, None, expiration_time) for key, expiration_time in result]
+            return [_record(row) for row in result]
+        return []
+
+    async def count(self, prefix: str) -> int:
+        now = datetime.now()
+        counts = await asyncio.gather(*(self._count_on_shard(shard, prefix, now) for shard in range(len(shards))))
+        return sum(counts)
+
+    async def _count_on_shard(self, shard: int, prefix: str, now: datetime) -> int:
+        query = _with_prefix(select(func.count()).select_from(KeyValue), prefix, ORDERED_KEY[shard]).where(_live(now))
+        async for db in client_db_call(shard):
+            result = await execute(db, query)
+            return result.scalar_one()
+        return 0
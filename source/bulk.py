@@ -0,0 +1,180 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from settings import TLL_DEFAULT
+from backends.base import Record
+
+
+class BulkPlan:
+    """
+    Result of resolving a list of bulk operations against the prefetched records.
+    "results" and "errors" are the per-operation details returned to the client,
+    "deletes" and "inserts" are the writes needed to apply the whole list,
+    "outcomes" tells for each operation, in order, whether it succeeded.
+    """
+    __slots__ = ("results", "errors", "outcomes", "deletes", "inserts")
+
+    def __init__(self) -> None:
+        self.results: List[Dict[str, Any]] = []
+        self.errors: List[Dict[str, Any]] = []
+        self.outcomes: List[bool] = []
+        self.deletes: List[str] = []
+        self.inserts: List[Record] = []
+
+
+class Operation:
+    """
+    One validated bulk operation. "method" is "GET", "PUT" or "DELETE".
+    A PUT carries its "value" and either an absolute "expiration_time" or a "tll"
+    in minutes (None for the default TLL).
+    """
+    __slots__ = ("method", "key", "value", "tll", "expiration_time")
+
+    def __init__(self, method: str, key: str, value: Any = None, tll: Optional[int] = None,
+                 expiration_time: Optional[datetime] = None) -> None:
+        self.method: str = method
+        self.key: str = key
+        self.value: Any = value
+        self.tll: Optional[int] = tll
+        self.expiration_time: Optional[datetime] = expiration_time
+
+
+# Accepted spellings of the methods, so most operations skip str.upper().
+METHODS: Dict[str, str] = {spelling: method for method in ("GET", "PUT", "DELETE")
+                           for spelling in (method, method.lower())}
+
+
+def parse_operations(body: Any) -> List[Operation]:
+    """
+    Validates a bulk request body in one pass and converts it into operations.
+    Raises ValueError, with the message for the client, at the first invalid operation.
+    """
+    if not isinstance(body, list):
+        raise ValueError("JSON Body must be a List. No changes were made")
+
+    operations: List[Operation] = []
+    append = operations.append
+    for item in body:
+        if not isinstance(item, dict):
+            raise ValueError("JSON Body is wrong format. No changes were made")
+
+        method = item.get("method")
+        if not method:
+            raise ValueError("JSON Body lacks a 'method'. No changes were made")
+        if not isinstance(method, str) or (method := METHODS.get(method) or METHODS.get(method.upper())) is None:
+            raise ValueError("JSON Body 'method' is incorrect. No changes were made")
+
+        key = item.get("key")
+        if not key or not isinstance(key, str):
+            raise ValueError("JSON Body 'key' is incorrect. No changes were made")
+
+        if method != "PUT":
+            append(Operation(method, key))
+            continue
+
+        if "value" not in item:
+            raise ValueError("JSON Body 'value' is invalid (method PUT). No changes were made")
+        tll = item.get("tll")
+        try:
+            tll = int(tll) if tll else None
+        except (ValueError, TypeError):
+            raise ValueError("JSON Body 'tll' is invalid (method PUT). No changes were made")
+        append(Operation(method, key, item["value"], tll))
+    return operations
+
+
+def chunked(items: Sequence[Any], size: int) -> Iterator[Sequence[Any]]:
+    """
+    Splits a sequence into consecutive slices of at most "size" items.
+    """
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def operation_keys(operations: List[Operation]) -> List[str]:
+    """
+    Returns every key referenced by the operations, once, in order.
+    """
+    return list(dict.fromkeys(operation.key for operation in operations))
+
+
+def resolve_operations(operations: List[Operation], existing: Dict[str, Record],
+                       now: datetime) -> BulkPlan:
+    """
+    Replays the operations in order against an in-memory view of the records.
+    Nothing is written here: the returned plan holds the per-operation results
+    and the final set of rows to delete and insert. Failed operations change nothing,
+    so the writes of the successful ones can be applied on their own.
+    """
+    plan = BulkPlan()
+    state: Dict[str, Optional[Record]] = dict(existing)
+    deleted_existing: Dict[str, None] = {}
+    new_rows: Dict[str, Record] = {}
+
+    for operation in operations:
+        method: str = operation.method
+        key: str = operation.key
+        record: Optional[Record] = state.get(key)
+
+        errors_before = len(plan.errors)
+        if method == "GET":
+            if record is None:
+                plan.errors.append({"key": key, "result": f"Record with the key '{key}' does not exists"})
+            elif record.expiration_time and record.expiration_time < now:
+                plan.errors.append({"key": key, "result": f"Record with the key '{key}' has expired"})
+            else:
+                plan.results.append({"key": key, "value": record.value})
+
+        elif method == "DELETE":
+            if record is None:
+                plan.errors.append({"key": key, "result": f"Record with the key '{key}' does not exists"})
+            else:
+                state[key] = None
+                if key in new_rows:
+                    del new_rows[key]
+                else:
+                    deleted_existing[key] = None
+                plan.results.append({"key": key, "result": "deleted successfully"})
+
+        elif method == "PUT":
+            if record is not None and not record.is_expired(now):
+                plan.errors.append({"key": key,
+                                    "result": f"Record with the key '{key}' already exists and can not be modified"})
+            else:
+                if record is not None:
+                    # An expired record is replaced, like a single PUT does.
+                    deleted_existing[key] = None
+                expiration_time: Optional[datetime] = operation.expiration_time
+                if expiration_time is None:
+                    expiration_time = now + timedelta(minutes=operation.tll or TLL_DEFAULT)
+                record = Record(key, operation.value, expiration_time)
+                state[key] = record
+                new_rows[key] = record
+                plan.results.append({"key": key, "result": "added successfully"})
+
+        plan.outcomes.append(len(plan.errors) == errors_before)
+
+    plan.deletes = list(deleted_existing)
+    plan.inserts = list(new_rows.values())
+    return plan
+
+
+def merge_plans(parts: List[Tuple[List[int], BulkPlan]], total: int) -> BulkPlan:
+    """
+    Combines the plans of operations split by shard back into one plan in request order.
+    Each part holds the indexes, in the original list, of the operations its plan resolved.
+    """
+    entries: List[Tuple[bool, Dict[str, Any]]] = [(True, {})] * total
+    for indexes, plan in parts:
+        results, errors = iter(plan.results), iter(plan.errors)
+        for index, outcome in zip(indexes, plan.outcomes):
+            entries[index] = (outcome, next(results) if outcome else next(errors))
+
+    merged = BulkPlan()
+    for outcome, detail in entries:
+        merged.outcomes.append(outcome)
+        (merged.results if outcome else merged.errors).append(detail)
+    for _, plan in parts:
+        merged.deletes.extend(plan.deletes)
+        merged.inserts.extend(plan.inserts)
+    return merged
@@ -0,0 +1,257 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import json
+from typing import Any, Dict, Iterable, Optional
+
+from settings import CACHE_ENABLED, CACHE_POLICY, CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_MAX_AGE
+
+
+_ENTRY_OVERHEAD: int = 128
+
+
+class CachedRecord:
+    """
+    A single cached key-value record.
+    "deadline" is the moment the entry stops being served: the record's own
+    expiration time, or the cache max age, whichever comes first.
+    """
+    __slots__ = ("key", "value", "expiration_time", "deadline", "size", "frequency")
+
+    def __init__(self, key: str, value: Any, expiration_time: Optional[datetime],
+                 deadline: datetime, size: int) -> None:
+        self.key = key
+        self.value = value
+        self.expiration_time = expiration_time
+        self.deadline = deadline
+        self.size = size
+        self.frequency = 1
+
+
+class RecordCache:
+    """
+    In-process read-through cache for key-value records.
+    Bounded both by the number of entries and by an estimated byte budget.
+    Eviction policy is either "lru" (least recently used) or "lfu" (least frequently used).
+    Entries never outlive the TTL of the record they hold.
+    A read that loaded a record passes the read_token() it took before the storage call to
+    set(): the record is not cached when its key was invalidated since, so a delete or write
+    finishing while the read was in flight is never hidden by the older record.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, policy: str = "lru",
+                 max_age: Optional[int] = None, enabled: bool = True) -> None:
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"Unknown cache policy '{policy}'. Use 'lru' or 'lfu'")
+
+        self.enabled = enabled
+        self.policy = policy
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+        self._entries: Dict[str, CachedRecord] = {}
+        self._lru: "OrderedDict[str, None]" = OrderedDict()
+        self._lfu_buckets: Dict[int, "OrderedDict[str, None]"] = {}
+        self._lfu_min_frequency: int = 0
+        self._bytes: int = 0
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.expirations: int = 0
+        self.invalidations: int = 0
+
+        # Generation of the last invalidation of the recently invalidated keys, for read_token().
+        self._generation: int = 0
+        self._invalidated: "OrderedDict[str, int]" = OrderedDict()
+        self._forgotten_generation: int = 0
+
+    def get(self, key: str) -> Optional[CachedRecord]:
+        """
+        Returns the cached record or None on a miss.
+        Entries past their deadline are dropped and counted as misses.
+        """
+        if not self.enabled:
+            return None
+
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if entry.deadline <= datetime.now():
+            self._remove(entry)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._touch(entry)
+        self.hits += 1
+        return entry
+
+    def set(self, key: str, value: Any, expiration_time: Optional[datetime], token: Optional[int] = None) -> None:
+        """
+        Stores a record in the cache, evicting other entries if the limits are reached.
+        Records that already expired, or that alone exceed the byte budget, are not cached.
+        With a read "token", neither is a record whose key was invalidated after the token was taken.
+        """
+        if not self.enabled or self.max_entries <= 0:
+            return None
+        if token is not None and (self._forgotten_generation > token or self._invalidated.get(key, -1) > token):
+            return None
+
+        now = datetime.now()
+        deadline: datetime = expiration_time or datetime.max
+        if self.max_age is not None:
+            deadline = min(deadline, now + timedelta(seconds=self.max_age))
+        if deadline <= now:
+            return None
+
+        size = _estimate_size(key, value)
+        if size > self.max_bytes:
+            return None
+
+        existing = self._entries.get(key)
+        if existing is not None:
+            self._remove(existing)
+
+        while self._entries and (len(self._entries) >= self.max_entries or self._bytes + size > self.max_bytes):
+            self._evict_one()
+
+        entry = CachedRecord(key, value, expiration_time, deadline, size)
+        self._entries[key] = entry
+        self._bytes += size
+        if self.policy == "lru":
+            self._lru[key] = None
+        else:
+            self._lfu_buckets.setdefault(1, OrderedDict())[key] = None
+            self._lfu_min_frequency = 1
+        return None
+
+    def invalidate(self, key: str) -> None:
+        """
+        Drops a single key from the cache, if present, and fails the reads of the key in flight.
+        Call it once the change of the key is committed.
+        """
+        if not self.enabled:
+            return None
+        self._generation += 1
+        self._invalidated[key] = self._generation
+        self._invalidated.move_to_end(key)
+        # Reads in flight for longer than the last max_entries invalidations can no longer
+        # tell whether their key changed meanwhile: set() ignores them.
+        while len(self._invalidated) > max(self.max_entries, 1):
+            _, generation = self._invalidated.popitem(last=False)
+            self._forgotten_generation = max(self._forgotten_generation, generation)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._remove(entry)
+            self.invalidations += 1
+        return None
+
+    def invalidate_many(self, keys: Iterable[str]) -> None:
+        """
+        Drops every given key from the cache.
+        """
+        for key in keys:
+            self.invalidate(key)
+        return None
+
+    def clear(self) -> None:
+        """
+        Empties the cache. Counters are kept.
+        """
+        self._entries.clear()
+        self._lru.clear()
+        self._lfu_buckets.clear()
+        self._lfu_min_frequency = 0
+        self._bytes = 0
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the cache counters and current occupancy.
+        """
+        lookups = self.hits + self.misses
+        return {"enabled": self.enabled,
+                "policy": self.policy,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def read_token(self) -> int:
+        """
+        Taken before a storage read, passed to set() with the record it loaded.
+        """
+        return self._generation
+
+    def _touch(self, entry: CachedRecord) -> None:
+        if self.policy == "lru":
+            self._lru.move_to_end(entry.key)
+            return None
+
+        bucket = self._lfu_buckets[entry.frequency]
+        del bucket[entry.key]
+        if not bucket:
+            del self._lfu_buckets[entry.frequency]
+            if self._lfu_min_frequency == entry.frequency:
+                self._lfu_min_frequency += 1
+        entry.frequency += 1
+        self._lfu_buckets.setdefault(entry.frequency, OrderedDict())[entry.key] = None
+        return None
+
+    def _remove(self, entry: CachedRecord) -> None:
+        del self._entries[entry.key]
+        self._bytes -= entry.size
+        if self.policy == "lru":
+            del self._lru[entry.key]
+            return None
+
+        bucket = self._lfu_buckets[entry.frequency]
+        del bucket[entry.key]
+        if not bucket:
+            del self._lfu_buckets[entry.frequency]
+            if self._lfu_min_frequency == entry.frequency:
+                self._lfu_min_frequency = min(self._lfu_buckets, default=0)
+        return None
+
+    def _evict_one(self) -> None:
+        if self.policy == "lru":
+            key = next(iter(self._lru))
+        else:
+            key = next(iter(self._lfu_buckets[self._lfu_min_frequency]))
+        self._remove(self._entries[key])
+        self.evictions += 1
+        return None
+
+
+def _estimate_size(key: str, value: Any) -> int:
+    """
+    Rough memory footprint of a cached record, used for the byte budget.
+    """
+    try:
+        value_size = len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        value_size = len(repr(value))
+    return _ENTRY_OVERHEAD + len(key.encode("utf-8")) + value_size
+
+
+record_cache: RecordCache = RecordCache(max_entries=CACHE_MAX_ENTRIES,
+                                        max_bytes=CACHE_MAX_BYTES,
+                                        policy=CACHE_POLICY,
+                                        max_age=CACHE_MAX_AGE if CACHE_MAX_AGE > 0 else None,
+                                        enabled=CACHE_ENABLED)
@@ -0,0 +1,69 @@
+import json
+from typing import Any, Callable, Dict, Optional, Tuple
+import zlib
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+from settings import VALUE_CODEC, VALUE_COMPRESSION_THRESHOLD, VALUE_COMPRESSION_LEVEL
+from metrics import registry
+
+
+SIZE_BUCKETS: Tuple[float, ...] = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+value_size = registry.histogram("kv_value_size_bytes", "Size of the values written to the DB, as JSON text.",
+                                buckets=SIZE_BUCKETS)
+stored_value_size = registry.histogram("kv_value_stored_bytes", "Size of the values written to the DB, by codec.",
+                                       ("codec",), buckets=SIZE_BUCKETS)
+
+CODECS: Dict[str, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    "zlib": (lambda data: zlib.compress(data, VALUE_COMPRESSION_LEVEL), zlib.decompress),
+}
+if lz4_frame is not None:
+    CODECS["lz4"] = (lz4_frame.compress, lz4_frame.decompress)
+
+if VALUE_CODEC not in CODECS and VALUE_CODEC != "none":
+    raise ValueError(f"Unknown value codec '{VALUE_CODEC}'. Use 'zlib', 'lz4' (with the lz4 package) or 'none'")
+
+
+def value_json(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+def encode_value(value: Any) -> Tuple[Any, Optional[bytes], Optional[str]]:
+    """
+    Prepares a value for the DB row: returns the (value, value_blob, codec) columns.
+    Values whose JSON text is at least VALUE_COMPRESSION_THRESHOLD bytes are stored compressed
+    in "value_blob", with the codec name as the row marker. Smaller strings are stored as they
+    are in "value", with no codec, like every row written before compression existed; other
+    small values (numbers, lists, objects) are stored as JSON text with the "json" marker.
+    """
+    text = value_json(value)
+    data = text.encode("utf-8")
+    value_size.observe(len(data))
+    if VALUE_CODEC == "none" or len(data) < VALUE_COMPRESSION_THRESHOLD:
+        stored_value_size.observe(len(data), "none")
+        if isinstance(value, str):
+            return value, None, None
+        return text, None, "json"
+
+    compress, _ = CODECS[VALUE_CODEC]
+    blob = compress(data)
+    stored_value_size.observe(len(blob), VALUE_CODEC)
+    return None, blob, VALUE_CODEC
+
+
+def decode_value(value: Any, blob: Optional[bytes], codec: Optional[str]) -> Any:
+    """
+    Rebuilds the value from the DB row columns written by encode_value().
+    """
+    if codec is None:
+        return value
+    if codec == "json":
+        return json.loads(value)
+    if codec not in CODECS:
+        raise ValueError(f"Row is stored with the codec '{codec}', which is not available here")
+    _, decompress = CODECS[codec]
+    return json.loads(decompress(blob))
@@ -0,0 +1,86 @@
+import asyncio
+from typing import List, Optional, Tuple
+
+from settings import GROUP_COMMIT_ENABLED, GROUP_COMMIT_WINDOW, GROUP_COMMIT_MAX_BATCH
+from backends import storage, Record
+from bulk import Operation
+from metrics import registry
+
+
+group_commit_batch_size = registry.histogram("kv_group_commit_batch_size", "Writes applied per group commit.",
+                                             buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024))
+
+Pending = Tuple[Operation, "asyncio.Future[bool]"]
+
+
+class GroupCommit:
+    """
+    Collects concurrent single-key writes and applies them together, in one transaction.
+    A write waits at most "window" milliseconds for others to join its batch, a batch is
+    flushed right away when it reaches "max_batch" writes. Only one batch is written at
+    a time: writes arriving meanwhile form the next batch, so the batch size grows with
+    the load instead of the number of commits. Each caller gets its own result back.
+    """
+
+    def __init__(self, window: float, max_batch: int) -> None:
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: List[Pending] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flusher: Optional[asyncio.Task[None]] = None
+
+    async def put(self, record: Record) -> bool:
+        """
+        Adds the record unless a live record with its key exists. Returns False if one does.
+        """
+        return await self._submit(Operation("PUT", record.key, record.value,
+                                            expiration_time=record.expiration_time))
+
+    async def delete(self, key: str) -> bool:
+        """
+        Deletes the record with the given key. Returns False if nothing was deleted.
+        """
+        return await self._submit(Operation("DELETE", key))
+
+    async def _submit(self, operation: Operation) -> bool:
+        loop = asyncio.get_running_loop()
+        future: "asyncio.Future[bool]" = loop.create_future()
+        self._pending.append((operation, future))
+
+        if self._flusher is None:
+            if len(self._pending) >= self.max_batch:
+                self._start_flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window / 1000, self._start_flush)
+        return await future
+
+    def _start_flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flusher is None and self._pending:
+            self._flusher = asyncio.get_running_loop().create_task(self._flush())
+        return None
+
+    async def _flush(self) -> None:
+        try:
+            while self._pending:
+                batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+                group_commit_batch_size.observe(len(batch))
+                try:
+                    outcomes = await storage.apply_writes([operation for operation, _ in batch])
+                except Exception as error:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(error)
+                    continue
+                for (_, future), outcome in zip(batch, outcomes):
+                    if not future.done():
+                        future.set_result(outcome)
+        finally:
+            self._flusher = None
+        return None
+
+
+group_commit: Optional[GroupCommit] = (GroupCommit(window=GROUP_COMMIT_WINDOW, max_batch=GROUP_COMMIT_MAX_BATCH)
+                                       if GROUP_COMMIT_ENABLED else None)
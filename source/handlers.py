@@ -1,13 +1,29 @@
 from aiohttp import web
-from sqlalchemy import select
 from datetime import datetime, timedelta
 import json
-from typing import Any, Dict, List, Optional, Union
-
-from settings import TLL_DEFAULT
-from setup_db import client_db_call
-from models import KeyValue
-from scheduler import delete_record_timer, delete_on_tll_timeout
+import math
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+from settings import (TLL_DEFAULT, IMPORT_CHUNK_SIZE, MULTI_MAX_KEYS, MAX_VALUE_SIZE, VALUE_STREAM_THRESHOLD,
+                      KEYS_DEFAULT_LIMIT, KEYS_MAX_LIMIT)
+from backends import storage, Record, StorageConflict
+from cache import record_cache
+from bulk import BulkPlan, Operation, parse_operations
+from metrics import registry, stage
+from transfer import parse_import_line, import_chunk, export_records
+from negative_cache import negative_cache
+from records import read_record, read_records, write_record, remove_record, remove_records
+from wire import negotiate, decode_keys, encode_values, encode_deleted, supported_types
+from compression import value_json
+from json_codec import json_response, read_json, dumps, loads, DECODE_ERRORS
+from startup import report
+
+
+# Room left in a PUT body for the JSON around the value ("tll", braces, whitespace).
+BODY_OVERHEAD: int = 4096
+STREAM_CHUNK_SIZE: int = 64 * 1024
+
+rejected_values = registry.counter("kv_value_rejected_total", "Values rejected for exceeding MAX_VALUE_SIZE.")
 
 routes = web.RouteTableDef()
 
@@ -15,6 +31,338 @@ routes = web.RouteTableDef()
 
 
 
+@routes.get("/_cache")
+async def cache_stats(request: web.Request) -> web.Response:
+    """
+    Returns the read-through cache counters (hits, misses, evictions, occupancy),
+    and the negative cache occupancy under "negative" when it is enabled.
+    Registered before "/{key}" so it is not captured as a key lookup.
+    """
+    stats: Dict[str, Any] = record_cache.stats()
+    if negative_cache is not None:
+        stats["negative"] = negative_cache.stats()
+    return json_response(stats, status=200)
+
+
+
+
+
+@routes.get("/_metrics")
+async def metrics_exposition(request: web.Request) -> web.Response:
+    """
+    Returns every metric of this process in the Prometheus text exposition format.
+    """
+    return web.Response(body=registry.render().encode("utf-8"),
+                        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+
+
+
+
+@routes.get("/_startup")
+async def startup_report(request: web.Request) -> web.Response:
+    """
+    Returns the startup report: import time, duration of each startup hook, and the time
+    until the service was ready and until the first request, in seconds since the process started.
+    Registered before "/{key}" so it is not captured as a key lookup.
+    """
+    return json_response(report.as_dict(), status=200)
+
+
+
+
+
+@routes.put("/bulk")
+async def bulk_operation(request: web.Request) -> web.Response:
+    """
+    Handles bulk GET, PUT, and DELETE operations.
+    Processes a list of operations in a single request.
+    All keys are prefetched at once, the operations are resolved in memory and
+    the changes are written with multi-row statements in one transaction.
+    Registered before "/{key}" so "PUT /bulk" is not captured as a key.
+    Check README.md to know how to call API handlers correctly.
+    """
+    try:
+        with stage("json_parse"):
+            body: Any = await read_json(request)
+    except DECODE_ERRORS:
+        return json_response({"status": "Error",
+                              "message": "JSON Body is invalid. No changes were made"},
+                              status=400)
+
+    try:
+        with stage("validate"):
+            operations: List[Operation] = parse_operations(body)
+    except ValueError as error:
+        return json_response({"status": "Error", "message": str(error)}, status=400)
+
+    try:
+        with stage("storage"):
+            plan: BulkPlan = await storage.apply_bulk(operations)
+    except StorageConflict:
+        return json_response({"status": "Error",
+                              "message": "Records were changed by another request. No changes were made."},
+                              status=409)
+
+    if plan.errors:
+        return json_response({"status": "Error",
+                              "message": "Not all operations were correct. No changes were made.",
+                              "details": plan.errors},
+                              status=400)
+
+    record_cache.invalidate_many(plan.deletes)
+    record_cache.invalidate_many(record.key for record in plan.inserts)
+    if negative_cache is not None:
+        negative_cache.added(record.key for record in plan.inserts)
+        negative_cache.removed(len(plan.deletes))
+    return json_response({"status": "Success",
+                          "message": "All operations completed. Changes saved.",
+                          "details": plan.results},
+                          status=200)
+
+
+
+
+
+@routes.post("/_import")
+async def import_stream(request: web.Request) -> web.Response:
+    """
+    Imports newline-delimited JSON records streamed in the request body.
+    The body is read line by line and stored every IMPORT_CHUNK_SIZE records
+    in one storage call, so memory use does not depend on the body size.
+    Existing and already expired keys are skipped, invalid lines are reported.
+    Check README.md to know how to call API handlers correctly.
+    """
+    imported: int = 0
+    skipped: int = 0
+    invalid: int = 0
+    errors: List[Dict[str, Any]] = []
+    rows: List[Record] = []
+    line_number: int = 0
+
+    try:
+        async for line in read_lines(request, MAX_VALUE_SIZE + BODY_OVERHEAD):
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                rows.append(parse_import_line(line, datetime.now()))
+            except ValueError as error:
+                invalid += 1
+                if len(errors) < 100:
+                    errors.append({"line": line_number, "result": str(error)})
+                continue
+
+            if len(rows) >= IMPORT_CHUNK_SIZE:
+                chunk_imported, chunk_skipped = await import_chunk(rows)
+                imported, skipped, rows = imported + chunk_imported, skipped + chunk_skipped, []
+
+        if rows:
+            chunk_imported, chunk_skipped = await import_chunk(rows)
+            imported, skipped = imported + chunk_imported, skipped + chunk_skipped
+    except LineTooLong:
+        return json_response({"status": "Error",
+                              "message": f"Line {line_number + 1} is too long. Import stopped",
+                              "imported": imported, "skipped": skipped, "invalid": invalid},
+                              status=400)
+    except StorageConflict:
+        return json_response({"status": "Error",
+                              "message": "Records were changed by another request. Import stopped",
+                              "imported": imported, "skipped": skipped, "invalid": invalid},
+                              status=409)
+
+    return json_response({"status": "Success" if not invalid else "Error",
+                          "message": "Import completed" if not invalid else "Import completed, invalid lines were not imported",
+                          "imported": imported, "skipped": skipped, "invalid": invalid,
+                          "details": errors},
+                          status=200)
+
+
+
+
+
+@routes.get("/_export")
+async def export_stream(request: web.Request) -> web.StreamResponse:
+    """
+    Streams all live records as newline-delimited JSON, ordered by key.
+    Optional "prefix" query parameter limits the export to keys starting with it.
+    Records are read page by page with keyset pagination, so memory use is constant.
+    Check README.md to know how to call API handlers correctly.
+    """
+    prefix: str = request.query.get("prefix", "")
+
+    response = web.StreamResponse(status=200, headers={"Content-Type": "application/x-ndjson"})
+    await response.prepare(request)
+    async for page in export_records(prefix):
+        await response.write(b"".join(dumps({"key": key,
+                                             "value": value,
+                                             "expiration_time": expiration_time.isoformat() if expiration_time else None}) + b"\n"
+                                      for key, value, expiration_time in page))
+    await response.write_eof()
+    return response
+
+
+
+
+
+def query_flag(request: web.Request, name: str) -> bool:
+    return request.query.get(name, "").lower() in ("1", "true", "yes")
+
+
+def remaining_ttl(expiration_time: Optional[datetime], now: datetime) -> Optional[int]:
+    """
+    Seconds left before the record expires, None for a record without expiration.
+    """
+    if expiration_time is None:
+        return None
+    return max(0, math.ceil((expiration_time - now).total_seconds()))
+
+
+@routes.get("/_keys")
+async def list_keys(request: web.Request) -> web.StreamResponse:
+    """
+    Lists the live keys in key order, one page per request.
+    Optional query parameters: "prefix", "after" (the "next" key of the previous page),
+    "limit", "values" and "ttl" to add the value and the remaining TTL of each key,
+    "count" to only count the live keys with the prefix.
+    The page is read in chunks of EXPORT_PAGE_SIZE with keyset pagination and streamed,
+    so a page costs the same at any depth and memory use does not depend on "limit".
+    Registered before "/{key}" so it is not captured as a key lookup.
+    Check README.md to know how to call API handlers correctly.
+    """
+    prefix: str = request.query.get("prefix", "")
+    if query_flag(request, "count"):
+        with stage("storage"):
+            count: int = await storage.count(prefix)
+        return json_response({"prefix": prefix, "count": count}, status=200)
+
+    try:
+        limit: int = int(request.query.get("limit", KEYS_DEFAULT_LIMIT))
+    except ValueError:
+        limit = 0
+    if not 0 < limit <= KEYS_MAX_LIMIT:
+        return json_response({"status": "Error",
+                              "message": f"'limit' must be an integer from 1 to {KEYS_MAX_LIMIT}"},
+                              status=400)
+
+    after: Optional[str] = request.query.get("after")
+    with_values: bool = query_flag(request, "values")
+    with_ttl: bool = query_flag(request, "ttl")
+
+    response = web.StreamResponse(status=200, headers={"Content-Type": "application/json; charset=utf-8"})
+    await response.prepare(request)
+    await response.write(b'{"keys":[')
+    returned: int = 0
+    last_key: Optional[str] = None
+    async for page in export_records(prefix, after=after, limit=limit, values=with_values):
+        now = datetime.now()
+        items: List[Any] = []
+        for record in page:
+            if not with_values and not with_ttl:
+                items.append(record.key)
+                continue
+            item: Dict[str, Any] = {"key": record.key}
+            if with_values:
+                item["value"] = record.value
+            if with_ttl:
+                item["ttl"] = remaining_ttl(record.expiration_time, now)
+            items.append(item)
+        await response.write((b"," if returned else b"") + b",".join(dumps(item) for item in items))
+        returned += len(page)
+        last_key = page[-1].key
+
+    # A full page may be followed by more keys: "next" is where the following page starts.
+    await response.write(b'],"next":' + dumps(last_key if returned == limit else None) + b"}")
+    await response.write_eof()
+    return response
+
+
+
+
+
+async def read_keys(request: web.Request, response_type: str) -> Union[List[str], web.Response]:
+    """
+    Reads the list of keys of a multi-key request answered in "response_type".
+    Returns the unique keys in request order, or the error response to send back.
+    """
+    try:
+        with stage("json_parse"):
+            keys: List[str] = decode_keys(await request.read(), request.content_type, response_type)
+    except ValueError as error:
+        return json_response({"status": "Error",
+                              "message": f"{error}. No changes were made"},
+                              status=400)
+
+    if len(keys) > MULTI_MAX_KEYS:
+        return json_response({"status": "Error",
+                              "message": f"At most {MULTI_MAX_KEYS} keys per request. No changes were made"},
+                              status=400)
+    return list(dict.fromkeys(keys))
+
+
+def not_acceptable() -> web.Response:
+    return json_response({"status": "Error",
+                          "message": f"Supported response types: {', '.join(supported_types())}"},
+                          status=406)
+
+
+
+
+
+@routes.post("/_mget")
+async def get_many_records(request: web.Request) -> web.Response:
+    """
+    Retrieves the values of many keys at once.
+    Cached keys are served from the cache, the others are loaded with chunked "IN" queries.
+    Missing and expired keys are reported as missing.
+    The response is JSON, msgpack or the length-prefixed binary format, following "Accept".
+    Check README.md to know how to call API handlers correctly.
+    """
+    content_type: Optional[str] = negotiate(request.headers.get("Accept"))
+    if content_type is None:
+        return not_acceptable()
+
+    keys = await read_keys(request, content_type)
+    if isinstance(keys, web.Response):
+        return keys
+
+    records: Dict[str, Record] = await read_records(keys)
+    values: Dict[str, Any] = {key: record.value for key, record in records.items()}
+
+    with stage("serialize"):
+        body: bytes = encode_values(keys, values, content_type)
+    return web.Response(body=body, status=200, content_type=content_type)
+
+
+
+
+
+@routes.post("/_mdelete")
+async def delete_many_records(request: web.Request) -> web.Response:
+    """
+    Deletes many keys at once with chunked "DELETE ... WHERE key IN (...)" statements.
+    Not all-or-nothing: missing keys are reported and the others are still deleted.
+    The response is JSON, msgpack or the length-prefixed binary format, following "Accept".
+    Check README.md to know how to call API handlers correctly.
+    """
+    content_type: Optional[str] = negotiate(request.headers.get("Accept"))
+    if content_type is None:
+        return not_acceptable()
+
+    keys = await read_keys(request, content_type)
+    if isinstance(keys, web.Response):
+        return keys
+
+    deleted: List[str] = await remove_records(keys)
+
+    with stage("serialize"):
+        body: bytes = encode_deleted(keys, deleted, content_type)
+    return web.Response(body=body, status=200, content_type=content_type)
+
+
+
+
+
 @routes.delete("/{key}")
 async def delete_record(request: web.Request) -> web.Response:
     """
@@ -23,20 +371,92 @@ async def delete_record(request: web.Request) -> web.Response:
     """
     key: str = request.match_info.get("key")
 
-    async for db in client_db_call():
-        record = await db.execute(select(KeyValue).where(KeyValue.key == key))
-        record_found: Optional[KeyValue] = record.scalar_one_or_none()
+    deleted: bool = await remove_record(key)
+
+    if deleted:
+        return json_response({"status": "Success",
+                              "message": f"Record with the key '{key}' deleted"},
+                              status=200)
+    else:
+        return json_response({"status": "Error",
+                              "message": f"Record with the key '{key}' not found"},
+                              status=404)
+
 
-        if record_found:
-            await db.delete(record_found)
-            await db.commit()
-            return web.json_response({"status": "Success",
-                                      "message": f"Record with the key '{key}' deleted"},
-                                      status=200)
-        else:
-            return web.json_response({"status": "Error",
-                                      "message": f"Record with the key '{key}' not found"},
-                                      status=404)
+
+
+
+async def read_limited(request: web.Request, limit: int) -> Optional[bytes]:
+    """
+    Reads the request body, or returns None as soon as it is known to exceed "limit" bytes:
+    right away from the Content-Length header, otherwise while the chunks arrive.
+    """
+    if request.content_length is not None and request.content_length > limit:
+        return None
+
+    chunks: List[bytes] = []
+    size: int = 0
+    async for chunk in request.content.iter_chunked(STREAM_CHUNK_SIZE):
+        size += len(chunk)
+        if size > limit:
+            return None
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+class LineTooLong(Exception):
+    """
+    Raised by read_lines for a body line longer than its limit.
+    """
+    pass
+
+
+async def read_lines(request: web.Request, limit: int) -> AsyncIterator[bytes]:
+    """
+    Yields the lines of the request body, newline included. Unlike iterating "request.content",
+    whose lines are capped by the stream buffer size, lines are accepted up to "limit" bytes:
+    a longer line raises LineTooLong.
+    """
+    buffer = bytearray()
+    async for chunk in request.content.iter_chunked(STREAM_CHUNK_SIZE):
+        start: int = len(buffer)
+        buffer += chunk
+        position: int = 0
+        line_end: int = buffer.find(b"\n", start)
+        while line_end >= 0:
+            if line_end + 1 - position > limit:
+                raise LineTooLong(f"Line is longer than {limit} bytes")
+            yield bytes(buffer[position:line_end + 1])
+            position = line_end + 1
+            line_end = buffer.find(b"\n", position)
+        del buffer[:position]
+        if len(buffer) > limit:
+            raise LineTooLong(f"Line is longer than {limit} bytes")
+    if buffer:
+        yield bytes(buffer)
+
+
+def value_too_large() -> web.Response:
+    rejected_values.inc()
+    return json_response({"status": "Error",
+                          "message": f"Value is larger than {MAX_VALUE_SIZE} bytes. No changes were made"},
+                          status=413)
+
+
+async def stream_record(request: web.Request, record: Record) -> web.StreamResponse:
+    """
+    Sends {"key": ..., "value": ...} for a large string value chunk by chunk, so the JSON
+    response is never built as a whole. Each chunk is escaped on its own, which gives the
+    same text as json.dumps() of the full value.
+    """
+    response = web.StreamResponse(status=200, headers={"Content-Type": "application/json; charset=utf-8"})
+    await response.prepare(request)
+    await response.write(f'{{"key": {json.dumps(record.key)}, "value": "'.encode("utf-8"))
+    for start in range(0, len(record.value), STREAM_CHUNK_SIZE):
+        await response.write(json.dumps(record.value[start:start + STREAM_CHUNK_SIZE])[1:-1].encode("utf-8"))
+    await response.write(b'"}')
+    await response.write_eof()
+    return response
 
 
 
@@ -46,27 +466,20 @@ async def delete_record(request: web.Request) -> web.Response:
 async def get_record(request: web.Request) -> web.Response:
     """
     Retrieves a key-value record by key.
-    Handles expired records by deleting them.
+    Expired records are treated as missing; the expiry sweep deletes them.
     Check README.md to know how to call API handlers correctly.
     """
     key: str = request.match_info.get("key")
 
-    async for db in client_db_call():
-        record = await db.execute(select(KeyValue).where(KeyValue.key == key))
-        record_found: Optional[KeyValue] = record.scalar_one_or_none()
+    record_found: Optional[Record] = await read_record(key)
 
-        if record_found:
-            if record_found.expiration_time and record_found.expiration_time < datetime.now():
-                await db.delete(record_found)
-                await db.commit()
-                return web.json_response({"status": "Error",
-                                          "message": f"Record with the key '{key}' not found"},
-                                          status=404)
-            else:
-                return web.json_response({"key": record_found.key, "value": record_found.value})
-        return web.json_response({"status": "Error",
-                                  "message": f"Record with the key '{key}' not found"},
-                                  status=404)
+    if record_found:
+        if isinstance(record_found.value, str) and len(record_found.value) >= VALUE_STREAM_THRESHOLD:
+            return await stream_record(request, record_found)
+        return json_response({"key": record_found.key, "value": record_found.value})
+    return json_response({"status": "Error",
+                          "message": f"Record with the key '{key}' not found"},
+                          status=404)
 
 
 
@@ -80,19 +493,28 @@ async def add_record(request: web.Request) -> web.Response:
     """
     key: str = request.match_info.get("key")
 
+    raw_body: Optional[bytes] = await read_limited(request, MAX_VALUE_SIZE + BODY_OVERHEAD)
+    if raw_body is None:
+        return value_too_large()
+
     try:
-        body: Dict[str, Any] = await request.json()
-    except json.JSONDecodeError:
-        return web.json_response({"status": "Error",
-                                  "message": "JSON Body is invalid. No changes were made"},
-                                  status=400)
+        with stage("json_parse"):
+            body: Dict[str, Any] = loads(raw_body)
+    except DECODE_ERRORS:
+        return json_response({"status": "Error",
+                              "message": "JSON Body is invalid. No changes were made"},
+                              status=400)
 
     try:
         value: Any = body["value"]
     except KeyError:
-        return web.json_response({"status": "Error",
-                                  "message": "JSON Body misses the 'value' attribute. No changes were made"},
-                                  status=400)
+        return json_response({"status": "Error",
+                              "message": "JSON Body misses the 'value' attribute. No changes were made"},
+                              status=400)
+
+    # The body limit lets a value through with up to BODY_OVERHEAD extra bytes, measure it exactly then.
+    if len(raw_body) > MAX_VALUE_SIZE and len(value_json(value).encode("utf-8")) > MAX_VALUE_SIZE:
+        return value_too_large()
 
     tll: Optional[Union[str, int]] = body.get("tll")
     expiration_time: datetime
@@ -101,159 +523,22 @@ async def add_record(request: web.Request) -> web.Response:
             tll: int = int(tll)
             expiration_time = datetime.now() + timedelta(minutes=tll)
         except (ValueError, TypeError):
-            return web.json_response({"status": "Error",
-                                      "message": "TLL is invalid. No changes were made"},
-                                      status=400)
+            return json_response({"status": "Error",
+                                  "message": "TLL is invalid. No changes were made"},
+                                  status=400)
     else:
         expiration_time = datetime.now() + timedelta(minutes=TLL_DEFAULT)
 
-    async for db in client_db_call():
-        record = await db.execute(select(KeyValue).where(KeyValue.key == key))
-        record_found: Optional[KeyValue] = record.scalar_one_or_none()
-
-        if record_found:
-            return web.json_response({"status": "Error",
-                                      "message": f"Record with the key '{key}' already exists and can not be modified"},
-                                      status=400)
-        else:
-            record = KeyValue(key=key, value=value, expiration_time=expiration_time)
-            db.add(record)
-            await db.commit()
-
-            delete_record_timer.add_job(delete_on_tll_timeout, 'date', run_date=expiration_time, args=[key])
-
-            return web.json_response({"status": "Success",
-                                      "message": f"Record with the key '{key}' was made successfully"},
-                                      status=200) 
-
-
+    added: bool = await write_record(Record(key, value, expiration_time))
 
-
-
-@routes.put("/bulk")
-async def bulk_operation(request: web.Request) -> web.Response:
-    """
-    Handles bulk GET, PUT, and DELETE operations.
-    Processes a list of operations in a single request.
-    Check README.md to know how to call API handlers correctly.
-    """
-    try:
-        body: List[Dict[str, Any]] = await request.json()
-    except json.JSONDecodeError:
-        return web.json_response({"status": "Error",
-                                  "message": "JSON Body is invalid. No changes were made"},
-                                  status=400)
-
-    if not isinstance(body, list):
-        return web.json_response({"status": "Error",
-                                  "message": "JSON Body must be a List. No changes were made"},
-                                  status=400)
-
-
-    for operation in body:
-        if not isinstance(operation, dict):
-            return web.json_response({"status": "Error",
-                                      "message": "JSON Body is wrong format. No changes were made"},
-                                      status=400)
-
-        method: Optional[str] = operation.get("method")
-        if not method:
-            return web.json_response({"status": "Error",
-                                      "message": "JSON Body lacks a 'method'. No changes were made"},
-                                      status=400)
-
-        method = method.upper()
-        if method not in ("GET", "PUT", "DELETE"):
-            return web.json_response({"status": "Error",
-                                      "message": "JSON Body 'method' is incorrect. No changes were made"},
-                                      status=400)
-
-        key: Optional[str] = operation.get("key")
-        if not key:
-            return web.json_response({"status": "Error",
-                                      "message": "JSON Body 'key' is incorrect. No changes were made"},
-                                      status=400)
-
-        if method == "PUT":
-            value: Optional[Any] = operation.get("value")
-            if "value" not in operation:
-                return web.json_response({"status": "Error",
-                                          "message": "JSON Body 'value' is invalid (method PUT). No changes were made"},
-                                          status=400)
-
-            tll: Optional[Union[str, int]] = operation.get("tll")
-            if tll:
-                try:
-                    int(tll)
-                except (NameError, ValueError, TypeError):    
-                    return web.json_response({"status": "Error",
-                                              "message": "JSON Body 'tll' is invalid (method PUT). No changes were made"},
-                                              status=400)
-
-
-    async for db in client_db_call():
-            errors: List[Dict[str, Any]] = []
-            tll_timers: List[tuple[datetime, str]] = []
-            successfull_results: List[Dict[str, Any]] = []
-
-            for operation in body:
-                    method: str = operation["method"].upper()
-                    key: str = operation["key"]
-
-                    if method == "GET":
-                        record = await db.execute(select(KeyValue).where(KeyValue.key == key))
-                        record_found: Optional[KeyValue] = record.scalar_one_or_none()
-                        if not record_found:
-                            errors.append({"key": key, "result": f"Record with the key '{key}' does not exists"})
-                        elif record_found.expiration_time and record_found.expiration_time < datetime.now():
-                            await db.delete(record_found)
-                            await db.flush()
-                            errors.append({"key": key, "result": f"Record with the key '{key}' has expired"})
-                        else:
-                            successfull_results.append({"key": key, "value": record_found.value})
-
-                    elif method == "DELETE":
-                        record = await db.execute(select(KeyValue).where(KeyValue.key == key))
-                        record_found: Optional[KeyValue] = record.scalar_one_or_none()
-
-                        if not record_found:
-                            errors.append({"key": key, "result": f"Record with the key '{key}' does not exists"})
-                        else:
-                            await db.delete(record_found)
-                            successfull_results.append({"key": key, "result": "deleted successfully"})
-
-                    elif method == "PUT":
-                        record = await db.execute(select(KeyValue).where(KeyValue.key == key))
-                        record_found: Optional[KeyValue] = record.scalar_one_or_none()
-
-                        if record_found:
-                            errors.append({"key": key,
-                                           "result": f"Record with the key '{key}' already exists and can not be modified"})
-                        else:
-                            tll: Optional[int]  = operation.get("tll")
-                            if not tll:
-                                tll: Optional[int] = TLL_DEFAULT
-                            expiration_time = datetime.now() + timedelta(minutes=int(tll))
-
-                            record = KeyValue(key=key, value=value, expiration_time=expiration_time)
-                            db.add(record)
-                            tll_timers.append((expiration_time, key))
-                            successfull_results.append({"key": key, "result": "added successfully"})
-
-            if errors:
-                    await db.rollback()
-                    return web.json_response({"status": "Error",
-                                              "message": "Not all operations were correct. No changes were made.",
-                                              "details": errors},
-                                              status=400)
-            else:
-                    await db.commit()
-                    for expiration_time, key in tll_timers:
-                        delete_record_timer.add_job(delete_on_tll_timeout, 'date', run_date=expiration_time, args=[key])
-                    return web.json_response({"status": "Success",
-                                              "message": "All operations completed. Changes saved.",
-                                              "details": successfull_results},
-                                              status=200)     
+    if not added:
+        return json_response({"status": "Error",
+                              "message": f"Record with the key '{key}' already exists and can not be modified"},
+                              status=400)
+    else:
+        return json_response({"status": "Success",
+                              "message": f"Record with the key '{key}' was made successfully"},
+                              status=200)
 
 
 
@@ -261,6 +546,16 @@ async def bulk_operation(request: web.Request) -> web.Response:
 
 @routes.get("/")
 async def start_message(request):
-    return web.json_response({"status": "We're good!", 
-                              "message": "Yes, everything works. You can go try the API now"}, 
-                              status=200)
\ No newline at end of file
+    """
+    Liveness: answers 200 as long as the process serves requests, with "ready" telling
+    whether the storage is ready. Readiness: with "?ready=true" it answers 503 until then.
+    """
+    if not report.is_ready:
+        return json_response({"status": "Starting",
+                              "message": "The service is starting, the API is not available yet",
+                              "ready": False},
+                              status=503 if query_flag(request, "ready") else 200)
+    return json_response({"status": "We're good!", 
+                          "message": "Yes, everything works. You can go try the API now",
+                          "ready": True}, 
+                          status=200)
\ No newline at end of file
@@ -0,0 +1,64 @@
+import json
+from typing import Any, Callable, Dict, Tuple, Type
+
+from aiohttp import web
+
+from settings import JSON_CODEC
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+Dumps = Callable[[Any], bytes]
+Loads = Callable[[Any], Any]
+
+
+def _stdlib_dumps(document: Any) -> bytes:
+    return json.dumps(document).encode("utf-8")
+
+
+# Name -> (dumps, loads, decode errors). Every codec writes UTF-8 JSON.
+CODECS: Dict[str, Tuple[Dumps, Loads, Tuple[Type[Exception], ...]]] = {
+    "stdlib": (_stdlib_dumps, json.loads, (ValueError,)),
+}
+if msgspec is not None:
+    CODECS["msgspec"] = (msgspec.json.encode, msgspec.json.decode, (msgspec.DecodeError,))
+if orjson is not None:
+    CODECS["orjson"] = (orjson.dumps, orjson.loads, (orjson.JSONDecodeError,))
+
+
+def _select_codec(name: str) -> str:
+    if name == "auto":
+        return next(codec for codec in ("orjson", "msgspec", "stdlib") if codec in CODECS)
+    if name not in CODECS:
+        raise ValueError(f"JSON codec '{name}' is not available. "
+                         f"Use 'auto' or one of: {', '.join(sorted(CODECS))}")
+    return name
+
+
+codec_name: str = _select_codec(JSON_CODEC)
+dumps: Dumps
+loads: Loads
+dumps, loads, DECODE_ERRORS = CODECS[codec_name]
+
+
+def json_response(document: Any, status: int = 200) -> web.Response:
+    """
+    Same as aiohttp's web.json_response(), serialized with the selected codec.
+    """
+    return web.Response(body=dumps(document), status=status,
+                        content_type="application/json", charset="utf-8")
+
+
+async def read_json(request: web.Request) -> Any:
+    """
+    Parses the request body with the selected codec. Raises one of DECODE_ERRORS on invalid JSON.
+    """
+    return loads(await request.read())
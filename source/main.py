@@ -1,27 +1,58 @@
+# Imported first, it starts the clock of the startup report.
+from startup import report, add_startup_hooks, Hook
+import logging
+from typing import List
+
 from aiohttp import web
 
-from settings import APP_HOST, APP_PORT
+from settings import APP_HOST, APP_PORT, WORKERS, RESP_ENABLED, STARTUP_LAZY, NEGATIVE_CACHE_BLOOM
 from handlers import routes
-from scheduler import start_scheduler
-from setup_db import init_database
+from scheduler import start_scheduler, stop_scheduler
+from backends import init_storage, close_storage
+from negative_cache import start_negative_cache, stop_negative_cache
+from metrics import metrics_middleware
+
+report.imports_done()
 
 
 
-def start_app() -> web.Application:
+def start_app(run_expiry: bool = True) -> web.Application:
     """
     Initializes and configures:
-    1. the aiohttp web app.
-    2. database structure (if does not exists already)
+    1. the aiohttp web app (with the request metrics middleware).
+    2. storage engine (database structure if does not exists already, or the in-memory log replay)
     3. scheduler background daemon and expired keys cleaning on web app startup.
+       With several workers only one of them gets "run_expiry".
+    4. the RESP listener, if enabled in settings.RESP_ENABLED (imported only then).
+    5. the background load of the negative cache Bloom filter, if enabled in settings.NEGATIVE_CACHE_BLOOM.
+    The startup hooks are timed in the startup report (GET /_startup). With settings.STARTUP_LAZY
+    they run in the background once the app listens, and "GET /" tells when they are done.
     """
-    app = web.Application()
+    app = web.Application(middlewares=[metrics_middleware])
     app.add_routes(routes)
-    app.on_startup.append(init_database)
-    app.on_startup.append(start_scheduler)
+    hooks: List[Hook] = [init_storage]
+    if run_expiry:
+        hooks.append(start_scheduler)
+        app.on_cleanup.append(stop_scheduler)
+    if RESP_ENABLED:
+        from resp import start_resp_server, stop_resp_server
+        hooks.append(start_resp_server)
+        app.on_cleanup.append(stop_resp_server)
+    if NEGATIVE_CACHE_BLOOM:
+        hooks.append(start_negative_cache)
+        app.on_cleanup.append(stop_negative_cache)
+    app.on_cleanup.append(close_storage)
+    add_startup_hooks(app, hooks, lazy=STARTUP_LAZY)
 
     return app
 
 
 
 if __name__ == "__main__":
-    web.run_app(start_app(), host=APP_HOST, port=APP_PORT)
+    if WORKERS > 1:
+        from workers import run_workers
+        run_workers(WORKERS)
+    else:
+        logging.basicConfig()
+        logging.getLogger("key_value_storage").setLevel(logging.INFO)
+        web.run_app(start_app(), host=APP_HOST, port=APP_PORT)
@@ -0,0 +1,217 @@
+from aiohttp import web
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+
+LATENCY_BUCKETS: Tuple[float, ...] = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                                      0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+current_route: ContextVar[str] = ContextVar("current_route", default="background")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+    Base class of a metric family with a fixed list of label names.
+    """
+    kind: str = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names: Tuple[str, ...] = tuple(labels)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self.samples()
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """
+    Monotonically increasing value per label set.
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, *labels: str) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+                for labels, value in sorted(self._values.items())]
+
+
+class Gauge(Metric):
+    """
+    Value that goes up and down. With "collect", the value is read when the metrics are scraped.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 collect: Optional[Callable[[], Dict[LabelValues, float]]] = None) -> None:
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._collect = collect
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def get(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[str]:
+        values = dict(self._values)
+        if self._collect is not None:
+            try:
+                values.update(self._collect())
+            except Exception:
+                pass
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+                for labels, value in sorted(values.items())]
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values in fixed buckets, per label set.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets: Tuple[float, ...] = tuple(buckets)
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        counts = self._counts.get(labels)
+        if counts is None:
+            counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+            self._sums[labels] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[labels] += value
+
+    def count(self, *labels: str) -> int:
+        return sum(self._counts.get(labels, ()))
+
+    def samples(self) -> List[str]:
+        lines: List[str] = []
+        for labels, counts in sorted(self._counts.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                bucket_label = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, bucket_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {self._sums[labels]!r}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+MetricType = TypeVar("MetricType", bound=Metric)
+
+
+class MetricsRegistry:
+    """
+    Holds every metric of the process and renders them in the Prometheus text exposition format.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: MetricType) -> MetricType:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = (),
+              collect: Optional[Callable[[], Dict[LabelValues, float]]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labels, collect))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry: MetricsRegistry = MetricsRegistry()
+
+request_duration: Histogram = registry.histogram(
+    "kv_request_duration_seconds", "HTTP request latency per route.", ("method", "route", "status"))
+stage_duration: Histogram = registry.histogram(
+    "kv_stage_duration_seconds", "Latency of each processing stage per route.", ("route", "stage"))
+requests_in_progress: Gauge = registry.gauge(
+    "kv_requests_in_progress", "HTTP requests being processed.")
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Times the enclosed block as a processing stage of the current route
+    ("background" outside of HTTP requests, e.g. in the scheduler).
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_duration.observe(time.perf_counter() - started, current_route.get(), name)
+
+
+@web.middleware
+async def metrics_middleware(request: web.Request, handler: Callable) -> web.StreamResponse:
+    """
+    Records the latency and status of every HTTP request per route,
+    and exposes the route to the stage timers of the request.
+    """
+    resource = request.match_info.route.resource
+    route = resource.canonical if resource is not None else "unmatched"
+    token = current_route.set(route)
+    requests_in_progress.set(requests_in_progress.get() + 1)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as error:
+        status = error.status
+        raise
+    finally:
+        request_duration.observe(time.perf_counter() - started, request.method, route, str(status))
+        requests_in_progress.set(requests_in_progress.get() - 1)
+        current_route.reset(token)
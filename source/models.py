@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime
+from sqlalchemy import Column, String, Text, LargeBinary, DateTime
 from typing import Optional
 from datetime import datetime
 
@@ -8,9 +8,15 @@ from setup_db import Base
 class KeyValue(Base):
     """
     Represents a key-value model stored in the database.
+    Large values are stored compressed in "value_blob", "codec" names the encoding of the
+    row (see compression.py). Rows without a codec hold a string value in "value".
     """
     __tablename__ = "key_values"
 
-    key: str = Column(String(255), primary_key=True)
-    value: Optional[str] = Column(String(255), nullable=True)
-    expiration_time: Optional[datetime] = Column(DateTime, nullable=True)
+    # "C" collation on PostgreSQL: keys sort in code point order, the order of the key listing.
+    key: str = Column(String(255).with_variant(String(255, collation="C"), "postgresql"), primary_key=True)
+    value: Optional[str] = Column(Text, nullable=True)
+    value_blob: Optional[bytes] = Column(LargeBinary, nullable=True)
+    codec: Optional[str] = Column(String(16), nullable=True)
+    # Indexed, so the expiry sweep finds the expired rows without a full table scan.
+    expiration_time: Optional[datetime] = Column(DateTime, nullable=True, index=True)
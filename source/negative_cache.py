@@ -0,0 +1,253 @@
+from aiohttp.web import Application
+import asyncio
+from collections import OrderedDict
+import hashlib
+import logging
+import math
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from settings import (NEGATIVE_CACHE_ENABLED, NEGATIVE_CACHE_TTL, NEGATIVE_CACHE_MAX_KEYS, NEGATIVE_CACHE_BLOOM,
+                      NEGATIVE_CACHE_CAPACITY, NEGATIVE_CACHE_ERROR_RATE)
+from metrics import registry, LabelValues
+
+
+logger = logging.getLogger("key_value_storage.negative_cache")
+
+negative_lookups = registry.counter("kv_negative_cache_lookups_total",
+                                    "Lookups of keys missing from the record cache, by answer: "
+                                    "'bloom' or 'miss' when the negative cache answered 404, 'storage' otherwise.",
+                                    ("answer",))
+
+
+class BloomFilter:
+    """
+    Set of keys with no false negatives: "key in bloom" is False only for keys never added.
+    Sized for "capacity" keys with an "error_rate" share of false positives.
+    Keys can not be removed, the filter is rebuilt instead.
+    """
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        capacity = max(1, capacity)
+        self.size: int = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes: int = max(1, round(self.size / capacity * math.log(2)))
+        self.capacity = capacity
+        self.count: int = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str) -> Iterable[int]:
+        # Double hashing: the k positions come from two 64-bit halves of one digest.
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big") | 1
+        return ((first + index * second) % self.size for index in range(self.hashes))
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+        return None
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class NegativeCache:
+    """
+    Answers "this key does not exist" without a storage query, from:
+    - the miss set: keys the storage recently reported missing, each for "ttl" seconds,
+    - optionally a Bloom filter of every stored key, loaded from the storage in the background
+      on startup and kept up to date by the writes of this process. Deleted and expired keys
+      can not leave the filter: once they outnumber half of the keys it holds, or once it is
+      over capacity, it is rebuilt in the background.
+    A read records a miss only if no write of the key happened since the read started
+    (see read_token()), so a PUT racing a GET never leaves a stale miss behind.
+    """
+
+    def __init__(self, ttl: float, max_keys: int, bloom: bool = False,
+                 capacity: int = 1000000, error_rate: float = 0.01) -> None:
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.use_bloom = bloom
+        self.capacity = capacity
+        self.error_rate = error_rate
+
+        self.bloom: Optional[BloomFilter] = None
+        self._next_bloom: Optional[BloomFilter] = None
+        self._removed: int = 0
+        self._rebuild_task: Optional[asyncio.Task[None]] = None
+        self.loads: int = 0
+
+        self._misses: "OrderedDict[str, float]" = OrderedDict()
+        # Generation of the last write of the recently written keys, for read_token().
+        self._generation: int = 0
+        self._written: "OrderedDict[str, int]" = OrderedDict()
+        self._forgotten_generation: int = 0
+
+    def read_token(self) -> int:
+        """
+        Taken before a storage read, passed back to missed() after it.
+        """
+        return self._generation
+
+    def might_exist(self, key: str) -> bool:
+        """
+        Returns False when the key is known to be missing, True when the storage must be asked.
+        """
+        deadline = self._misses.get(key)
+        if deadline is not None:
+            if deadline > time.monotonic():
+                negative_lookups.inc(1, "miss")
+                return False
+            del self._misses[key]
+        if self.bloom is not None and key not in self.bloom:
+            negative_lookups.inc(1, "bloom")
+            return False
+        negative_lookups.inc(1, "storage")
+        return True
+
+    def missed(self, keys: Iterable[str], token: int) -> None:
+        """
+        Remembers keys the storage reported missing (or expired) in a read started at "token".
+        """
+        if self._forgotten_generation > token:
+            return None
+        deadline = time.monotonic() + self.ttl
+        for key in keys:
+            if self._written.get(key, -1) > token:
+                continue
+            self._misses[key] = deadline
+            self._misses.move_to_end(key)
+        while len(self._misses) > self.max_keys:
+            self._misses.popitem(last=False)
+        return None
+
+    def added(self, keys: Iterable[str]) -> None:
+        """
+        Takes the keys stored by this process out of the negative cache.
+        Call it once the write is committed.
+        """
+        self._generation += 1
+        for key in keys:
+            self._misses.pop(key, None)
+            self._written[key] = self._generation
+            self._written.move_to_end(key)
+            for bloom in (self.bloom, self._next_bloom):
+                if bloom is not None:
+                    bloom.add(key)
+        self._forget_writes()
+        if self.bloom is not None and self.bloom.count > self.bloom.capacity:
+            self.start_rebuild()
+        return None
+
+    def removed(self, count: int) -> None:
+        """
+        Counts keys deleted or expired by this process, which stay in the Bloom filter.
+        """
+        self._removed += count
+        if self.bloom is not None and self._removed > self.bloom.count / 2:
+            self.start_rebuild()
+        return None
+
+    def _forget_writes(self) -> None:
+        # Reads in flight for longer than the last max_keys writes can no longer tell
+        # whether their key was written meanwhile: missed() ignores them.
+        while len(self._written) > self.max_keys:
+            _, generation = self._written.popitem(last=False)
+            self._forgotten_generation = max(self._forgotten_generation, generation)
+        return None
+
+    def start_rebuild(self) -> None:
+        """
+        Starts loading a new Bloom filter from the storage in the background, unless one is loading.
+        """
+        if not self.use_bloom or (self._rebuild_task is not None and not self._rebuild_task.done()):
+            return None
+        self._rebuild_task = asyncio.get_running_loop().create_task(self._rebuild())
+        return None
+
+    async def _rebuild(self) -> None:
+        # Imported here: transfer.py updates the negative cache on imports.
+        from transfer import export_records
+
+        started = time.perf_counter()
+        expected = self.bloom.count - self._removed if self.bloom is not None else 0
+        # Created before the scan starts: keys written meanwhile are added to both filters.
+        self._next_bloom = BloomFilter(max(self.capacity, 2 * expected), self.error_rate)
+        removed_before = self._removed
+        try:
+            async for page in export_records(values=False):
+                for record in page:
+                    self._next_bloom.add(record.key)
+        except asyncio.CancelledError:
+            self._next_bloom = None
+            raise
+        except Exception:
+            self._next_bloom = None
+            logger.exception("Loading the negative cache Bloom filter failed, it is not used until the next rebuild")
+            return None
+
+        self.bloom, self._next_bloom = self._next_bloom, None
+        self._removed -= removed_before
+        self.loads += 1
+        logger.info(f"Negative cache Bloom filter loaded with {self.bloom.count} keys "
+                    f"in {time.perf_counter() - started:.3f}s")
+        return None
+
+    async def stop(self) -> None:
+        if self._rebuild_task is not None and not self._rebuild_task.done():
+            self._rebuild_task.cancel()
+            try:
+                await self._rebuild_task
+            except asyncio.CancelledError:
+                pass
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the negative cache occupancy.
+        """
+        return {"misses": len(self._misses),
+                "bloom_keys": self.bloom.count if self.bloom is not None else None,
+                "bloom_bytes": (self.bloom.size + 7) // 8 if self.bloom is not None else None,
+                "bloom_removed_keys": self._removed,
+                "bloom_loads": self.loads}
+
+    def __len__(self) -> int:
+        return len(self._misses)
+
+
+negative_cache: Optional[NegativeCache] = (NegativeCache(ttl=NEGATIVE_CACHE_TTL, max_keys=NEGATIVE_CACHE_MAX_KEYS,
+                                                         bloom=NEGATIVE_CACHE_BLOOM, capacity=NEGATIVE_CACHE_CAPACITY,
+                                                         error_rate=NEGATIVE_CACHE_ERROR_RATE)
+                                           if NEGATIVE_CACHE_ENABLED else None)
+
+
+def _negative_cache_entries() -> Dict[LabelValues, float]:
+    if negative_cache is None:
+        return {}
+    entries: Dict[LabelValues, float] = {("misses",): len(negative_cache)}
+    if negative_cache.bloom is not None:
+        entries[("bloom",)] = negative_cache.bloom.count
+    return entries
+
+
+registry.gauge("kv_negative_cache_entries", "Keys held by the negative cache: 'misses' in the miss set, "
+               "'bloom' added to the Bloom filter (deleted keys included).", ("kind",), collect=_negative_cache_entries)
+
+
+async def start_negative_cache(app: Application) -> None:
+    """
+    Starts loading the Bloom filter of the negative cache with the server startup, in the background.
+    Until it is loaded, only the miss set answers.
+    """
+    if negative_cache is not None:
+        negative_cache.start_rebuild()
+    return None
+
+async def stop_negative_cache(app: Application) -> None:
+    """
+    Stops a Bloom filter load in progress with the server shutdown.
+    """
+    if negative_cache is not None:
+        await negative_cache.stop()
+    return None
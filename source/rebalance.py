@@ -0,0 +1,73 @@
+"""
+Moves every record to the shard that owns it on the current hash ring.
+Run it after adding shards to settings.DB_SHARDS (or changing DB_SHARD_VNODES):
+
+    python rebalance.py [--batch-size 1000] [--dry-run]
+
+Each shard is read page by page in key order. Misplaced live records are copied to their
+owner (unless the owner already has the key, which then wins) and deleted from the shard
+they were read from; misplaced expired records are only deleted. Every page is committed
+on its own, so the tool can be stopped and started again at any time.
+Until a record is moved, the service looks it up on its new shard and does not find it.
+"""
+import argparse
+import asyncio
+from datetime import datetime
+from typing import Dict, List
+
+from settings import STORAGE_BACKEND
+from backends import storage, Record
+from setup_db import shards, ring
+
+
+async def rebalance_shard(shard: int, batch_size: int, dry_run: bool) -> Dict[str, int]:
+    """
+    Moves the misplaced records of one shard. Returns the shard counters.
+    """
+    counters: Dict[str, int] = {"scanned": 0, "moved": 0, "kept_on_owner": 0, "dropped_expired": 0}
+    after = None
+    while True:
+        page: List[Record] = await storage.scan_shard(shard, "", after, batch_size, live_only=False)
+        if not page:
+            return counters
+        counters["scanned"] += len(page)
+        after = page[-1].key
+
+        now = datetime.now()
+        misplaced = [record for record in page if ring.shard_for(record.key) != shard]
+        live = [record for record in misplaced if not record.is_expired(now)]
+        counters["dropped_expired"] += len(misplaced) - len(live)
+        if not misplaced:
+            continue
+
+        for owner, records in ring.group(live, key_of=lambda record: record.key).items():
+            if dry_run:
+                counters["moved"] += len(records)
+                continue
+            copied, kept = await storage.import_on_shard(owner, records)
+            counters["moved"] += copied
+            counters["kept_on_owner"] += kept
+        if not dry_run:
+            await storage.delete_many_on_shard(shard, [record.key for record in misplaced])
+
+
+async def rebalance(batch_size: int, dry_run: bool) -> None:
+    await storage.start()
+    try:
+        for shard in range(len(shards)):
+            counters = await rebalance_shard(shard, batch_size, dry_run)
+            print(f"{shards[shard].name}: " + ", ".join(f"{name} {value}" for name, value in counters.items()))
+    finally:
+        await storage.close()
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move records to the shards owning them.")
+    parser.add_argument("--batch-size", type=int, default=1000, help="records read per page and shard")
+    parser.add_argument("--dry-run", action="store_true", help="only count the records to move")
+    arguments = parser.parse_args()
+
+    if STORAGE_BACKEND != "sql":
+        raise SystemExit("Rebalancing only applies to the sql storage engine")
+    asyncio.run(rebalance(arguments.batch_size, arguments.dry_run))
@@ -0,0 +1,116 @@
+from datetime import datetime
+import json
+from typing import Any, Dict, List, Optional, Sequence
+
+from backends import storage, Record
+from cache import record_cache
+from metrics import stage
+from group_commit import group_commit
+from negative_cache import negative_cache
+
+
+async def read_record(key: str) -> Optional[Record]:
+    """
+    Returns the live record with the given key, from the cache or from the storage
+    (read-through). Keys the negative cache knows to be missing skip the storage.
+    Shared by the HTTP handlers and the RESP server.
+    """
+    cached = record_cache.get(key)
+    if cached is not None:
+        return Record(cached.key, cached.value, cached.expiration_time)
+
+    if negative_cache is not None and not negative_cache.might_exist(key):
+        return None
+    token = negative_cache.read_token() if negative_cache is not None else 0
+    cache_token = record_cache.read_token()
+
+    with stage("storage"):
+        record: Optional[Record] = await storage.get(key)
+
+    if record is not None:
+        record_cache.set(record.key, record.value, record.expiration_time, cache_token)
+    elif negative_cache is not None:
+        negative_cache.missed((key,), token)
+    return record
+
+
+async def read_records(keys: Sequence[str]) -> Dict[str, Record]:
+    """
+    Returns the live records among the given keys. Cached keys are served from the cache,
+    keys the negative cache knows to be missing are skipped, the others are loaded with
+    one storage call; expired records are left out.
+    """
+    records: Dict[str, Record] = {}
+    missed: List[str] = []
+    for key in keys:
+        cached = record_cache.get(key)
+        if cached is not None:
+            records[key] = Record(cached.key, cached.value, cached.expiration_time)
+        elif negative_cache is None or negative_cache.might_exist(key):
+            missed.append(key)
+
+    if missed:
+        token = negative_cache.read_token() if negative_cache is not None else 0
+        cache_token = record_cache.read_token()
+        with stage("storage"):
+            found: Dict[str, Record] = await storage.get_many(missed)
+        now = datetime.now()
+        for record in found.values():
+            if not record.is_expired(now):
+                records[record.key] = record
+                record_cache.set(record.key, record.value, record.expiration_time, cache_token)
+        if negative_cache is not None:
+            negative_cache.missed((key for key in missed if key not in records), token)
+    return records
+
+
+async def write_record(record: Record) -> bool:
+    """
+    Stores the record unless a live record with its key exists. Returns False if one does.
+    With group commit enabled, the write is batched with the concurrent ones.
+    A stored record replaces whatever the cache held for its key.
+    """
+    with stage("storage"):
+        if group_commit is not None:
+            added: bool = await group_commit.put(record)
+        else:
+            added = await storage.put_if_absent(record)
+    if added:
+        record_cache.invalidate(record.key)
+        if negative_cache is not None:
+            negative_cache.added((record.key,))
+    return added
+
+
+async def remove_record(key: str) -> bool:
+    """
+    Deletes a record and drops it from the cache. Returns False if nothing was deleted.
+    """
+    with stage("storage"):
+        deleted: bool = await (group_commit.delete(key) if group_commit is not None else storage.delete(key))
+    record_cache.invalidate(key)
+    if deleted and negative_cache is not None:
+        negative_cache.removed(1)
+    return deleted
+
+
+async def remove_records(keys: Sequence[str]) -> List[str]:
+    """
+    Deletes many records, not all-or-nothing, and drops them from the cache.
+    Returns the keys of the deleted records that were live.
+    """
+    with stage("storage"):
+        deleted: List[str] = await storage.delete_many(keys)
+    record_cache.invalidate_many(keys)
+    if negative_cache is not None:
+        negative_cache.removed(len(deleted))
+    return deleted
+
+
+def value_text(value: Any) -> str:
+    """
+    Text form of a stored value: strings as they are, other JSON values as JSON.
+    """
+    if isinstance(value, str):
+        return value
+    return json.dumps(value)
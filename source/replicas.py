@@ -0,0 +1,53 @@
+from collections import OrderedDict
+import time
+from typing import Iterable
+
+
+class RecentWrites:
+    """
+    Keys written by this process in the last "window" seconds, which must be read from the
+    primary database (read-your-writes) until the read replicas have caught up with them.
+    At most "max_keys" keys are remembered: when older keys are dropped to make room,
+    every key counts as recent until the window of the dropped ones is over.
+    """
+
+    def __init__(self, window: float, max_keys: int) -> None:
+        self.window = window
+        self.max_keys = max_keys
+        self._deadlines: "OrderedDict[str, float]" = OrderedDict()
+        self._all_until: float = 0.0
+
+    def touch(self, keys: Iterable[str]) -> None:
+        """
+        Marks the keys as written now.
+        """
+        if self.window <= 0:
+            return None
+        now = time.monotonic()
+        deadline = now + self.window
+        for key in keys:
+            self._deadlines[key] = deadline
+            self._deadlines.move_to_end(key)
+
+        # The deadlines are in insertion order, so the passed ones are at the front.
+        while self._deadlines:
+            key, oldest = next(iter(self._deadlines.items()))
+            if oldest > now and len(self._deadlines) <= self.max_keys:
+                break
+            del self._deadlines[key]
+            if oldest > now:
+                self._all_until = max(self._all_until, oldest)
+        return None
+
+    def is_recent(self, key: str) -> bool:
+        now = time.monotonic()
+        if now < self._all_until:
+            return True
+        deadline = self._deadlines.get(key)
+        return deadline is not None and deadline > now
+
+    def any_recent(self, keys: Iterable[str]) -> bool:
+        return any(self.is_recent(key) for key in keys)
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
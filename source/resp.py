@@ -0,0 +1,367 @@
+import asyncio
+from collections import deque
+from datetime import datetime, timedelta
+import logging
+import math
+import socket
+import time
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple, Union
+
+from aiohttp.web import Application
+
+from settings import TLL_DEFAULT, RESP_HOST, RESP_PORT, MULTI_MAX_KEYS, WORKERS, MAX_VALUE_SIZE
+from backends import Record
+from records import read_record, read_records, write_record, remove_records, value_text
+from metrics import registry, current_route, LabelValues
+
+
+logger = logging.getLogger("key_value_storage.resp")
+
+MAX_BULK_LENGTH: int = 16 * 1024 * 1024
+MAX_ARGUMENTS: int = MULTI_MAX_KEYS + 1
+MAX_INLINE_LENGTH: int = 64 * 1024
+MAX_PENDING_COMMANDS: int = 1024
+
+resp_command_duration = registry.histogram("kv_resp_command_duration_seconds",
+                                           "Duration of RESP commands, by command.", ("command",))
+
+
+class ProtocolError(Exception):
+    """
+    Raised on a malformed RESP request. The connection is closed after the error reply.
+    """
+    pass
+
+
+class CommandError(Exception):
+    """
+    Raised by a command handler. Sent back as an "-ERR ..." reply, the connection stays open.
+    """
+    pass
+
+
+def simple(text: str) -> bytes:
+    return b"+" + text.encode("utf-8") + b"\r\n"
+
+
+def error(text: str) -> bytes:
+    return b"-" + text.encode("utf-8") + b"\r\n"
+
+
+def integer(number: int) -> bytes:
+    return b":" + str(number).encode("ascii") + b"\r\n"
+
+
+def bulk(value: Optional[bytes]) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    return b"$" + str(len(value)).encode("ascii") + b"\r\n" + value + b"\r\n"
+
+
+def array(items: List[bytes]) -> bytes:
+    return b"*" + str(len(items)).encode("ascii") + b"\r\n" + b"".join(items)
+
+
+def _text(argument: bytes) -> str:
+    try:
+        return argument.decode("utf-8")
+    except UnicodeDecodeError:
+        raise CommandError("ERR keys and values must be valid UTF-8")
+
+
+def _integer_argument(argument: bytes) -> int:
+    try:
+        return int(argument)
+    except ValueError:
+        raise CommandError("ERR value is not an integer or out of range")
+
+
+def parse_command(buffer: bytearray, position: int) -> Optional[Tuple[List[bytes], int]]:
+    """
+    Parses one command starting at "position": a RESP array of bulk strings, or an
+    inline command (space-separated words, as sent by telnet).
+    Returns the arguments and the position after the command, or None when the
+    command is not complete yet.
+    """
+    line_end = buffer.find(b"\n", position)
+    if line_end < 0:
+        if len(buffer) - position > MAX_INLINE_LENGTH:
+            raise ProtocolError("ERR Protocol error: too big inline request")
+        return None
+
+    if buffer[position] != ord("*"):
+        return bytes(buffer[position:line_end]).split(), line_end + 1
+
+    try:
+        count = int(buffer[position + 1:line_end])
+    except ValueError:
+        raise ProtocolError("ERR Protocol error: invalid multibulk length")
+    if count > MAX_ARGUMENTS:
+        raise ProtocolError("ERR Protocol error: too many arguments")
+
+    position = line_end + 1
+    arguments: List[bytes] = []
+    for _ in range(count):
+        line_end = buffer.find(b"\n", position)
+        if line_end < 0:
+            return None
+        if buffer[position] != ord("$"):
+            raise ProtocolError("ERR Protocol error: expected '$'")
+        try:
+            length = int(buffer[position + 1:line_end])
+        except ValueError:
+            raise ProtocolError("ERR Protocol error: invalid bulk length")
+        if length < 0 or length > MAX_BULK_LENGTH:
+            raise ProtocolError("ERR Protocol error: invalid bulk length")
+
+        position = line_end + 1
+        if len(buffer) < position + length + 2:
+            return None
+        if buffer[position + length:position + length + 2] != b"\r\n":
+            raise ProtocolError("ERR Protocol error: bulk string is not terminated")
+        arguments.append(bytes(buffer[position:position + length]))
+        position += length + 2
+    return arguments, position
+
+
+async def command_ping(arguments: List[bytes]) -> bytes:
+    if len(arguments) > 2:
+        raise CommandError("ERR wrong number of arguments for 'ping' command")
+    return bulk(arguments[1]) if len(arguments) == 2 else simple("PONG")
+
+
+async def command_get(arguments: List[bytes]) -> bytes:
+    if len(arguments) != 2:
+        raise CommandError("ERR wrong number of arguments for 'get' command")
+    record = await read_record(_text(arguments[1]))
+    return bulk(value_text(record.value).encode("utf-8") if record else None)
+
+
+async def command_set(arguments: List[bytes]) -> bytes:
+    """
+    SET key value [NX] [EX seconds | PX milliseconds]
+    Records can not be modified, so SET always behaves as "SET ... NX": it replies
+    "+OK" when the record was added and a null reply when a live record exists.
+    The TTL is rounded up to whole minutes, the granularity of the HTTP "tll";
+    without EX / PX the default TLL is used.
+    """
+    if len(arguments) < 3:
+        raise CommandError("ERR wrong number of arguments for 'set' command")
+    if len(arguments[2]) > MAX_VALUE_SIZE:
+        raise CommandError(f"ERR value is larger than {MAX_VALUE_SIZE} bytes")
+
+    tll_seconds: float = TLL_DEFAULT * 60
+    options = iter(arguments[3:])
+    for option in options:
+        name = option.upper()
+        if name == b"NX":
+            continue
+        if name in (b"EX", b"PX"):
+            amount = _integer_argument(next(options, b""))
+            if amount <= 0:
+                raise CommandError("ERR invalid expire time in 'set' command")
+            tll_seconds = amount if name == b"EX" else amount / 1000
+        else:
+            raise CommandError("ERR syntax error")
+
+    tll = math.ceil(tll_seconds / 60)
+    record = Record(_text(arguments[1]), _text(arguments[2]), datetime.now() + timedelta(minutes=tll))
+    added = await write_record(record)
+    return simple("OK") if added else bulk(None)
+
+
+async def command_del(arguments: List[bytes]) -> bytes:
+    if len(arguments) < 2:
+        raise CommandError("ERR wrong number of arguments for 'del' command")
+    keys = list(dict.fromkeys(_text(argument) for argument in arguments[1:]))
+    deleted = await remove_records(keys)
+    return integer(len(deleted))
+
+
+async def command_mget(arguments: List[bytes]) -> bytes:
+    if len(arguments) < 2:
+        raise CommandError("ERR wrong number of arguments for 'mget' command")
+    keys = [_text(argument) for argument in arguments[1:]]
+    records = await read_records(list(dict.fromkeys(keys)))
+    return array([bulk(value_text(records[key].value).encode("utf-8") if key in records else None)
+                  for key in keys])
+
+
+async def command_ttl(arguments: List[bytes]) -> bytes:
+    """
+    Remaining time to live in seconds, -1 for a record without expiration
+    and -2 for a missing (or expired) record.
+    """
+    if len(arguments) != 2:
+        raise CommandError("ERR wrong number of arguments for 'ttl' command")
+    record = await read_record(_text(arguments[1]))
+    if record is None:
+        return integer(-2)
+    if record.expiration_time is None:
+        return integer(-1)
+    return integer(max(0, round((record.expiration_time - datetime.now()).total_seconds())))
+
+
+async def command_command(arguments: List[bytes]) -> bytes:
+    # Sent by redis-cli on connect, an empty reply is enough.
+    return array([])
+
+
+COMMANDS: Dict[bytes, Callable[[List[bytes]], Awaitable[bytes]]] = {b"PING": command_ping,
+                                                                     b"GET": command_get,
+                                                                     b"SET": command_set,
+                                                                     b"DEL": command_del,
+                                                                     b"MGET": command_mget,
+                                                                     b"TTL": command_ttl,
+                                                                     b"COMMAND": command_command}
+
+
+async def run_command(arguments: List[bytes]) -> bytes:
+    """
+    Runs one command and returns its reply. Storage stages are labelled "RESP <command>".
+    """
+    name = arguments[0].upper()
+    handler = COMMANDS.get(name)
+    if handler is None:
+        return error(f"ERR unknown command '{name.decode('utf-8', 'replace')}'")
+
+    started = time.perf_counter()
+    route_token = current_route.set(f"RESP {name.decode('ascii')}")
+    try:
+        return await handler(arguments)
+    except CommandError as command_error:
+        return error(str(command_error))
+    except Exception:
+        logger.exception("RESP command failed")
+        return error("ERR internal error")
+    finally:
+        current_route.reset(route_token)
+        resp_command_duration.observe(time.perf_counter() - started, name.decode("ascii"))
+
+
+class RespProtocol(asyncio.Protocol):
+    """
+    One client connection.
+    Received data is parsed right away into a queue of commands, which a task runs
+    one after the other. The replies of every command received together (a pipeline)
+    are sent back in order with a single write.
+    """
+
+    def __init__(self) -> None:
+        self._transport: Optional[asyncio.Transport] = None
+        self._buffer = bytearray()
+        self._commands: Deque[Union[List[bytes], ProtocolError]] = deque()
+        self._received = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._writable.set()
+        self._reading_paused: bool = False
+        self._closed: bool = False
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self._transport = transport
+        open_connections.add(self)
+        self._task = asyncio.get_running_loop().create_task(self._serve())
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self._closed = True
+        open_connections.discard(self)
+        self._received.set()
+        self._writable.set()
+
+    def close(self) -> None:
+        if self._transport is not None:
+            self._transport.close()
+
+    def pause_writing(self) -> None:
+        self._writable.clear()
+
+    def resume_writing(self) -> None:
+        self._writable.set()
+
+    def data_received(self, data: bytes) -> None:
+        self._buffer += data
+        position = 0
+        try:
+            while position < len(self._buffer):
+                parsed = parse_command(self._buffer, position)
+                if parsed is None:
+                    break
+                arguments, position = parsed
+                if arguments:
+                    self._commands.append(arguments)
+        except ProtocolError as protocol_error:
+            self._commands.append(protocol_error)
+            self._transport.pause_reading()
+            self._reading_paused = True
+        del self._buffer[:position]
+
+        if len(self._commands) > MAX_PENDING_COMMANDS and not self._reading_paused:
+            self._transport.pause_reading()
+            self._reading_paused = True
+        self._received.set()
+
+    async def _serve(self) -> None:
+        while not self._closed:
+            await self._received.wait()
+            self._received.clear()
+
+            replies: List[bytes] = []
+            close: bool = False
+            while self._commands and not close:
+                command = self._commands.popleft()
+                if isinstance(command, ProtocolError):
+                    replies.append(error(str(command)))
+                    close = True
+                elif command[0].upper() == b"QUIT":
+                    replies.append(simple("OK"))
+                    close = True
+                else:
+                    replies.append(await run_command(command))
+
+            if self._closed:
+                return None
+            if replies:
+                self._transport.write(b"".join(replies))
+            if close:
+                self._transport.close()
+                return None
+            await self._writable.wait()
+            if self._reading_paused and not self._closed:
+                self._reading_paused = False
+                self._transport.resume_reading()
+        return None
+
+
+resp_server: Optional[asyncio.AbstractServer] = None
+open_connections: Set[RespProtocol] = set()
+
+
+def _open_connections() -> Dict[LabelValues, float]:
+    return {(): len(open_connections)}
+
+
+registry.gauge("kv_resp_connections", "Open RESP client connections.", collect=_open_connections)
+
+
+async def start_resp_server(app: Application) -> None:
+    """
+    Starts the RESP listener with the web app startup.
+    With several workers, every worker binds RESP_PORT with SO_REUSEPORT.
+    """
+    global resp_server
+    loop = asyncio.get_running_loop()
+    resp_server = await loop.create_server(RespProtocol, RESP_HOST, RESP_PORT,
+                                           reuse_port=WORKERS > 1 and hasattr(socket, "SO_REUSEPORT"))
+    return None
+
+async def stop_resp_server(app: Application) -> None:
+    """
+    Stops accepting RESP connections and closes the open ones with the web app shutdown.
+    """
+    if resp_server is not None:
+        resp_server.close()
+        for connection in list(open_connections):
+            connection.close()
+        await resp_server.wait_closed()
+    return None
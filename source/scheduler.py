@@ -1,45 +1,125 @@
-from sqlalchemy import select, delete
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.executors.asyncio import AsyncIOExecutor
-from datetime import datetime
 from aiohttp.web import Application
-from typing import Dict
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+import asyncio
+import time
 
-from models import KeyValue
-from setup_db import scheduler_db_call
+from settings import EXPIRY_INTERVAL, EXPIRY_BATCH_SIZE, EXPIRY_MAX_BATCHES
+from backends import storage
+from cache import record_cache
+from negative_cache import negative_cache
+from metrics import registry, LabelValues
 
+if TYPE_CHECKING:
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
-executors: Dict[str, AsyncIOExecutor] = {'default': AsyncIOExecutor()}
-delete_record_timer: AsyncIOScheduler = AsyncIOScheduler(executors=executors)
+
+# Created by start_scheduler(), so APScheduler is only imported by the process running the expiry.
+delete_record_timer: Optional["AsyncIOScheduler"] = None
+startup_reconciliation: Optional[asyncio.Task[None]] = None
+
+
+def _scheduled_jobs() -> Dict[LabelValues, float]:
+    return {(): len(delete_record_timer.get_jobs()) if delete_record_timer is not None else 0}
+
+
+registry.gauge("kv_scheduler_jobs", "Jobs pending in the scheduler job store.", collect=_scheduled_jobs)
+expiry_backlog = registry.gauge("kv_expiry_backlog",
+                                "Expired records left for the next sweep, measured after each sweep.")
+expired_records = registry.counter("kv_expired_records_total", "Records deleted by the expiry sweep.")
+expiry_tick_duration = registry.histogram("kv_expiry_tick_duration_seconds", "Duration of one expiry sweep.")
 
 async def start_scheduler(app: Application) -> None:
     """
     Starts the scheduler with the server startup.
-    1. Checks for expired keys in the key-value storage and deletes those.
-    2. Runs the scheduler daemon to schedule the tasks during the session.
+    1. Registers the periodic expiry sweep and runs the scheduler daemon.
+    2. Starts deleting the records expired while the service was down, in the background,
+       so the startup time does not depend on the number of stored keys.
+    The schedule itself is the indexed "expiration_time" of the stored records,
+    so nothing is lost on a restart or a crash.
     """
-    await delete_expired_records()
+    global delete_record_timer, startup_reconciliation
+
+    if delete_record_timer is None:
+        from apscheduler.schedulers.asyncio import AsyncIOScheduler
+        from apscheduler.executors.asyncio import AsyncIOExecutor
+        delete_record_timer = AsyncIOScheduler(executors={'default': AsyncIOExecutor()})
+
+    if not delete_record_timer.get_job("expiry_sweep"):
+        delete_record_timer.add_job(expire_records_tick, 'interval', seconds=EXPIRY_INTERVAL,
+                                    id="expiry_sweep", max_instances=1, coalesce=True)
 
     if not delete_record_timer.running:
         delete_record_timer.start()
 
-async def delete_on_tll_timeout(key: str) -> None:
+    if startup_reconciliation is None or startup_reconciliation.done():
+        startup_reconciliation = asyncio.create_task(delete_expired_records())
+
+async def stop_scheduler(app: Application) -> None:
     """
-    Deletes a single record on its TTL expiration.
+    Stops the background reconciliation and the scheduler with the server shutdown.
     """
-    async for db in scheduler_db_call():
-        record = await db.execute(select(KeyValue).where(KeyValue.key == key))
-        record_found = record.scalar_one_or_none()
-        if record_found:
-            await db.delete(record_found)
-            await db.commit()
+    if startup_reconciliation is not None and not startup_reconciliation.done():
+        startup_reconciliation.cancel()
+        try:
+            await startup_reconciliation
+        except asyncio.CancelledError:
+            pass
+
+    if delete_record_timer is not None and delete_record_timer.running:
+        delete_record_timer.shutdown(wait=False)
     return None
 
+async def expire_records_tick() -> int:
+    """
+    One run of the expiry engine.
+    Every shard of the storage is swept concurrently, in batches of EXPIRY_BATCH_SIZE,
+    at most EXPIRY_MAX_BATCHES batches per shard and tick, so the cost of a tick depends on
+    the number of expiring keys and not on the total number of stored keys.
+    Whatever is left is picked up by the next tick.
+    Returns the number of deleted records.
+    """
+    started = time.perf_counter()
+    swept = await asyncio.gather(*(expire_shard(shard) for shard in range(storage.shard_count())))
+
+    expiry_backlog.set(sum(backlog for _, backlog in swept))
+    expiry_tick_duration.observe(time.perf_counter() - started)
+    return sum(deleted for deleted, _ in swept)
+
+async def expire_shard(shard: int) -> Tuple[int, int]:
+    """
+    Sweeps one shard. Returns the number of deleted records and the backlog left,
+    which is only counted when every batch was full.
+    """
+    deleted: int = 0
+    for _ in range(EXPIRY_MAX_BATCHES):
+        keys = await delete_expired_batch(EXPIRY_BATCH_SIZE, shard)
+        deleted += len(keys)
+        if len(keys) < EXPIRY_BATCH_SIZE:
+            return deleted, 0
+    return deleted, await storage.count_expired(shard)
+
+async def delete_expired_batch(limit: int, shard: int = 0) -> List[str]:
+    """
+    Deletes up to "limit" expired records of a shard through the storage engine.
+    Returns the deleted keys.
+    """
+    keys: List[str] = await storage.expire(limit, shard)
+    record_cache.invalidate_many(keys)
+    if negative_cache is not None:
+        negative_cache.removed(len(keys))
+    expired_records.inc(len(keys))
+    return keys
+
 async def delete_expired_records() -> None:
     """
-    Deletes all expired records on server startup.
+    Deletes all expired records left from before the server startup, batch by batch,
+    the shards concurrently. Runs as a background task while requests are served:
+    every batch is a short transaction and the loop yields to the event loop in between.
     """
-    async for db in scheduler_db_call():
-        await db.execute(delete(KeyValue).where(KeyValue.expiration_time <= datetime.now()))
-        await db.commit()
-    return None
\ No newline at end of file
+    await asyncio.gather(*(delete_expired_on_shard(shard) for shard in range(storage.shard_count())))
+    return None
+
+async def delete_expired_on_shard(shard: int) -> None:
+    while len(await delete_expired_batch(EXPIRY_BATCH_SIZE, shard)) == EXPIRY_BATCH_SIZE:
+        await asyncio.sleep(0)
+    return None
@@ -1,13 +1,133 @@
 import os
+from typing import List
 from dotenv import load_dotenv
 
 load_dotenv()
 
 DEBUG: bool = os.environ.get("DEBUG", "True") == "True"
 
-DB_URL = "sqlite+aiosqlite:///test.db" if DEBUG else os.environ.get("DB_URL")
+DB_URL = os.environ.get("DB_URL", "sqlite+aiosqlite:///test.db") if DEBUG else os.environ.get("DB_URL")
 
 APP_HOST: str = "localhost" if DEBUG else os.environ.get("APP_HOST")
 APP_PORT: int = 6969 if DEBUG else int(os.environ.get("APP_PORT"))
 
 TLL_DEFAULT: int = int(os.environ.get("TLL_DEFAULT", "30"))
+
+# In-process read-through cache for GET /{key}. Disabled by default.
+# CACHE_POLICY is "lru" or "lfu". CACHE_MAX_AGE (seconds) bounds how long an entry
+# may be served without going back to the DB (0 disables the bound, TTL still applies).
+CACHE_ENABLED: bool = os.environ.get("CACHE_ENABLED", "False") == "True"
+CACHE_POLICY: str = os.environ.get("CACHE_POLICY", "lru").lower()
+CACHE_MAX_ENTRIES: int = int(os.environ.get("CACHE_MAX_ENTRIES", "10000"))
+CACHE_MAX_BYTES: int = int(os.environ.get("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_MAX_AGE: int = int(os.environ.get("CACHE_MAX_AGE", "60"))
+
+# Opt-in negative cache answering 404 without a DB query. Keys found missing are remembered for
+# NEGATIVE_CACHE_TTL seconds (at most NEGATIVE_CACHE_MAX_KEYS of them). NEGATIVE_CACHE_BLOOM adds a
+# Bloom filter of every stored key, sized for NEGATIVE_CACHE_CAPACITY keys at NEGATIVE_CACHE_ERROR_RATE
+# false positives. Both only see the writes of this process: with other writers on the same DB a new
+# key may answer 404 for up to NEGATIVE_CACHE_TTL seconds, and the Bloom filter is not safe at all.
+NEGATIVE_CACHE_ENABLED: bool = os.environ.get("NEGATIVE_CACHE_ENABLED", "False") == "True"
+NEGATIVE_CACHE_TTL: float = float(os.environ.get("NEGATIVE_CACHE_TTL", "5"))
+NEGATIVE_CACHE_MAX_KEYS: int = int(os.environ.get("NEGATIVE_CACHE_MAX_KEYS", "100000"))
+NEGATIVE_CACHE_BLOOM: bool = os.environ.get("NEGATIVE_CACHE_BLOOM", "False") == "True"
+NEGATIVE_CACHE_CAPACITY: int = int(os.environ.get("NEGATIVE_CACHE_CAPACITY", "1000000"))
+NEGATIVE_CACHE_ERROR_RATE: float = float(os.environ.get("NEGATIVE_CACHE_ERROR_RATE", "0.01"))
+
+# Batched TTL expiry engine. Every EXPIRY_INTERVAL seconds the scheduler deletes expired
+# records in batches of EXPIRY_BATCH_SIZE, at most EXPIRY_MAX_BATCHES batches per run.
+EXPIRY_INTERVAL: int = int(os.environ.get("EXPIRY_INTERVAL", "5"))
+EXPIRY_BATCH_SIZE: int = int(os.environ.get("EXPIRY_BATCH_SIZE", "1000"))
+EXPIRY_MAX_BATCHES: int = int(os.environ.get("EXPIRY_MAX_BATCHES", "10"))
+
+# Number of keys per "IN (...)" query and rows per multi-row INSERT/DELETE in bulk operations.
+BULK_CHUNK_SIZE: int = int(os.environ.get("BULK_CHUNK_SIZE", "500"))
+
+# Maximum number of keys in one "POST /_mget" or "POST /_mdelete" request.
+MULTI_MAX_KEYS: int = int(os.environ.get("MULTI_MAX_KEYS", "10000"))
+
+# Opt-in group commit of single-key PUT / DELETE: concurrent writes wait up to GROUP_COMMIT_WINDOW
+# milliseconds to be applied together in one transaction, at most GROUP_COMMIT_MAX_BATCH per batch.
+GROUP_COMMIT_ENABLED: bool = os.environ.get("GROUP_COMMIT_ENABLED", "False") == "True"
+GROUP_COMMIT_WINDOW: float = float(os.environ.get("GROUP_COMMIT_WINDOW", "2"))
+GROUP_COMMIT_MAX_BATCH: int = int(os.environ.get("GROUP_COMMIT_MAX_BATCH", "256"))
+
+# Values: MAX_VALUE_SIZE (bytes of JSON text) is the largest accepted value. Values of at least
+# VALUE_COMPRESSION_THRESHOLD bytes are stored compressed with VALUE_CODEC ("zlib", "lz4" or "none").
+# GET streams values of at least VALUE_STREAM_THRESHOLD bytes instead of building the whole response.
+MAX_VALUE_SIZE: int = int(os.environ.get("MAX_VALUE_SIZE", str(1024 * 1024)))
+VALUE_CODEC: str = os.environ.get("VALUE_CODEC", "zlib").lower()
+VALUE_COMPRESSION_THRESHOLD: int = int(os.environ.get("VALUE_COMPRESSION_THRESHOLD", "1024"))
+VALUE_COMPRESSION_LEVEL: int = int(os.environ.get("VALUE_COMPRESSION_LEVEL", "6"))
+VALUE_STREAM_THRESHOLD: int = int(os.environ.get("VALUE_STREAM_THRESHOLD", str(64 * 1024)))
+
+# JSON library of the HTTP API: "orjson" or "msgspec" (when installed), "stdlib", or "auto"
+# for the fastest one available.
+JSON_CODEC: str = os.environ.get("JSON_CODEC", "auto").lower()
+
+# Optional TCP listener speaking a subset of the Redis protocol (RESP), next to the HTTP API.
+RESP_ENABLED: bool = os.environ.get("RESP_ENABLED", "False") == "True"
+RESP_HOST: str = os.environ.get("RESP_HOST", APP_HOST or "localhost")
+RESP_PORT: int = int(os.environ.get("RESP_PORT", "6380"))
+
+# Streaming NDJSON import/export: records committed per import chunk and rows read per export page.
+IMPORT_CHUNK_SIZE: int = int(os.environ.get("IMPORT_CHUNK_SIZE", "1000"))
+EXPORT_PAGE_SIZE: int = int(os.environ.get("EXPORT_PAGE_SIZE", "1000"))
+
+# Key listing (GET /_keys): keys returned when the request has no "limit", and the largest accepted "limit".
+KEYS_DEFAULT_LIMIT: int = int(os.environ.get("KEYS_DEFAULT_LIMIT", "1000"))
+KEYS_MAX_LIMIT: int = int(os.environ.get("KEYS_MAX_LIMIT", "100000"))
+
+# Storage engine: "sql" (SQLAlchemy, DB_URL) or "memory" (in-process dict, single node only).
+# The memory engine persists its writes to AOF_PATH when it is set, fsync-ed every
+# AOF_FSYNC_INTERVAL milliseconds (0 means fsync before every write returns).
+STORAGE_BACKEND: str = os.environ.get("STORAGE_BACKEND", "sql").lower()
+AOF_PATH: str = os.environ.get("AOF_PATH", "")
+AOF_FSYNC_INTERVAL: int = int(os.environ.get("AOF_FSYNC_INTERVAL", "1000"))
+
+# SQL connection pools. Client requests use DB_POOL_SIZE + DB_MAX_OVERFLOW connections,
+# the expiry scheduler has its own pool of SCHEDULER_POOL_SIZE connections.
+# DB_POOL_RECYCLE (seconds, -1 disables) replaces connections older than that.
+# DB_STATEMENT_CACHE_SIZE sizes the SQLAlchemy compiled statement cache and,
+# on PostgreSQL, the asyncpg prepared statement cache of each connection.
+DB_POOL_SIZE: int = int(os.environ.get("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW: int = int(os.environ.get("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT: float = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+DB_POOL_PRE_PING: bool = os.environ.get("DB_POOL_PRE_PING", "False") == "True"
+DB_POOL_RECYCLE: int = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+SCHEDULER_POOL_SIZE: int = int(os.environ.get("SCHEDULER_POOL_SIZE", "2"))
+DB_STATEMENT_CACHE_SIZE: int = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", "500"))
+
+# PRAGMA statements run on every new SQLite connection, separated by ";". Empty disables them.
+SQLITE_PRAGMAS: List[str] = [pragma.strip() for pragma in os.environ.get(
+    "SQLITE_PRAGMAS", "journal_mode=WAL;synchronous=NORMAL;busy_timeout=5000;cache_size=-65536;temp_store=MEMORY"
+).split(";") if pragma.strip()]
+
+# Key-space sharding: keys are spread over these databases with a consistent hash ring.
+# Entries are separated by whitespace, each is "name=url" or a bare url (named "shard<position>").
+# Shard names place the keys on the ring, so keep them when adding shards. Defaults to DB_URL alone.
+DB_SHARDS: List[str] = os.environ.get("DB_SHARDS", "").split() or [DB_URL]
+DB_SHARD_VNODES: int = int(os.environ.get("DB_SHARD_VNODES", "64"))
+
+# Read replicas: single-key GETs, "POST /_mget" and bulks of GET operations only read from them,
+# everything else (writes, listings, exports) goes to the primary. Entries are separated by whitespace,
+# each is "shard=url" (shard named as in DB_SHARDS) or a bare url for the first shard; a shard may have several.
+# A key written by this process is read from the primary for READ_YOUR_WRITES_WINDOW seconds,
+# which should exceed the replication lag. At most READ_YOUR_WRITES_MAX_KEYS keys are tracked,
+# beyond that every read goes to the primary until the window of the dropped keys is over.
+DB_READ_REPLICAS: List[str] = os.environ.get("DB_READ_REPLICAS", "").split()
+READ_YOUR_WRITES_WINDOW: float = float(os.environ.get("READ_YOUR_WRITES_WINDOW", "5"))
+READ_YOUR_WRITES_MAX_KEYS: int = int(os.environ.get("READ_YOUR_WRITES_MAX_KEYS", "100000"))
+
+# With STARTUP_LAZY the app listens right away and prepares the storage, the expiry scheduler
+# and the RESP listener in the background. "GET /?ready=true" answers 503 until then, like
+# every other request but "GET /", "GET /_metrics" and "GET /_startup".
+STARTUP_LAZY: bool = os.environ.get("STARTUP_LAZY", "False") == "True"
+
+# Number of worker processes serving APP_PORT. With more than one, a pre-fork master
+# process manages the workers: SIGHUP restarts them one by one, SIGTERM stops them gracefully.
+# WORKER_REUSE_PORT lets each worker bind its own SO_REUSEPORT socket (kernel load balancing);
+# otherwise the workers share one listening socket inherited from the master.
+WORKERS: int = int(os.environ.get("WORKERS", "1"))
+WORKER_REUSE_PORT: bool = os.environ.get("WORKER_REUSE_PORT", "True") == "True"
+WORKER_SHUTDOWN_TIMEOUT: float = float(os.environ.get("WORKER_SHUTDOWN_TIMEOUT", "10"))
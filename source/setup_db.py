@@ -1,14 +1,128 @@
+from sqlalchemy import Column, Integer, String, Table, Text, event, func, inspect, select, text
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
-from typing import AsyncIterator
-from aiohttp.web import Application
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+import asyncio
+import time
 
-from settings import DB_URL
+from settings import (DB_SHARDS, DB_SHARD_VNODES, DB_READ_REPLICAS, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_PRE_PING, DB_POOL_RECYCLE,
+                      SCHEDULER_POOL_SIZE, DB_STATEMENT_CACHE_SIZE, SQLITE_PRAGMAS)
+from metrics import registry, stage_duration, current_route, LabelValues
+from sharding import HashRing, parse_shards, parse_replicas
 
-engine: AsyncEngine = create_async_engine(DB_URL)
 
-session_client: async_sessionmaker[AsyncSession] = async_sessionmaker(bind=engine, autoflush=False, autocommit=False)
-session_scheduler: async_sessionmaker[AsyncSession] = async_sessionmaker(bind=engine, autoflush=False, autocommit=False)
+def _engine_options(db_url: str, pool_size: int, max_overflow: int) -> Dict[str, Any]:
+    """
+    Builds the create_async_engine() arguments for a database.
+    In-memory SQLite uses a single static connection, so it gets no pool settings.
+    """
+    url = make_url(db_url)
+    options: Dict[str, Any] = {"pool_pre_ping": DB_POOL_PRE_PING,
+                               "pool_recycle": DB_POOL_RECYCLE,
+                               "query_cache_size": DB_STATEMENT_CACHE_SIZE}
+    if not (url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")):
+        options.update(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=DB_POOL_TIMEOUT)
+    if url.get_driver_name() == "asyncpg":
+        options["connect_args"] = {"prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+    return options
+
+
+def _apply_sqlite_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+    """
+    Tunes every new SQLite connection. WAL lets readers work while a write is committed,
+    instead of the default rollback journal which serializes everything.
+    """
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(f"PRAGMA {pragma}")
+    cursor.close()
+
+
+def _create_engine(db_url: str, pool_size: int, max_overflow: int) -> AsyncEngine:
+    new_engine = create_async_engine(db_url, **_engine_options(db_url, pool_size, max_overflow))
+    if new_engine.dialect.name == "sqlite" and SQLITE_PRAGMAS:
+        event.listen(new_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    return new_engine
+
+
+class Shard:
+    """
+    One database of the key space (see settings.DB_SHARDS).
+    Client requests and the expiry scheduler use separate engines (and pools),
+    so an expiry burst can never take the connections the requests need.
+    Read replicas (see settings.DB_READ_REPLICAS) get a client pool each and take
+    the replica reads in turn.
+    """
+
+    def __init__(self, name: str, url: str, replica_urls: Sequence[str] = ()) -> None:
+        self.name = name
+        self.engine: AsyncEngine = _create_engine(url, DB_POOL_SIZE, DB_MAX_OVERFLOW)
+        self.scheduler_engine: AsyncEngine = _create_engine(url, SCHEDULER_POOL_SIZE, 0)
+        self.session_client: async_sessionmaker[AsyncSession] = async_sessionmaker(
+            bind=self.engine, autoflush=False, autocommit=False, expire_on_commit=False)
+        self.session_scheduler: async_sessionmaker[AsyncSession] = async_sessionmaker(
+            bind=self.scheduler_engine, autoflush=False, autocommit=False, expire_on_commit=False)
+        self.replica_engines: List[AsyncEngine] = [_create_engine(replica_url, DB_POOL_SIZE, DB_MAX_OVERFLOW)
+                                                   for replica_url in replica_urls]
+        self.session_replicas: List[async_sessionmaker[AsyncSession]] = [
+            async_sessionmaker(bind=replica_engine, autoflush=False, autocommit=False, expire_on_commit=False)
+            for replica_engine in self.replica_engines]
+        self._next_replica: int = 0
+
+    def replica_session(self) -> AsyncSession:
+        """
+        Opens a session on the next read replica, round-robin.
+        """
+        self._next_replica = (self._next_replica + 1) % len(self.session_replicas)
+        return self.session_replicas[self._next_replica]()
+
+
+_shard_urls = parse_shards(DB_SHARDS)
+_replica_urls = parse_replicas(DB_READ_REPLICAS, [name for name, _ in _shard_urls])
+shards: List[Shard] = [Shard(name, url, _replica_urls.get(name, ())) for name, url in _shard_urls]
+ring: HashRing = HashRing([shard.name for shard in shards], DB_SHARD_VNODES)
+
+# Engines of the first shard, the only one without sharding.
+engine: AsyncEngine = shards[0].engine
+scheduler_engine: AsyncEngine = shards[0].scheduler_engine
+
+
+pool_checkout = registry.histogram("kv_db_pool_checkout_seconds",
+                                   "Time spent waiting for a connection from the pool.", ("pool",))
+
+
+def _pool_status() -> Dict[LabelValues, float]:
+    status: Dict[LabelValues, float] = {}
+    for shard in shards:
+        engines = [("client", shard.engine), ("scheduler", shard.scheduler_engine)]
+        engines += [(f"replica{index}", replica_engine) for index, replica_engine in enumerate(shard.replica_engines)]
+        for name, pool_engine in engines:
+            for state in ("size", "checkedin", "checkedout", "overflow"):
+                reader = getattr(pool_engine.pool, state, None)
+                if callable(reader):
+                    status[(name, shard.name, state)] = reader()
+    return status
+
+
+registry.gauge("kv_db_pool_connections", "Connections of the DB pools by shard and state.",
+               ("pool", "shard", "state"), collect=_pool_status)
+client_sessions = registry.counter("kv_db_client_sessions_total", "Client DB sessions by database: primary or replica.",
+                                   ("target",))
+
+
+async def _checkout(db: AsyncSession, pool: str) -> None:
+    """
+    Takes the connection from the pool right away, so the wait is measured
+    as its own stage instead of being hidden in the first query.
+    """
+    started = time.perf_counter()
+    await db.connection()
+    elapsed = time.perf_counter() - started
+    pool_checkout.observe(elapsed, pool)
+    stage_duration.observe(elapsed, current_route.get(), "session")
+    return None
 
 
 class Base(DeclarativeBase):
@@ -18,35 +132,109 @@ class Base(DeclarativeBase):
     """
     pass
 
-async def init_database(app: Application) -> None:
+# Version of the schema described by models.py, stored in "kv_schema_version" once the schema
+# is created. Startups skip the schema creation while it matches: bump it when models.py changes.
+SCHEMA_VERSION: int = 3
+schema_version = Table("kv_schema_version", Base.metadata, Column("version", Integer, nullable=False))
+
+async def dispose_engines() -> None:
+    """
+    Closes every pooled connection of every shard.
+    """
+    for shard in shards:
+        await shard.engine.dispose()
+        await shard.scheduler_engine.dispose()
+        for replica_engine in shard.replica_engines:
+            await replica_engine.dispose()
+    return None
+
+def _create_schema(connection: Any) -> None:
     """
-    Initializes the database tables if they don't exist already.
+    Creates the missing tables, then the missing nullable columns and indexes of the
+    existing tables, which "create_all" skips. Existing VARCHAR columns declared as Text
+    in models.py are widened, and columns declared with a collation get it (SQLite does not
+    enforce VARCHAR lengths and compares keys in code point order, so it is left alone).
     """
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    Base.metadata.create_all(connection)
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"]: column["type"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                ddl = CreateColumn(column).compile(dialect=connection.dialect)
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+            elif column.name in existing and connection.dialect.name != "sqlite":
+                declared = column.type.dialect_impl(connection.dialect)
+                collation = getattr(declared, "collation", None)
+                if (isinstance(declared, Text) and isinstance(existing[column.name], String)
+                        and existing[column.name].length):
+                    connection.execute(text(f"ALTER TABLE {table.name} ALTER COLUMN {column.name} TYPE TEXT"))
+                elif collation and getattr(existing[column.name], "collation", None) != collation:
+                    ddl = declared.compile(dialect=connection.dialect)
+                    connection.execute(text(f"ALTER TABLE {table.name} ALTER COLUMN {column.name} TYPE {ddl}"))
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+    connection.execute(schema_version.delete())
+    connection.execute(schema_version.insert().values(version=SCHEMA_VERSION))
     return None
 
-async def client_db_call() -> AsyncIterator[AsyncSession]:
+def _schema_version(connection: Any) -> Optional[int]:
+    """
+    Returns the schema version stored in the database, None for a database without the marker
+    or missing one of the tables (a marker written without the models, see init_database).
+    """
+    inspector = inspect(connection)
+    if not all(inspector.has_table(table.name) for table in Base.metadata.sorted_tables):
+        return None
+    return connection.execute(select(func.max(schema_version.c.version))).scalar()
+
+async def _init_shard(shard: Shard) -> None:
+    async with shard.engine.begin() as conn:
+        if await conn.run_sync(_schema_version) != SCHEMA_VERSION:
+            await conn.run_sync(_create_schema)
+    return None
+
+async def init_database() -> None:
+    """
+    Initializes the database tables and indexes of every shard if they don't exist already.
+    A shard whose schema version marker is current is left as it is.
+    """
+    # models.py imports this module: register its tables here, so callers which never build
+    # the storage engine (the worker master) do not create only the version marker.
+    import models  # noqa: F401
+    await asyncio.gather(*(_init_shard(shard) for shard in shards))
+    return None
+
+def has_replicas() -> bool:
+    return any(shard.replica_engines for shard in shards)
+
+async def client_db_call(shard: int = 0, replica: bool = False) -> AsyncIterator[AsyncSession]:
     """
-    Provides an asynchronous database session for client operations.
+    Provides an asynchronous database session for client operations on the given shard.
     Any database operations within "async for db in client_db_call()" would be
     processed through yield and the connection would be automatically closed in the
     "finally" block.
+    With "replica" the session reads from one of the shard's read replicas, if it has any:
+    only use it for reads that may lag behind the primary.
     """
-    db: AsyncSession = session_client()
+    replica = replica and bool(shards[shard].replica_engines)
+    db: AsyncSession = shards[shard].replica_session() if replica else shards[shard].session_client()
+    client_sessions.inc(1, "replica" if replica else "primary")
     try:
+        await _checkout(db, "replica" if replica else "client")
         yield db
     finally:
         await db.close()
 
-async def scheduler_db_call() -> AsyncIterator[AsyncSession]:
+async def scheduler_db_call(shard: int = 0) -> AsyncIterator[AsyncSession]:
     """
-    Provides an asynchronous database session for scheduler operations.
+    Provides an asynchronous database session for scheduler operations on the given shard.
     Resommended to use as "async for db in client_db_call()".
     The DB connection would be automatically closed in the "finally" block.
     """
-    db: AsyncSession = session_scheduler()
+    db: AsyncSession = shards[shard].session_scheduler()
     try:
+        await _checkout(db, "scheduler")
         yield db
     finally:
         await db.close()
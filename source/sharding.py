@@ -0,0 +1,82 @@
+from bisect import bisect_right
+import hashlib
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple, TypeVar
+
+
+T = TypeVar("T")
+
+
+def parse_shards(entries: Sequence[str]) -> List[Tuple[str, str]]:
+    """
+    Parses settings.DB_SHARDS into (name, url) pairs.
+    An entry is "name=url", or a bare url which is named after its position ("shard0", ...).
+    """
+    shards: List[Tuple[str, str]] = []
+    for position, entry in enumerate(entries):
+        name, separator, url = entry.partition("=")
+        if not separator or ":" in name or "/" in name:
+            name, url = f"shard{position}", entry
+        shards.append((name, url))
+
+    names = [name for name, _ in shards]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Shard names must be unique: {', '.join(names)}")
+    return shards
+
+
+def parse_replicas(entries: Sequence[str], shard_names: Sequence[str]) -> Dict[str, List[str]]:
+    """
+    Parses settings.DB_READ_REPLICAS into the replica urls of each shard name.
+    An entry is "shard=url", or a bare url which belongs to the first shard.
+    """
+    replicas: Dict[str, List[str]] = {}
+    for entry in entries:
+        name, separator, url = entry.partition("=")
+        if not separator or ":" in name or "/" in name:
+            name, url = shard_names[0], entry
+        if name not in shard_names:
+            raise ValueError(f"Read replica '{entry}' names an unknown shard. Shards: {', '.join(shard_names)}")
+        replicas.setdefault(name, []).append(url)
+    return replicas
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent hash ring mapping keys to shard indexes.
+    Every shard gets "vnodes" points on the ring, placed by its name, and a key belongs to the
+    first point after its own hash. Adding a shard only moves the keys taken over by its points,
+    about 1 / (number of shards) of them.
+    """
+
+    def __init__(self, names: Sequence[str], vnodes: int = 64) -> None:
+        self.names: List[str] = list(names)
+        points: List[Tuple[int, int]] = sorted((_hash(f"{name}#{vnode}"), index)
+                                               for index, name in enumerate(self.names)
+                                               for vnode in range(max(1, vnodes)))
+        self._hashes: List[int] = [point for point, _ in points]
+        self._owners: List[int] = [owner for _, owner in points]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def shard_for(self, key: str) -> int:
+        """
+        Returns the index of the shard owning the key.
+        """
+        if len(self.names) == 1:
+            return 0
+        position = bisect_right(self._hashes, _hash(key))
+        return self._owners[position % len(self._owners)]
+
+    def group(self, items: Iterable[T], key_of: Callable[[T], str] = str) -> Dict[int, List[T]]:
+        """
+        Splits items by owning shard, keeping their order inside each shard.
+        """
+        groups: Dict[int, List[T]] = {}
+        for item in items:
+            groups.setdefault(self.shard_for(key_of(item)), []).append(item)
+        return groups
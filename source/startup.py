@@ -0,0 +1,145 @@
+import time
+
+# main.py imports this module first, so the import phase is measured from here,
+# before anything else (aiohttp included) is imported.
+PROCESS_STARTED: float = time.perf_counter()
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from aiohttp import web
+
+from metrics import registry, LabelValues
+from json_codec import json_response
+
+
+logger = logging.getLogger("key_value_storage.startup")
+
+Hook = Callable[[web.Application], Awaitable[None]]
+
+# Paths answered while a lazy startup is still running: liveness / readiness and monitoring.
+PROBE_PATHS = frozenset(("/", "/_metrics", "/_startup"))
+
+
+class StartupReport:
+    """
+    Time spent by each startup phase, in seconds since PROCESS_STARTED:
+    "imports" when main.py finished importing, one entry per startup hook with its own
+    duration, "ready" when every hook finished, "first_request" when the first request came in.
+    """
+
+    def __init__(self) -> None:
+        self.imports: Optional[float] = None
+        self.hooks: Dict[str, float] = {}
+        self.ready: Optional[float] = None
+        self.first_request: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def is_ready(self) -> bool:
+        return self.ready is not None
+
+    def imports_done(self) -> None:
+        self.imports = time.perf_counter() - PROCESS_STARTED
+        return None
+
+    def as_dict(self) -> Dict[str, object]:
+        return {"ready": self.is_ready, "imports": self.imports, "hooks": dict(self.hooks),
+                "ready_after": self.ready, "first_request_after": self.first_request, "error": self.error}
+
+    def summary(self) -> str:
+        phases = [f"imports {self.imports or 0:.3f}s"]
+        phases += [f"{name} {duration:.3f}s" for name, duration in self.hooks.items()]
+        return f"Ready after {self.ready or 0:.3f}s: " + ", ".join(phases)
+
+
+report = StartupReport()
+
+
+def _startup_phases() -> Dict[LabelValues, float]:
+    phases: Dict[LabelValues, float] = {("hook:" + name,): duration for name, duration in report.hooks.items()}
+    for name, value in (("imports", report.imports), ("ready", report.ready), ("first_request", report.first_request)):
+        if value is not None:
+            phases[(name,)] = value
+    return phases
+
+
+registry.gauge("kv_startup_seconds", "Startup phases: imports, ready and first_request since the process started, "
+               "hook:<name> is the duration of a startup hook.", ("phase",), collect=_startup_phases)
+
+
+async def run_hooks(app: web.Application, hooks: List[Hook]) -> None:
+    """
+    Runs the startup hooks one after the other, timing each of them, then marks the app ready.
+    """
+    for hook in hooks:
+        started = time.perf_counter()
+        await hook(app)
+        report.hooks[hook.__name__] = time.perf_counter() - started
+    report.ready = time.perf_counter() - PROCESS_STARTED
+    logger.info(report.summary())
+    return None
+
+
+def add_startup_hooks(app: web.Application, hooks: List[Hook], lazy: bool = False) -> None:
+    """
+    Registers the startup hooks of the app, timed in the startup report.
+    By default they run before the app starts listening, like plain "on_startup" hooks.
+    With "lazy" the app starts listening right away and the hooks run in the background:
+    until they finish, every request but PROBE_PATHS answers 503.
+    """
+    app.middlewares.append(readiness_middleware)
+    if not lazy:
+        async def run_startup_hooks(app: web.Application) -> None:
+            await run_hooks(app, hooks)
+
+        app.on_startup.append(run_startup_hooks)
+        return None
+
+    background: List["asyncio.Task[None]"] = []
+
+    async def start_in_background(app: web.Application) -> None:
+        background.append(asyncio.get_running_loop().create_task(_run_lazily(app, hooks)))
+
+    async def stop_background_startup(app: web.Application) -> None:
+        for task in background:
+            if not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+    app.on_startup.append(start_in_background)
+    app.on_cleanup.insert(0, stop_background_startup)
+    return None
+
+
+async def _run_lazily(app: web.Application, hooks: List[Hook]) -> None:
+    try:
+        await run_hooks(app, hooks)
+    except asyncio.CancelledError:
+        raise
+    except Exception as error:
+        # The service stays live but never ready, so the orchestrator replaces it.
+        report.error = f"{type(error).__name__}: {error}"
+        logger.exception("Startup failed")
+    return None
+
+
+@web.middleware
+async def readiness_middleware(request: web.Request, handler: Callable) -> web.StreamResponse:
+    """
+    Records the first request, and holds back requests that need the storage until
+    a lazy startup is done.
+    """
+    if report.first_request is None:
+        report.first_request = time.perf_counter() - PROCESS_STARTED
+    if not report.is_ready and request.path not in PROBE_PATHS:
+        response = json_response({"status": "Error",
+                                  "message": "The service is starting, try again shortly"},
+                                  status=503)
+        response.headers["Retry-After"] = "1"
+        return response
+    return await handler(request)
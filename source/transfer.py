@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional, Tuple
+
+from settings import TLL_DEFAULT, EXPORT_PAGE_SIZE
+from backends import storage, Record
+from json_codec import loads, DECODE_ERRORS
+from cache import record_cache
+from negative_cache import negative_cache
+
+
+def parse_import_line(line: bytes, now: datetime) -> Record:
+    """
+    Parses one NDJSON line of an import into a record.
+    Accepts the format written by the export ("expiration_time" as ISO string or null)
+    and the PUT format ("tll" in minutes). Raises ValueError on invalid lines.
+    """
+    try:
+        item = loads(line)
+    except DECODE_ERRORS:
+        raise ValueError("line is not valid JSON")
+
+    if not isinstance(item, dict):
+        raise ValueError("line must be a JSON object")
+
+    key = item.get("key")
+    if not key or not isinstance(key, str):
+        raise ValueError("'key' is incorrect")
+    if "value" not in item:
+        raise ValueError("'value' is missing")
+
+    expiration_time: Optional[datetime]
+    if "expiration_time" in item:
+        try:
+            expiration_time = datetime.fromisoformat(item["expiration_time"]) if item["expiration_time"] else None
+        except (TypeError, ValueError):
+            raise ValueError("'expiration_time' is invalid")
+    else:
+        try:
+            tll = int(item.get("tll") or TLL_DEFAULT)
+        except (TypeError, ValueError):
+            raise ValueError("'tll' is invalid")
+        expiration_time = now + timedelta(minutes=tll)
+
+    return Record(key, item["value"], expiration_time)
+
+
+async def import_chunk(records: List[Record]) -> Tuple[int, int]:
+    """
+    Stores a chunk of imported records in one storage call.
+    Records whose key already exists (or repeats inside the chunk), and records that
+    already expired, are skipped, as records can not be modified.
+    Returns the number of imported and skipped records.
+    """
+    now = datetime.now()
+    live: List[Record] = [record for record in records if not record.is_expired(now)]
+    imported, _ = await storage.import_records(live)
+    record_cache.invalidate_many(record.key for record in live)
+    if negative_cache is not None:
+        negative_cache.added(record.key for record in live)
+    return imported, len(records) - imported
+
+
+async def export_records(prefix: str = "", page_size: int = EXPORT_PAGE_SIZE, after: Optional[str] = None,
+                         limit: Optional[int] = None, values: bool = True) -> AsyncIterator[List[Record]]:
+    """
+    Yields the live records page by page, ordered by key, starting after "after"
+    and stopping after "limit" records (all of them when None).
+    Uses keyset pagination on the key ("key > last_key ORDER BY key LIMIT n"),
+    so every page costs the same no matter how deep into the keyspace it is.
+    """
+    last_key: Optional[str] = after
+    remaining: Optional[int] = limit
+    while remaining is None or remaining > 0:
+        size = page_size if remaining is None else min(page_size, remaining)
+        page = await storage.scan(prefix, last_key, size, values=values)
+        if not page:
+            return
+        yield page
+        if len(page) < size:
+            return
+        last_key = page[-1].key
+        if remaining is not None:
+            remaining -= len(page)
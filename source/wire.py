@@ -0,0 +1,152 @@
+import struct
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from records import value_text
+from json_codec import dumps, loads, DECODE_ERRORS
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+JSON_TYPE: str = "application/json"
+MSGPACK_TYPE: str = "application/msgpack"
+BINARY_TYPE: str = "application/x-kv-binary"
+
+_ALIASES: Dict[str, str] = {"application/json": JSON_TYPE,
+                            "application/msgpack": MSGPACK_TYPE,
+                            "application/x-msgpack": MSGPACK_TYPE,
+                            "application/x-kv-binary": BINARY_TYPE}
+
+_COUNT = struct.Struct(">I")
+_KEY_LENGTH = struct.Struct(">H")
+# Longest key, in UTF-8 bytes, the binary format can carry in its uint16 key length.
+MAX_BINARY_KEY_LENGTH: int = 0xFFFF
+_VALUE_LENGTH = struct.Struct(">i")
+
+
+def supported_types() -> List[str]:
+    """
+    Returns the response content types this process can produce.
+    msgpack is offered only when the optional "msgpack" package is installed.
+    """
+    types = [JSON_TYPE, BINARY_TYPE]
+    if msgpack is not None:
+        types.append(MSGPACK_TYPE)
+    return types
+
+
+def negotiate(accept: Optional[str]) -> Optional[str]:
+    """
+    Picks the response content type from an "Accept" header.
+    Media ranges are tried by decreasing "q", "*/*" and a missing header mean JSON.
+    Returns None when none of the accepted types is supported.
+    """
+    if not accept:
+        return JSON_TYPE
+
+    supported = supported_types()
+    ranges: List[Tuple[float, int, str]] = []
+    for position, media_range in enumerate(accept.split(",")):
+        media_type, *parameters = (part.strip() for part in media_range.split(";"))
+        quality: float = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            ranges.append((-quality, position, media_type.lower()))
+
+    for _, _, media_type in sorted(ranges):
+        if media_type in ("*/*", "application/*"):
+            return JSON_TYPE
+        content_type = _ALIASES.get(media_type)
+        if content_type in supported:
+            return content_type
+    return None
+
+
+def decode_keys(body: bytes, content_type: str, response_type: Optional[str] = None) -> List[str]:
+    """
+    Decodes a list of keys sent as a JSON (or msgpack) array of strings.
+    Raises ValueError if the body is not such a list, or if a key is too long
+    for the binary format when it is the "response_type".
+    """
+    if _ALIASES.get(content_type) == MSGPACK_TYPE and msgpack is not None:
+        try:
+            keys = msgpack.unpackb(body)
+        except (msgpack.ExtraData, msgpack.FormatError, msgpack.StackError, ValueError) as error:
+            raise ValueError("Body is invalid msgpack") from error
+    else:
+        try:
+            keys = loads(body)
+        except DECODE_ERRORS as error:
+            raise ValueError("JSON Body is invalid") from error
+
+    if not isinstance(keys, list):
+        raise ValueError("Body must be a List of keys")
+    if not all(isinstance(key, str) and key for key in keys):
+        raise ValueError("Every key must be a non-empty string")
+    if response_type == BINARY_TYPE and any(len(key) > MAX_BINARY_KEY_LENGTH // 4
+                                            and len(key.encode("utf-8")) > MAX_BINARY_KEY_LENGTH for key in keys):
+        raise ValueError(f"Keys of the {BINARY_TYPE} format are at most {MAX_BINARY_KEY_LENGTH} bytes")
+    return keys
+
+
+def encode_values(keys: Sequence[str], values: Dict[str, Any], content_type: str) -> bytes:
+    """
+    Encodes the result of a multi-get: the value of each requested key, in request order.
+
+    JSON and msgpack: {"records": {key: value, ...}, "missing": [key, ...]}.
+    Binary: uint32 count, then for each requested key uint16 key length, the UTF-8 key,
+    int32 value length (-1 for a missing key) and the UTF-8 value.
+    Non-string values are sent as their JSON text. All integers are big-endian.
+    """
+    if content_type == BINARY_TYPE:
+        parts: List[bytes] = [_COUNT.pack(len(keys))]
+        for key in keys:
+            key_bytes = key.encode("utf-8")
+            parts.append(_KEY_LENGTH.pack(len(key_bytes)))
+            parts.append(key_bytes)
+            if key in values:
+                value_bytes = value_text(values[key]).encode("utf-8")
+                parts.append(_VALUE_LENGTH.pack(len(value_bytes)))
+                parts.append(value_bytes)
+            else:
+                parts.append(_VALUE_LENGTH.pack(-1))
+        return b"".join(parts)
+
+    document = {"records": {key: values[key] for key in keys if key in values},
+                "missing": [key for key in keys if key not in values]}
+    if content_type == MSGPACK_TYPE:
+        return msgpack.packb(document)
+    return dumps(document)
+
+
+def encode_deleted(keys: Sequence[str], deleted: Sequence[str], content_type: str) -> bytes:
+    """
+    Encodes the result of a multi-delete.
+
+    JSON and msgpack: {"deleted": [key, ...], "missing": [key, ...]}.
+    Binary: uint32 count, then for each requested key uint16 key length, the UTF-8 key
+    and one byte, 1 if the key was deleted and 0 if it was not found.
+    """
+    deleted_keys = set(deleted)
+    if content_type == BINARY_TYPE:
+        parts: List[bytes] = [_COUNT.pack(len(keys))]
+        for key in keys:
+            key_bytes = key.encode("utf-8")
+            parts.append(_KEY_LENGTH.pack(len(key_bytes)))
+            parts.append(key_bytes)
+            parts.append(b"\x01" if key in deleted_keys else b"\x00")
+        return b"".join(parts)
+
+    document = {"deleted": [key for key in keys if key in deleted_keys],
+                "missing": [key for key in keys if key not in deleted_keys]}
+    if content_type == MSGPACK_TYPE:
+        return msgpack.packb(document)
+    return dumps(document)
@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import multiprocessing
+from multiprocessing.connection import wait
+import signal
+import socket
+import time
+from types import FrameType
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+from settings import (APP_HOST, APP_PORT, WORKERS, WORKER_REUSE_PORT, WORKER_SHUTDOWN_TIMEOUT, STORAGE_BACKEND,
+                      NEGATIVE_CACHE_ENABLED, NEGATIVE_CACHE_BLOOM)
+
+
+logger = logging.getLogger("key_value_storage.workers")
+
+EXPIRY_LEADER: int = 0
+
+
+def _run_worker(index: int, sock: Optional[socket.socket]) -> None:
+    """
+    Entry point of a worker process: serves the app on the shared listening socket,
+    or on its own SO_REUSEPORT socket. Only the worker with index EXPIRY_LEADER
+    runs the expiry scheduler, so expired records are not swept N times.
+    """
+    from main import start_app
+
+    # A forked worker inherits the master handlers: aiohttp installs its own for
+    # SIGTERM / SIGINT, SIGHUP is only meant for the master.
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    app: web.Application = start_app(run_expiry=index == EXPIRY_LEADER)
+    if sock is not None:
+        web.run_app(app, sock=sock, shutdown_timeout=WORKER_SHUTDOWN_TIMEOUT, print=None)
+    else:
+        web.run_app(app, host=APP_HOST, port=APP_PORT, reuse_port=True,
+                    shutdown_timeout=WORKER_SHUTDOWN_TIMEOUT, print=None)
+
+
+def _listening_socket() -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in (APP_HOST or "") else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((APP_HOST, APP_PORT))
+    sock.listen(1024)
+    sock.set_inheritable(True)
+    return sock
+
+
+class WorkerPool:
+    """
+    Pre-fork process manager.
+    Starts WORKERS processes serving the same port, replaces workers that die,
+    restarts them one by one on SIGHUP and stops them gracefully on SIGTERM / SIGINT.
+    """
+
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        self.context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+        self.sock: Optional[socket.socket] = None
+        self.processes: Dict[int, multiprocessing.process.BaseProcess] = {}
+        self._stopping: bool = False
+        self._restart_requested: bool = False
+
+    def run(self) -> None:
+        use_reuse_port = WORKER_REUSE_PORT and hasattr(socket, "SO_REUSEPORT")
+        if not use_reuse_port:
+            self.sock = _listening_socket()
+
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        signal.signal(signal.SIGHUP, self._request_restart)
+
+        print(f"======== Running on http://{APP_HOST}:{APP_PORT} with {self.workers} workers ========")
+        for index in range(self.workers):
+            self.processes[index] = self._spawn(index)
+
+        while not self._stopping:
+            if self._restart_requested:
+                self._restart_requested = False
+                self._rolling_restart()
+                continue
+
+            wait([process.sentinel for process in self.processes.values()], timeout=1.0)
+            for index, process in list(self.processes.items()):
+                if not process.is_alive() and not self._stopping:
+                    logger.warning("Worker %s (pid %s) exited with %s, starting a new one",
+                                   index, process.pid, process.exitcode)
+                    self.processes[index] = self._spawn(index)
+
+        self._stop_all()
+        if self.sock is not None:
+            self.sock.close()
+
+    def _spawn(self, index: int) -> multiprocessing.process.BaseProcess:
+        process = self.context.Process(target=_run_worker, args=(index, self.sock),
+                                       name=f"kv-worker-{index}", daemon=False)
+        process.start()
+        return process
+
+    def _rolling_restart(self) -> None:
+        """
+        Replaces the workers one at a time: the new worker starts accepting
+        before the old one is asked to finish its requests and exit.
+        """
+        for index, old_process in list(self.processes.items()):
+            if self._stopping:
+                return
+            if index == EXPIRY_LEADER:
+                # Only one expiry leader at a time: stop the old one first.
+                self._terminate([old_process])
+                self.processes[index] = self._spawn(index)
+            else:
+                self.processes[index] = self._spawn(index)
+                time.sleep(0.5)
+                self._terminate([old_process])
+
+    def _stop_all(self) -> None:
+        self._terminate(list(self.processes.values()))
+        self.processes.clear()
+
+    @staticmethod
+    def _terminate(processes: List[multiprocessing.process.BaseProcess]) -> None:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + WORKER_SHUTDOWN_TIMEOUT + 5
+        for process in processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+    def _request_stop(self, signum: int, frame: Optional[FrameType]) -> None:
+        self._stopping = True
+
+    def _request_restart(self, signum: int, frame: Optional[FrameType]) -> None:
+        self._restart_requested = True
+
+
+async def _prepare_database() -> None:
+    """
+    Creates the tables once in the master, so the workers don't race on "CREATE TABLE".
+    The pooled connections are closed before forking: a connection can't be shared
+    between processes.
+    """
+    from setup_db import init_database, dispose_engines
+
+    await init_database()
+    await dispose_engines()
+    return None
+
+
+def run_workers(workers: int = WORKERS) -> None:
+    """
+    Serves the app with "workers" processes sharing APP_PORT.
+    The in-memory storage engine keeps its data inside one process, so it can not be
+    shared between workers. Neither can the negative cache Bloom filter, which only
+    sees the writes of its own worker.
+    """
+    if STORAGE_BACKEND == "memory":
+        raise RuntimeError("STORAGE_BACKEND=memory can not be used with WORKERS > 1")
+    if NEGATIVE_CACHE_ENABLED and NEGATIVE_CACHE_BLOOM:
+        raise RuntimeError("NEGATIVE_CACHE_BLOOM can not be used with WORKERS > 1")
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_prepare_database())
+    WorkerPool(workers).run()
+    return None
@@ -0,0 +1,53 @@
+import os
+import sys
+import tempfile
+from itertools import count
+from typing import AsyncIterator, List
+
+import pytest
+
+# The settings are read when the service modules are imported: configure two SQLite shards
+# in a temporary directory before importing anything from "source".
+_directory = tempfile.mkdtemp(prefix="kv-tests-")
+os.environ.update(DEBUG="True",
+                  STORAGE_BACKEND="sql",
+                  DB_SHARDS=f"a=sqlite+aiosqlite:///{_directory}/a.db b=sqlite+aiosqlite:///{_directory}/b.db",
+                  CACHE_ENABLED="False",
+                  GROUP_COMMIT_ENABLED="False",
+                  NEGATIVE_CACHE_ENABLED="False")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source"))
+
+from sqlalchemy import delete
+
+from backends import storage as service_storage, StorageBackend
+from models import KeyValue
+from setup_db import ring, shards
+
+
+@pytest.fixture
+async def storage() -> AsyncIterator[StorageBackend]:
+    """
+    The service storage on empty shards. The engines are disposed after each test,
+    as their connections belong to the event loop of the test.
+    """
+    await service_storage.start()
+    yield service_storage
+    for shard in shards:
+        async with shard.engine.begin() as connection:
+            await connection.execute(delete(KeyValue))
+    await service_storage.close()
+
+
+_key_numbers = count()
+
+
+def keys_on(shard: int, amount: int = 1, prefix: str = "key") -> List[str]:
+    """
+    Returns "amount" fresh keys owned by the given shard.
+    """
+    keys: List[str] = []
+    while len(keys) < amount:
+        key = f"{prefix}-{next(_key_numbers)}"
+        if ring.shard_for(key) == shard:
+            keys.append(key)
+    return keys
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+from backends import Record
+from bulk import Operation, resolve_operations
+from conftest import keys_on
+
+
+NOW = datetime(2026, 1, 1, 12, 0)
+LATER = NOW + timedelta(minutes=30)
+
+
+def test_put_delete_put_in_one_bulk_keeps_the_last_value() -> None:
+    operations = [Operation("PUT", "k", "first", expiration_time=LATER),
+                  Operation("DELETE", "k"),
+                  Operation("PUT", "k", "second", expiration_time=LATER),
+                  Operation("GET", "k")]
+    plan = resolve_operations(operations, {}, NOW)
+
+    assert plan.errors == []
+    assert plan.outcomes == [True, True, True, True]
+    assert plan.deletes == []
+    assert plan.inserts == [Record("k", "second", LATER)]
+    assert plan.results[-1] == {"key": "k", "value": "second"}
+
+
+def test_delete_then_put_of_an_existing_key_replaces_the_row() -> None:
+    existing = {"k": Record("k", "old", LATER)}
+    operations = [Operation("DELETE", "k"), Operation("PUT", "k", "new", expiration_time=LATER)]
+    plan = resolve_operations(operations, existing, NOW)
+
+    assert plan.errors == []
+    assert plan.deletes == ["k"]
+    assert plan.inserts == [Record("k", "new", LATER)]
+
+
+def test_operations_see_the_earlier_ones() -> None:
+    existing = {"k": Record("k", "old", LATER)}
+    operations = [Operation("DELETE", "k"), Operation("GET", "k"), Operation("PUT", "k", "new"),
+                  Operation("PUT", "k", "again")]
+    plan = resolve_operations(operations, existing, NOW)
+
+    assert plan.outcomes == [True, False, True, False]
+    assert [error["key"] for error in plan.errors] == ["k", "k"]
+
+
+def test_put_replaces_an_expired_record() -> None:
+    existing = {"k": Record("k", "old", NOW - timedelta(minutes=1))}
+    plan = resolve_operations([Operation("GET", "k"), Operation("PUT", "k", "new", tll=5)], existing, NOW)
+
+    assert plan.outcomes == [False, True]
+    assert plan.deletes == ["k"]
+    assert plan.inserts == [Record("k", "new", NOW + timedelta(minutes=5))]
+
+
+async def test_bulk_is_applied_in_order(storage) -> None:
+    key, = keys_on(0)
+    plan = await storage.apply_bulk([Operation("PUT", key, 1), Operation("DELETE", key), Operation("PUT", key, 2)])
+
+    assert plan.errors == []
+    assert (await storage.get(key)).value == 2
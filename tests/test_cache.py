@@ -0,0 +1,118 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from cache import RecordCache, _estimate_size
+
+
+def test_lru_evicts_the_least_recently_used_key() -> None:
+    cache = RecordCache(max_entries=2, max_bytes=1 << 20, policy="lru")
+    cache.set("a", 1, None)
+    cache.set("b", 2, None)
+    cache.get("a")
+    cache.set("c", 3, None)
+
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert cache.evictions == 1
+
+
+def test_lfu_evicts_the_least_frequently_used_key() -> None:
+    cache = RecordCache(max_entries=2, max_bytes=1 << 20, policy="lfu")
+    cache.set("a", 1, None)
+    cache.set("b", 2, None)
+    cache.get("a")
+    cache.get("b")
+    cache.get("b")
+    cache.get("a")
+    cache.get("b")
+    cache.set("c", 3, None)
+
+    assert "b" in cache and "c" in cache
+    assert "a" not in cache
+
+
+def test_lfu_breaks_ties_by_age() -> None:
+    cache = RecordCache(max_entries=2, max_bytes=1 << 20, policy="lfu")
+    cache.set("a", 1, None)
+    cache.set("b", 2, None)
+    cache.set("c", 3, None)
+
+    assert "a" not in cache
+    assert "b" in cache and "c" in cache
+
+
+def test_the_byte_budget_evicts_entries() -> None:
+    size = _estimate_size("a", "x" * 100)
+    cache = RecordCache(max_entries=100, max_bytes=2 * size, policy="lru")
+    cache.set("a", "x" * 100, None)
+    cache.set("b", "x" * 100, None)
+    cache.set("c", "x" * 100, None)
+
+    assert len(cache) == 2
+    assert "a" not in cache
+    assert cache.stats()["bytes"] <= 2 * size
+
+
+def test_a_value_over_the_byte_budget_is_not_cached() -> None:
+    cache = RecordCache(max_entries=100, max_bytes=200, policy="lru")
+    cache.set("a", 1, None)
+    cache.set("big", "x" * 1000, None)
+
+    assert "big" not in cache
+    assert "a" in cache
+
+
+def test_expired_entries_are_dropped_on_read() -> None:
+    cache = RecordCache(max_entries=10, max_bytes=1 << 20)
+    cache.set("a", 1, datetime.now() + timedelta(milliseconds=20))
+    cache.set("gone", 1, datetime.now() - timedelta(seconds=1))
+
+    assert cache.get("a").value == 1
+    assert "gone" not in cache
+    time.sleep(0.05)
+    assert cache.get("a") is None
+    assert "a" not in cache
+    assert cache.expirations == 1
+
+
+def test_entries_do_not_outlive_the_max_age() -> None:
+    cache = RecordCache(max_entries=10, max_bytes=1 << 20, max_age=0)
+    cache.set("a", 1, None)
+
+    assert cache.get("a") is None
+
+
+def test_a_read_finishing_after_an_invalidation_is_not_cached() -> None:
+    cache = RecordCache(max_entries=10, max_bytes=1 << 20)
+    token = cache.read_token()
+    cache.invalidate("a")
+    cache.set("a", "stale", None, token)
+
+    assert cache.get("a") is None
+    cache.set("a", "fresh", None, cache.read_token())
+    assert cache.get("a").value == "fresh"
+
+
+def test_an_invalidation_of_another_key_keeps_the_fill() -> None:
+    cache = RecordCache(max_entries=10, max_bytes=1 << 20)
+    token = cache.read_token()
+    cache.invalidate("other")
+    cache.set("a", 1, None, token)
+
+    assert cache.get("a").value == 1
+
+
+def test_reads_older_than_the_remembered_invalidations_are_not_cached() -> None:
+    cache = RecordCache(max_entries=2, max_bytes=1 << 20)
+    token = cache.read_token()
+    cache.invalidate_many(["b", "c", "d"])
+    cache.set("a", 1, None, token)
+
+    assert "a" not in cache
+
+
+def test_an_unknown_policy_is_refused() -> None:
+    with pytest.raises(ValueError):
+        RecordCache(max_entries=10, max_bytes=1 << 20, policy="fifo")
@@ -0,0 +1,54 @@
+import asyncio
+
+from backends import Record
+from group_commit import GroupCommit
+from conftest import keys_on
+
+
+async def test_every_write_gets_its_own_result(storage) -> None:
+    group = GroupCommit(window=5, max_batch=256)
+    key, other = keys_on(0) + keys_on(1)
+    missing, = keys_on(0)
+
+    results = await asyncio.gather(group.put(Record(key, 1, None)),
+                                   group.put(Record(key, 2, None)),
+                                   group.put(Record(other, 3, None)),
+                                   group.delete(missing))
+
+    assert results == [True, False, True, False]
+    assert (await storage.get(key)).value == 1
+    assert (await storage.get(other)).value == 3
+
+
+async def test_writes_of_one_key_apply_in_order(storage) -> None:
+    group = GroupCommit(window=5, max_batch=256)
+    key, = keys_on(1)
+    await storage.put_if_absent(Record(key, "old", None))
+
+    results = await asyncio.gather(group.delete(key), group.delete(key), group.put(Record(key, "new", None)))
+
+    assert results == [True, False, True]
+    assert (await storage.get(key)).value == "new"
+
+
+async def test_batches_are_split_at_max_batch(storage) -> None:
+    group = GroupCommit(window=5, max_batch=2)
+    keys = keys_on(0, 3) + keys_on(1, 2)
+
+    results = await asyncio.gather(*(group.put(Record(key, key, None)) for key in keys),
+                                   group.put(Record(keys[0], "again", None)))
+
+    assert results == [True] * len(keys) + [False]
+    assert {key: record.value for key, record in (await storage.get_many(keys)).items()} == {key: key for key in keys}
+
+
+async def test_a_failed_batch_fails_each_of_its_writes(storage, monkeypatch) -> None:
+    group = GroupCommit(window=5, max_batch=256)
+
+    async def failing_apply_writes(operations):
+        raise RuntimeError("database is gone")
+
+    monkeypatch.setattr(storage, "apply_writes", failing_apply_writes)
+    results = await asyncio.gather(group.put(Record("a", 1, None)), group.delete("b"), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
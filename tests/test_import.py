@@ -0,0 +1,65 @@
+import json
+
+import handlers
+from backends import StorageConflict
+from main import start_app
+from settings import IMPORT_CHUNK_SIZE, MAX_VALUE_SIZE
+
+
+async def test_large_values_survive_an_export_and_import(storage, aiohttp_client) -> None:
+    client = await aiohttp_client(start_app(run_expiry=False))
+    value = "x" * (MAX_VALUE_SIZE - 100)
+    assert (await client.put("/large", json={"value": value})).status == 200
+
+    exported = await (await client.get("/_export")).read()
+    assert (await client.delete("/large")).status == 200
+    response = await client.post("/_import", data=exported, headers={"Content-Type": "application/x-ndjson"})
+
+    assert response.status == 200
+    assert (await response.json())["imported"] == 1
+    assert (await (await client.get("/large")).json())["value"] == value
+
+
+async def test_a_line_over_the_limit_stops_the_import(storage, aiohttp_client) -> None:
+    client = await aiohttp_client(start_app(run_expiry=False))
+    body = (json.dumps({"key": "small", "value": "v"}) + "\n"
+            + json.dumps({"key": "huge", "value": "x" * (MAX_VALUE_SIZE + 8192)}) + "\n")
+    response = await client.post("/_import", data=body.encode(), headers={"Content-Type": "application/x-ndjson"})
+
+    assert response.status == 400
+    assert (await response.json())["message"] == "Line 2 is too long. Import stopped"
+
+
+async def test_a_storage_error_is_not_reported_as_a_long_line(storage, aiohttp_client, monkeypatch) -> None:
+    client = await aiohttp_client(start_app(run_expiry=False))
+
+    async def failing_import_chunk(rows):
+        raise ValueError("Unknown codec")
+
+    monkeypatch.setattr(handlers, "import_chunk", failing_import_chunk)
+    # A full chunk, so the storage is called while the body is still read.
+    body = "".join(json.dumps({"key": f"k{number}", "value": "v"}) + "\n" for number in range(IMPORT_CHUNK_SIZE))
+    response = await client.post("/_import", data=body.encode(), headers={"Content-Type": "application/x-ndjson"})
+
+    assert response.status == 500
+
+
+async def test_a_conflict_stops_the_import_with_the_counts(storage, aiohttp_client, monkeypatch) -> None:
+    client = await aiohttp_client(start_app(run_expiry=False))
+    calls = []
+
+    async def conflicting_import_chunk(rows):
+        calls.append(rows)
+        if len(calls) > 1:
+            raise StorageConflict()
+        return len(rows), 0
+
+    monkeypatch.setattr(handlers, "import_chunk", conflicting_import_chunk)
+    body = "".join(json.dumps({"key": f"k{number}", "value": "v"}) + "\n" for number in range(IMPORT_CHUNK_SIZE + 1))
+    response = await client.post("/_import", data=body.encode() + b"not json\n",
+                                 headers={"Content-Type": "application/x-ndjson"})
+
+    assert response.status == 409
+    assert await response.json() == {"status": "Error",
+                                     "message": "Records were changed by another request. Import stopped",
+                                     "imported": IMPORT_CHUNK_SIZE, "skipped": 0, "invalid": 1}
@@ -0,0 +1,69 @@
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from backends import Record
+from backends.sql import _ordered_key, _with_prefix, prefix_upper_bound
+from main import start_app
+from models import KeyValue
+from setup_db import ring
+
+MAX_CHARACTER = chr(0x10FFFF)
+
+
+async def list_all(client, limit: int, **parameters: str) -> List[str]:
+    keys: List[str] = []
+    after: Optional[str] = None
+    while True:
+        query: Dict[str, Any] = {"limit": str(limit), **parameters}
+        if after is not None:
+            query["after"] = after
+        response = await client.get("/_keys", params=query)
+        assert response.status == 200
+        page = await response.json()
+        keys.extend(page["keys"])
+        if page["next"] is None:
+            return keys
+        assert page["next"] == page["keys"][-1]
+        after = page["next"]
+
+
+async def test_pages_continue_across_shards(storage, aiohttp_client) -> None:
+    keys = [f"user:{number:03}" for number in range(40)] + ["other", "user;", "user"]
+    assert {ring.shard_for(key) for key in keys} == {0, 1}
+    await storage.import_records([Record(key, key, None) for key in keys])
+    client = await aiohttp_client(start_app(run_expiry=False))
+
+    assert await list_all(client, 7) == sorted(keys)
+    assert await list_all(client, 7, prefix="user:") == sorted(key for key in keys if key.startswith("user:"))
+    assert (await (await client.get("/_keys", params={"prefix": "user:", "count": "true"})).json())["count"] == 40
+
+
+async def test_prefixes_at_the_code_point_boundary(storage, aiohttp_client) -> None:
+    keys = ["a", "a" + MAX_CHARACTER, "a" + MAX_CHARACTER + "z", "a" + MAX_CHARACTER * 2, "b", "é", "éa", "ê"]
+    await storage.import_records([Record(key, key, None) for key in keys])
+    client = await aiohttp_client(start_app(run_expiry=False))
+
+    assert await list_all(client, 2) == sorted(keys)
+    assert await list_all(client, 2, prefix="a" + MAX_CHARACTER) == sorted(key for key in keys
+                                                                          if key.startswith("a" + MAX_CHARACTER))
+    assert await list_all(client, 2, prefix=MAX_CHARACTER) == []
+    assert await list_all(client, 2, prefix="é") == ["é", "éa"]
+
+
+def test_prefix_upper_bound() -> None:
+    assert prefix_upper_bound("") is None
+    assert prefix_upper_bound("ab") == "ac"
+    assert prefix_upper_bound("a" + MAX_CHARACTER) == "b"
+    assert prefix_upper_bound(MAX_CHARACTER * 2) is None
+
+
+def test_postgresql_compares_keys_in_code_point_order() -> None:
+    key = _ordered_key("postgresql")
+    query = _with_prefix(select(KeyValue.key), "user:", key).where(key > "user:1").order_by(key)
+    sql = str(query.compile(dialect=postgresql.dialect()))
+
+    where, order_by = sql.split("ORDER BY")
+    assert where.count('COLLATE "C"') == 4
+    assert 'COLLATE "C"' in order_by
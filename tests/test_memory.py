@@ -0,0 +1,106 @@
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+from backends import Record
+from backends.memory import MemoryStorage
+from bulk import Operation
+
+
+def soon() -> datetime:
+    return datetime.now() + timedelta(minutes=5)
+
+
+def past() -> datetime:
+    return datetime.now() - timedelta(minutes=5)
+
+
+def log_entries(path: Path) -> List[list]:
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+async def test_expired_records_are_missing_and_can_be_replaced() -> None:
+    storage = MemoryStorage()
+    await storage.import_records([Record("old", "value", past())])
+
+    assert await storage.get("old") is None
+    assert await storage.put_if_absent(Record("old", "new", soon()))
+    assert (await storage.get("old")).value == "new"
+    assert await storage.put_if_absent(Record("old", "again", soon())) is False
+
+
+async def test_expire_removes_only_expired_records_in_batches() -> None:
+    storage = MemoryStorage()
+    await storage.import_records([Record(f"expired-{number}", number, past()) for number in range(5)]
+                                 + [Record("live", 1, soon()), Record("forever", 2, None)])
+
+    assert await storage.count_expired() == 5
+    assert len(await storage.expire(3)) == 3
+    assert len(await storage.expire(3)) == 2
+    assert await storage.expire(3) == []
+    assert await storage.count_expired() == 0
+    assert (await storage.get("live")).value == 1
+    assert (await storage.get("forever")).value == 2
+
+
+async def test_a_record_put_again_is_not_expired_by_its_old_deadline() -> None:
+    storage = MemoryStorage()
+    await storage.import_records([Record("key", "old", past())])
+    await storage.put_if_absent(Record("key", "new", soon()))
+
+    assert await storage.expire(10) == []
+    assert (await storage.get("key")).value == "new"
+
+
+async def test_the_log_is_replayed_after_a_restart(tmp_path: Path) -> None:
+    path = tmp_path / "kv.aof"
+    storage = MemoryStorage(log_path=str(path), fsync_interval=0)
+    await storage.start()
+    await storage.put_if_absent(Record("kept", {"nested": [1, 2]}, soon()))
+    await storage.put_if_absent(Record("deleted", "value", None))
+    await storage.delete("deleted")
+    await storage.apply_bulk([Operation("PUT", "bulk", "value", expiration_time=soon())])
+    await storage.close()
+
+    restarted = MemoryStorage(log_path=str(path), fsync_interval=0)
+    await restarted.start()
+    try:
+        assert (await restarted.get("kept")).value == {"nested": [1, 2]}
+        assert (await restarted.get("bulk")).value == "value"
+        assert await restarted.get("deleted") is None
+    finally:
+        await restarted.close()
+
+
+async def test_compaction_keeps_only_the_live_records(tmp_path: Path) -> None:
+    path = tmp_path / "kv.aof"
+    storage = MemoryStorage(log_path=str(path), fsync_interval=0)
+    await storage.start()
+    for number in range(10):
+        await storage.put_if_absent(Record(f"key-{number}", number, None))
+    await storage.delete_many([f"key-{number}" for number in range(8)])
+    await storage.import_records([Record("expired", 1, past())])
+    await storage.close()
+    assert len(log_entries(path)) > 3
+
+    restarted = MemoryStorage(log_path=str(path), fsync_interval=0)
+    await restarted.start()
+    await restarted.close()
+
+    entries = log_entries(path)
+    assert all(entry[0] == "P" for entry in entries)
+    assert sorted(entry[1] for entry in entries) == ["key-8", "key-9"]
+
+
+async def test_a_torn_last_line_is_ignored(tmp_path: Path) -> None:
+    path = tmp_path / "kv.aof"
+    path.write_text('["P", "whole", 1, null]\n["P", "torn", ', encoding="utf-8")
+
+    storage = MemoryStorage(log_path=str(path), fsync_interval=0)
+    await storage.start()
+    try:
+        assert (await storage.get("whole")).value == 1
+        assert await storage.get("torn") is None
+    finally:
+        await storage.close()
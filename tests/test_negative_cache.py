@@ -0,0 +1,53 @@
+import records
+from main import start_app
+from negative_cache import BloomFilter, NegativeCache
+
+
+def test_the_bloom_filter_has_no_false_negatives() -> None:
+    bloom = BloomFilter(capacity=10000, error_rate=0.01)
+    keys = [f"key-{number}" for number in range(10000)]
+    for key in keys:
+        bloom.add(key)
+
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f"other-{number}" in bloom for number in range(10000))
+    assert false_positives < 300
+
+
+def test_a_missed_key_is_answered_until_it_is_added() -> None:
+    cache = NegativeCache(ttl=60, max_keys=100)
+    cache.missed(["key"], cache.read_token())
+
+    assert cache.might_exist("key") is False
+    cache.added(["key"])
+    assert cache.might_exist("key") is True
+
+
+def test_a_read_racing_a_write_leaves_no_miss() -> None:
+    cache = NegativeCache(ttl=60, max_keys=100)
+    token = cache.read_token()
+    cache.added(["key"])
+    cache.missed(["key", "other"], token)
+
+    assert cache.might_exist("key") is True
+    assert cache.might_exist("other") is False
+
+
+def test_misses_last_ttl_seconds() -> None:
+    cache = NegativeCache(ttl=0, max_keys=100)
+    cache.missed(["key"], cache.read_token())
+
+    assert cache.might_exist("key") is True
+
+
+async def test_a_put_takes_the_key_out_of_the_negative_cache(storage, aiohttp_client, monkeypatch) -> None:
+    monkeypatch.setattr(records, "negative_cache", NegativeCache(ttl=60, max_keys=100))
+    client = await aiohttp_client(start_app(run_expiry=False))
+
+    assert (await client.get("/fresh")).status == 404
+    assert records.negative_cache.might_exist("fresh") is False
+    assert (await client.put("/fresh", json={"value": "v"})).status == 200
+    response = await client.get("/fresh")
+
+    assert response.status == 200
+    assert (await response.json())["value"] == "v"
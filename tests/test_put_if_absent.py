@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+import backends.sql
+from backends import Record
+from conftest import keys_on
+from models import KeyValue
+from setup_db import shards
+
+
+class NoRows:
+    def first(self) -> None:
+        return None
+
+
+@pytest.fixture
+def fallback(monkeypatch) -> None:
+    """
+    Makes every shard use the SELECT + DELETE + INSERT path of dialects without ON CONFLICT.
+    """
+    monkeypatch.setattr(backends.sql, "PUT_IF_ABSENT", [None] * len(backends.sql.PUT_IF_ABSENT))
+
+
+async def test_the_fallback_adds_a_missing_key(storage, fallback) -> None:
+    key, = keys_on(0)
+
+    assert await storage.put_if_absent(Record(key, "new", None))
+    assert (await storage.get(key)).value == "new"
+
+
+async def test_the_fallback_replaces_an_expired_record(storage, fallback) -> None:
+    key, = keys_on(1)
+    async with shards[1].engine.begin() as connection:
+        await connection.execute(insert(KeyValue), backends.sql._row(Record(key, "old", datetime.now() - timedelta(minutes=1))))
+
+    assert await storage.put_if_absent(Record(key, "new", None))
+    assert (await storage.get(key)).value == "new"
+
+
+async def test_the_fallback_keeps_a_record_written_after_its_check(storage, fallback, monkeypatch) -> None:
+    key, = keys_on(0)
+    assert await storage.put_if_absent(Record(key, "first", None))
+    execute = backends.sql.execute
+
+    async def racing_execute(db, statement, parameters=None):
+        # The existence check runs before the other writer's commit, so it sees no row.
+        if statement is backends.sql.RECORD_EXISTS:
+            return NoRows()
+        return await execute(db, statement, parameters)
+
+    monkeypatch.setattr(backends.sql, "execute", racing_execute)
+
+    assert await storage.put_if_absent(Record(key, "second", None)) is False
+    assert (await storage.get(key)).value == "first"
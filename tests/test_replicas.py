@@ -0,0 +1,49 @@
+import time
+from typing import List
+
+import backends.sql
+from backends import Record
+from backends.sql import SqlStorage
+from replicas import RecentWrites
+from conftest import keys_on
+
+
+def test_written_keys_are_recent_for_the_window() -> None:
+    recent = RecentWrites(window=0.05, max_keys=100)
+    recent.touch(["written"])
+
+    assert recent.is_recent("written")
+    assert not recent.is_recent("other")
+    time.sleep(0.1)
+    assert not recent.is_recent("written")
+
+
+def test_dropping_keys_makes_every_key_recent_for_their_window() -> None:
+    recent = RecentWrites(window=60, max_keys=2)
+    recent.touch(["a", "b", "c"])
+
+    assert len(recent) == 2
+    assert recent.is_recent("a")
+    assert recent.is_recent("never written")
+
+
+async def test_reads_of_recently_written_keys_go_to_the_primary(storage, monkeypatch) -> None:
+    engine = SqlStorage()
+    engine.recent_writes = RecentWrites(window=60, max_keys=100)
+    reads: List[bool] = []
+    client_db_call = backends.sql.client_db_call
+
+    def recording_db_call(shard: int = 0, replica: bool = False):
+        # The test shards have no replicas: record the routing, then read the primary.
+        reads.append(replica)
+        return client_db_call(shard)
+
+    monkeypatch.setattr(backends.sql, "client_db_call", recording_db_call)
+    written, untouched = keys_on(0, 2)
+    await engine.put_if_absent(Record(written, "v", None))
+    reads.clear()
+
+    assert (await engine.get(written)).value == "v"
+    assert await engine.get(untouched) is None
+    await engine.get_many([written, untouched])
+    assert reads == [False, True, False]
@@ -0,0 +1,86 @@
+import asyncio
+from typing import AsyncIterator, List, Tuple
+
+import pytest
+
+from resp import ProtocolError, RespProtocol, parse_command
+
+
+def command(*arguments: bytes) -> bytes:
+    return (b"*" + str(len(arguments)).encode() + b"\r\n"
+            + b"".join(b"$" + str(len(argument)).encode() + b"\r\n" + argument + b"\r\n" for argument in arguments))
+
+
+def test_every_prefix_of_a_frame_is_incomplete() -> None:
+    frame = command(b"GET", b"a key with\r\nnewlines")
+    for end in range(1, len(frame)):
+        assert parse_command(bytearray(frame[:end]), 0) is None
+
+
+def test_pipelined_commands_are_parsed_one_after_the_other() -> None:
+    buffer = bytearray(command(b"SET", b"k", b"v") + b"PING\r\n" + command(b"GET", b"k"))
+    parsed: List[List[bytes]] = []
+    position = 0
+    while position < len(buffer):
+        arguments, position = parse_command(buffer, position)
+        parsed.append(arguments)
+
+    assert parsed == [[b"SET", b"k", b"v"], [b"PING"], [b"GET", b"k"]]
+
+
+@pytest.mark.parametrize("frame", [b"*x\r\n", b"*1\r\n:3\r\n", b"*1\r\n$-5\r\n", b"*1\r\n$3\r\nabcde\r\n"])
+def test_malformed_frames_are_protocol_errors(frame: bytes) -> None:
+    with pytest.raises(ProtocolError):
+        parse_command(bytearray(frame), 0)
+
+
+@pytest.fixture
+async def connection(storage) -> AsyncIterator[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]:
+    server = await asyncio.get_running_loop().create_server(RespProtocol, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    yield reader, writer
+    writer.close()
+    server.close()
+    await server.wait_closed()
+
+
+async def read_replies(reader: asyncio.StreamReader, amount: int) -> List[bytes]:
+    replies: List[bytes] = []
+    for _ in range(amount):
+        line = await asyncio.wait_for(reader.readline(), 5)
+        if line.startswith(b"$") and line != b"$-1\r\n":
+            line += await reader.readexactly(int(line[1:]) + 2)
+        replies.append(line)
+    return replies
+
+
+async def test_pipelined_replies_come_back_in_order(connection) -> None:
+    reader, writer = connection
+    writer.write(command(b"SET", b"k", b"v") + command(b"SET", b"k", b"other") + command(b"GET", b"k")
+                 + command(b"DEL", b"k") + command(b"GET", b"k") + b"PING\r\n")
+    await writer.drain()
+
+    assert await read_replies(reader, 6) == [b"+OK\r\n", b"$-1\r\n", b"$1\r\nv\r\n", b":1\r\n", b"$-1\r\n",
+                                             b"+PONG\r\n"]
+
+
+async def test_a_command_split_over_many_packets_is_run_once_complete(connection) -> None:
+    reader, writer = connection
+    frame = command(b"SET", b"split", b"value") + command(b"GET", b"split")
+    for start in range(0, len(frame), 3):
+        writer.write(frame[start:start + 3])
+        await writer.drain()
+        await asyncio.sleep(0)
+
+    assert await read_replies(reader, 2) == [b"+OK\r\n", b"$5\r\nvalue\r\n"]
+
+
+async def test_a_protocol_error_answers_then_closes(connection) -> None:
+    reader, writer = connection
+    writer.write(b"PING\r\n*1\r\n:3\r\n")
+    await writer.drain()
+
+    assert await read_replies(reader, 1) == [b"+PONG\r\n"]
+    assert (await read_replies(reader, 1))[0].startswith(b"-ERR Protocol error")
+    assert await asyncio.wait_for(reader.read(), 5) == b""
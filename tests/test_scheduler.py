@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+from sqlalchemy import insert
+
+import backends.sql
+import scheduler
+from backends import Record
+from conftest import keys_on
+from models import KeyValue
+from setup_db import shards
+
+
+async def insert_rows(shard: int, records: List[Record]) -> None:
+    # Straight to the table: the storage refuses to import records that already expired.
+    async with shards[shard].engine.begin() as connection:
+        await connection.execute(insert(KeyValue), [backends.sql._row(record) for record in records])
+
+
+async def test_the_sweep_deletes_only_expired_rows_in_batches(storage, monkeypatch) -> None:
+    past = datetime.now() - timedelta(minutes=1)
+    later = datetime.now() + timedelta(minutes=30)
+    expired = {0: keys_on(0, 10, "expired"), 1: keys_on(1, 3, "expired")}
+    live = keys_on(0, 2, "live") + keys_on(1, 2, "live")
+    for shard, keys in expired.items():
+        await insert_rows(shard, [Record(key, key, past) for key in keys])
+    await storage.import_records([Record(key, key, later if index % 2 else None) for index, key in enumerate(live)])
+
+    monkeypatch.setattr(scheduler, "EXPIRY_BATCH_SIZE", 4)
+    monkeypatch.setattr(scheduler, "EXPIRY_MAX_BATCHES", 2)
+    batches: List[Tuple[int, int]] = []
+    sessions: List[int] = []
+    expire, scheduler_db_call = storage.expire, backends.sql.scheduler_db_call
+
+    async def recording_expire(limit: int, shard: int = 0) -> List[str]:
+        keys = await expire(limit, shard)
+        batches.append((shard, len(keys)))
+        return keys
+
+    def recording_scheduler_db_call(shard: int = 0):
+        sessions.append(shard)
+        return scheduler_db_call(shard)
+
+    def no_client_db_call(*arguments, **keywords):
+        raise AssertionError("The expiry sweep must not take connections from the client pool")
+
+    monkeypatch.setattr(storage, "expire", recording_expire)
+    monkeypatch.setattr(backends.sql, "scheduler_db_call", recording_scheduler_db_call)
+    monkeypatch.setattr(backends.sql, "client_db_call", no_client_db_call)
+
+    assert await scheduler.expire_records_tick() == 4 + 4 + 3
+    assert sorted(batches) == [(0, 4), (0, 4), (1, 3)]
+    assert scheduler.expiry_backlog.get() == 2
+    assert set(sessions) == {0, 1}
+
+    assert await scheduler.expire_records_tick() == 2
+    assert await scheduler.expire_records_tick() == 0
+    monkeypatch.undo()
+    for key in expired[0] + expired[1]:
+        assert await storage.get(key) is None
+    assert {key: record.value for key, record in (await storage.get_many(live)).items()} == {key: key for key in live}
+
+
+async def test_the_sweep_runs_on_an_interval(storage, monkeypatch) -> None:
+    monkeypatch.setattr(scheduler, "delete_record_timer", None)
+    await scheduler.start_scheduler(None)
+    try:
+        job = scheduler.delete_record_timer.get_job("expiry_sweep")
+        assert job.func is scheduler.expire_records_tick
+        assert job.trigger.interval == timedelta(seconds=scheduler.EXPIRY_INTERVAL)
+        assert job.max_instances == 1
+        await scheduler.startup_reconciliation
+    finally:
+        await scheduler.stop_scheduler(None)
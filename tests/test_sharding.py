@@ -0,0 +1,49 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+import backends.sql
+from backends import StorageConflict
+from bulk import Operation
+from conftest import keys_on
+
+
+async def test_cross_shard_bulk_commits_every_shard(storage) -> None:
+    first, = keys_on(0)
+    second, = keys_on(1)
+    plan = await storage.apply_bulk([Operation("PUT", first, "a"), Operation("PUT", second, "b"),
+                                     Operation("GET", first)])
+
+    assert plan.errors == []
+    assert [result["key"] for result in plan.results] == [first, second, first]
+    assert (await storage.get(first)).value == "a"
+    assert (await storage.get(second)).value == "b"
+
+
+async def test_cross_shard_bulk_rolls_back_every_shard_on_an_error(storage) -> None:
+    first, = keys_on(0)
+    second, = keys_on(1)
+    plan = await storage.apply_bulk([Operation("PUT", first, "a"), Operation("GET", second)])
+
+    assert plan.outcomes == [True, False]
+    assert plan.errors[0]["key"] == second
+    assert await storage.get(first) is None
+
+
+async def test_cross_shard_bulk_rolls_back_when_a_shard_fails(storage, monkeypatch) -> None:
+    first, = keys_on(0)
+    second, = keys_on(1)
+    run_bulk = backends.sql.run_bulk
+
+    async def failing_run_bulk(db, operations, atomic=True):
+        plan = await run_bulk(db, operations, atomic)
+        if any(operation.key == second for operation in operations):
+            raise IntegrityError("INSERT", {}, Exception("duplicate key"))
+        return plan
+
+    monkeypatch.setattr(backends.sql, "run_bulk", failing_run_bulk)
+    with pytest.raises(StorageConflict):
+        await storage.apply_bulk([Operation("PUT", first, "a"), Operation("PUT", second, "b")])
+
+    monkeypatch.undo()
+    assert await storage.get(first) is None
+    assert await storage.get(second) is None
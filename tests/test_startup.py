@@ -0,0 +1,40 @@
+import asyncio
+
+import handlers
+import main
+import startup
+from backends import init_storage
+
+
+async def test_a_lazy_startup_answers_503_until_ready(storage, aiohttp_client, monkeypatch) -> None:
+    report = startup.StartupReport()
+    monkeypatch.setattr(startup, "report", report)
+    monkeypatch.setattr(handlers, "report", report)
+    monkeypatch.setattr(main, "STARTUP_LAZY", True)
+    storage_wanted = asyncio.Event()
+
+    async def slow_init_storage(app) -> None:
+        await storage_wanted.wait()
+        await init_storage(app)
+
+    monkeypatch.setattr(main, "init_storage", slow_init_storage)
+    client = await aiohttp_client(main.start_app(run_expiry=False))
+
+    response = await client.get("/lazy")
+    assert response.status == 503
+    assert response.headers["Retry-After"] == "1"
+    assert (await client.put("/lazy", json={"value": "v"})).status == 503
+    assert (await client.get("/")).status == 200
+    assert (await client.get("/", params={"ready": "true"})).status == 503
+    assert (await (await client.get("/_startup")).json())["ready"] is False
+
+    storage_wanted.set()
+    for _ in range(100):
+        if report.is_ready:
+            break
+        await asyncio.sleep(0.01)
+
+    assert (await client.get("/", params={"ready": "true"})).status == 200
+    assert (await client.put("/lazy", json={"value": "v"})).status == 200
+    assert (await (await client.get("/lazy")).json())["value"] == "v"
+    assert "slow_init_storage" in (await (await client.get("/_startup")).json())["hooks"]
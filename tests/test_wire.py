@@ -0,0 +1,122 @@
+import json
+import struct
+from typing import Any, Dict, List, Tuple
+
+import pytest
+
+from main import start_app
+from wire import (BINARY_TYPE, JSON_TYPE, MAX_BINARY_KEY_LENGTH, MSGPACK_TYPE, decode_keys, encode_deleted,
+                  encode_values, negotiate, supported_types)
+
+
+def read_key(body: bytes, position: int) -> Tuple[str, int]:
+    length, = struct.unpack_from(">H", body, position)
+    position += 2
+    return body[position:position + length].decode("utf-8"), position + length
+
+
+def decode_values(body: bytes) -> List[Tuple[str, Any]]:
+    """
+    Client side of the binary multi-get format: (key, value text or None) in request order.
+    """
+    count, = struct.unpack_from(">I", body, 0)
+    position = 4
+    items: List[Tuple[str, Any]] = []
+    for _ in range(count):
+        key, position = read_key(body, position)
+        length, = struct.unpack_from(">i", body, position)
+        position += 4
+        if length < 0:
+            items.append((key, None))
+        else:
+            items.append((key, body[position:position + length].decode("utf-8")))
+            position += length
+    assert position == len(body)
+    return items
+
+
+def decode_deleted(body: bytes) -> List[Tuple[str, bool]]:
+    count, = struct.unpack_from(">I", body, 0)
+    position = 4
+    items: List[Tuple[str, bool]] = []
+    for _ in range(count):
+        key, position = read_key(body, position)
+        items.append((key, body[position] == 1))
+        position += 1
+    assert position == len(body)
+    return items
+
+
+def test_binary_multi_get_round_trip() -> None:
+    keys = ["plain", "clé ünicode ✓", "missing", "nested"]
+    values: Dict[str, Any] = {"plain": "text", "clé ünicode ✓": "välue", "nested": {"a": [1, 2]}}
+
+    items = decode_values(encode_values(keys, values, BINARY_TYPE))
+
+    assert [key for key, _ in items] == keys
+    assert items[0][1] == "text"
+    assert items[1][1] == "välue"
+    assert items[2][1] is None
+    assert json.loads(items[3][1]) == {"a": [1, 2]}
+
+
+def test_binary_multi_delete_round_trip() -> None:
+    keys = ["a", "ü", "b"]
+
+    assert decode_deleted(encode_deleted(keys, ["ü", "b"], BINARY_TYPE)) == [("a", False), ("ü", True), ("b", True)]
+
+
+def test_json_results_keep_the_request_order() -> None:
+    document = json.loads(encode_values(["b", "x", "a"], {"a": 1, "b": 2}, JSON_TYPE))
+
+    assert list(document["records"]) == ["b", "a"]
+    assert document["missing"] == ["x"]
+
+
+def test_keys_are_decoded_from_json() -> None:
+    assert decode_keys(b'["a", "b"]', JSON_TYPE) == ["a", "b"]
+    for body in (b'{"a": 1}', b'["a", ""]', b'["a", 1]', b"not json"):
+        with pytest.raises(ValueError):
+            decode_keys(body, JSON_TYPE)
+
+
+def test_keys_too_long_for_the_binary_format_are_refused() -> None:
+    longest = "k" * MAX_BINARY_KEY_LENGTH
+    body = json.dumps([longest]).encode()
+    assert decode_keys(body, JSON_TYPE, BINARY_TYPE) == [longest]
+
+    for key in ("k" * (MAX_BINARY_KEY_LENGTH + 1), "ü" * (MAX_BINARY_KEY_LENGTH // 2 + 1)):
+        body = json.dumps([key]).encode()
+        with pytest.raises(ValueError):
+            decode_keys(body, JSON_TYPE, BINARY_TYPE)
+        assert decode_keys(body, JSON_TYPE, JSON_TYPE) == [key]
+
+
+def test_accept_negotiation() -> None:
+    assert negotiate(None) == JSON_TYPE
+    assert negotiate("*/*") == JSON_TYPE
+    assert negotiate(f"{JSON_TYPE};q=0.5, {BINARY_TYPE}") == BINARY_TYPE
+    assert negotiate("text/html") is None
+    assert negotiate("application/x-msgpack") == (MSGPACK_TYPE if MSGPACK_TYPE in supported_types() else None)
+
+
+@pytest.mark.parametrize("path", ["/_mget", "/_mdelete"])
+async def test_an_oversized_key_answers_400_in_the_binary_format(storage, aiohttp_client, path: str) -> None:
+    client = await aiohttp_client(start_app(run_expiry=False))
+    keys = ["k" * (MAX_BINARY_KEY_LENGTH + 1)]
+
+    response = await client.post(path, json=keys, headers={"Accept": BINARY_TYPE})
+    assert response.status == 400
+    assert (await response.json())["status"] == "Error"
+    assert (await client.post(path, json=keys, headers={"Accept": JSON_TYPE})).status == 200
+
+
+async def test_multi_get_answers_in_the_binary_format(storage, aiohttp_client) -> None:
+    client = await aiohttp_client(start_app(run_expiry=False))
+    assert (await client.put("/one", json={"value": "1"})).status == 200
+
+    response = await client.post("/_mget", json=["one", "two"], headers={"Accept": BINARY_TYPE})
+
+    assert response.status == 200
+    assert response.content_type == BINARY_TYPE
+    assert decode_values(await response.read()) == [("one", "1"), ("two", None)]
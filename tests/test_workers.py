@@ -0,0 +1,33 @@
+import os
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+from typing import Set
+
+SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source")
+
+
+def prepare_database(database: Path) -> Set[str]:
+    """
+    Runs the master's schema step on "database" in a fresh interpreter (this session already
+    imported models.py) and returns the tables it holds afterwards.
+    """
+    env = dict(os.environ, DB_URL=f"sqlite+aiosqlite:///{database}", DB_SHARDS="")
+    subprocess.run([sys.executable, "-c", "import asyncio, workers; asyncio.run(workers._prepare_database())"],
+                   cwd=SOURCE, env=env, check=True, timeout=60)
+    with sqlite3.connect(database) as connection:
+        return {name for name, in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def test_the_master_creates_the_tables_of_an_empty_database(tmp_path: Path) -> None:
+    assert {"key_values", "kv_schema_version"} <= prepare_database(tmp_path / "kv.db")
+
+
+def test_a_marker_without_the_tables_is_repaired(tmp_path: Path) -> None:
+    database = tmp_path / "kv.db"
+    with sqlite3.connect(database) as connection:
+        connection.execute("CREATE TABLE kv_schema_version (version INTEGER NOT NULL)")
+        connection.execute("INSERT INTO kv_schema_version VALUES (2)")
+
+    assert "key_values" in prepare_database(database)